@@ -5,7 +5,8 @@ import time
 import streamlit as st
 from dotenv import load_dotenv
 
-from translator_agent import translate
+from translation_cache import TranslationCache, cached_translate_stream
+from translator_agent import warm_up
 
 # ----------------------
 # Setup
@@ -29,6 +30,23 @@ if "GOOGLE_API_KEY" not in os.environ or not os.environ["GOOGLE_API_KEY"]:
     st.error("⚠️ `GOOGLE_API_KEY` not set. Please configure it in your .env file.")
     st.stop()
 
+
+@st.cache_resource(show_spinner=False)
+def start_warm_up():
+    """Import the provider SDK and build the shared chain in the background,
+    once per server process, so the first page render doesn't wait for it."""
+    return warm_up()
+
+
+@st.cache_resource(show_spinner=False)
+def load_translation_cache():
+    """Translation memory shared by every session of this server."""
+    return TranslationCache()
+
+
+start_warm_up()
+translation_cache = load_translation_cache()
+
 # ----------------------
 # Sidebar: Settings
 # ----------------------
@@ -88,7 +106,7 @@ with col2:
     translate_clicked = st.button("🚀 Translate Now", use_container_width=True)
 
     # A container to show messages + output
-    status_container = st.empty()
+    status_container = st.container()
     output_container = st.empty()
 
     if translate_clicked:
@@ -101,15 +119,30 @@ with col2:
             with status_container, st.spinner("🔄 Translating with AI..."):
                 start = time.time()
                 try:
-                    result = translate(
+                    chunks, from_cache = cached_translate_stream(
                         text=text_to_translate,
                         source_lang=source_lang,
                         target_lang=target_lang,
                         domain=domain,
+                        cache=translation_cache,
                     )
+                    # Render tokens as they arrive
+                    result = ""
+                    first_token = None
+                    for chunk in chunks:
+                        if first_token is None:
+                            first_token = time.time() - start
+                        result += chunk
+                        output_container.markdown(result + "▌")
                     elapsed = time.time() - start
+                    if first_token is None:
+                        first_token = elapsed
 
-                    st.success(f"✅ Translated in {elapsed:.2f}s")
+                    source_note = " (⚡ from cache)" if from_cache else ""
+                    st.success(
+                        f"✅ Translated in {elapsed:.2f}s "
+                        f"(first token after {first_token:.2f}s){source_note}"
+                    )
 
                     # Show what text was actually used
                     st.markdown("**Source text used for this translation:**")
@@ -0,0 +1,1119 @@
+# benchmark.py
+"""Offline benchmarks for the translator (uses fake_llm, never calls an API).
+
+Usage:
+    python benchmark.py chain --calls 500
+    python benchmark.py chunked --paragraphs 40 --workers 4
+    python benchmark.py service --requests 2000 --clients 200
+    python benchmark.py pack --strings 500
+    python benchmark.py ratelimit --requests 400 --concurrency 32
+    python benchmark.py route --requests 400
+    python benchmark.py hedge --requests 2000
+    python benchmark.py detect --strings 1000
+    python benchmark.py protect --strings 300
+    python benchmark.py prompts --strings 200
+    python benchmark.py edit --paragraphs 30
+    python benchmark.py live --edits 40
+    python benchmark.py fanout --targets 12
+    python benchmark.py glossary --terms 100000
+    python benchmark.py quality --strings 1000
+    python benchmark.py startup --runs 5
+    python benchmark.py suite --json report.json [--compare baseline.json]
+
+`suite` runs the standard workloads (short-string bursts, long documents,
+repeated inputs, mixed languages) against a seeded fake with the given
+latency distribution, token rate and error rate, prints a summary table
+and optionally writes JSON. With --compare it prints the change against
+an earlier report and exits with status 1 if throughput or p95 latency
+regressed by more than --tolerance.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Tuple
+
+from fake_llm import LATENCY_DISTRIBUTIONS, FakeTranslationLLM
+import translator_agent
+from translator_agent import (
+    build_translation_chain,
+    clear_translation_chains,
+    get_chat_model,
+    get_translation_chain,
+    register_provider,
+    translate,
+    translate_batch,
+    translate_long_document,
+)
+
+SAMPLE_TEXT = "Please restart the application to apply the new settings."
+
+
+def _time_calls(fn: Callable[[], object], calls: int) -> List[float]:
+    samples = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def _report(label: str, samples: List[float]) -> None:
+    print(
+        f"{label:<34} mean {statistics.mean(samples) * 1e6:9.1f} µs   "
+        f"p50 {statistics.median(samples) * 1e6:9.1f} µs   "
+        f"total {sum(samples):7.3f} s"
+    )
+
+
+def bench_chain(args: argparse.Namespace) -> None:
+    """Per-call overhead: rebuilding the chain vs. the shared registry."""
+    # Same prompt and wrappers on both sides: build_translation_chain has no QualityGate.
+    translator_agent.QUALITY_GATE = False
+    register_provider("fake", lambda model, temperature: FakeTranslationLLM())
+    payload = {
+        "source_lang": "English",
+        "target_lang": "French",
+        "domain": "general",
+        "text": SAMPLE_TEXT,
+    }
+
+    def rebuild():
+        build_translation_chain(provider="fake").invoke(payload)
+
+    def reuse():
+        get_translation_chain(provider="fake").invoke(payload)
+
+    print(f"{args.calls} calls against a zero-latency fake LLM\n")
+    _report("rebuild chain per call", _time_calls(rebuild, args.calls))
+    _report("shared chain registry", _time_calls(reuse, args.calls))
+    translator_agent.QUALITY_GATE = True
+    clear_translation_chains()
+
+    # Client construction cost that the registry removes for the real provider.
+    os.environ.setdefault("GROQ_API_KEY", "benchmark-dummy-key")
+
+    from langchain_groq import ChatGroq
+
+    def groq_client():
+        ChatGroq(
+            model=translator_agent.DEFAULT_MODEL,
+            temperature=translator_agent.DEFAULT_TEMPERATURE,
+            api_key=os.environ["GROQ_API_KEY"],
+        )
+
+    _report("ChatGroq + own pool per call", _time_calls(groq_client, min(args.calls, 100)))
+
+
+def bench_chunked(args: argparse.Namespace) -> None:
+    """One long completion vs. parallel chunks, with per-token fake latency."""
+    register_provider(
+        "fake",
+        lambda model, temperature: FakeTranslationLLM(
+            latency=args.latency, token_latency=args.token_latency
+        ),
+    )
+    paragraph = " ".join([SAMPLE_TEXT] * 6)
+    document = "\n\n".join([paragraph] * args.paragraphs)
+
+    start = time.perf_counter()
+    single = translate(document, "English", "French", "general", provider="fake")
+    single_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    chunked = translate_long_document(
+        document, "English", "French", "general",
+        max_chunk_tokens=args.chunk_tokens,
+        overlap_sentences=args.overlap,
+        max_workers=args.workers,
+        provider="fake",
+    )
+    chunked_s = time.perf_counter() - start
+
+    assert chunked.count("\n\n") == single.count("\n\n"), "paragraphs lost in reassembly"
+    print(f"document: {len(document)} chars, {args.paragraphs} paragraphs")
+    print(f"single prompt      {single_s:7.3f} s")
+    print(f"chunked x{args.workers} workers {chunked_s:7.3f} s   ({single_s / chunked_s:.1f}x faster)")
+
+
+async def _asgi_post(app: Any, path: str, body: Dict[str, Any]) -> Tuple[int, bytes]:
+    """Drive an ASGI app in-process (no sockets)."""
+    request = {"type": "http.request", "body": json.dumps(body).encode(), "more_body": False}
+    response: Dict[str, Any] = {"status": 0, "body": b""}
+
+    async def receive() -> Dict[str, Any]:
+        return request
+
+    async def send(message: Dict[str, Any]) -> None:
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+        else:
+            response["body"] += message.get("body", b"")
+
+    scope = {"type": "http", "method": "POST", "path": path, "headers": []}
+    await app(scope, receive, send)
+    return response["status"], response["body"]
+
+
+def bench_service(args: argparse.Namespace) -> None:
+    """Load-test service.py against a stub LLM: coalescing and backpressure."""
+    from service import TranslationService
+
+    register_provider("fake", lambda model, temperature: FakeTranslationLLM(latency=args.latency))
+    service = TranslationService(max_in_flight=args.in_flight, max_queue=args.queue, provider="fake")
+    rng = random.Random(7)
+    texts = [f"{SAMPLE_TEXT} (string #{i})" for i in range(args.unique)]
+
+    async def run() -> Tuple[List[float], Dict[int, int], float]:
+        latencies: List[float] = []
+        statuses: Dict[int, int] = {}
+        queue: "asyncio.Queue[str]" = asyncio.Queue()
+        for _ in range(args.requests):
+            queue.put_nowait(rng.choice(texts))
+
+        async def client() -> None:
+            while not queue.empty():
+                text = queue.get_nowait()
+                start = time.perf_counter()
+                while True:
+                    status, _ = await _asgi_post(
+                        service,
+                        "/translate",
+                        {"text": text, "source_lang": "English", "target_lang": "French"},
+                    )
+                    statuses[status] = statuses.get(status, 0) + 1
+                    if status != 429:
+                        break
+                    await asyncio.sleep(args.backoff)  # honour Retry-After, scaled down
+                if status == 200:
+                    latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(args.clients)))
+        return latencies, statuses, time.perf_counter() - start
+
+    latencies, statuses, wall = asyncio.run(run())
+    stats = service.stats()
+    print(
+        f"{args.requests} requests from {args.clients} clients, {args.unique} distinct texts, "
+        f"stub latency {args.latency * 1000:.0f} ms"
+    )
+    print(f"status codes     {dict(sorted(statuses.items()))}")
+    print(f"LLM calls        {stats['llm_calls']}   coalesced {stats['coalesced']}   rejected {stats['rejected']}")
+    print(f"throughput       {statuses.get(200, 0) / wall:8.1f} req/s")
+    if latencies:
+        print(
+            f"latency (200s)   p50 {_percentile(latencies, 50) * 1000:7.1f} ms   "
+            f"p95 {_percentile(latencies, 95) * 1000:7.1f} ms   "
+            f"p99 {_percentile(latencies, 99) * 1000:7.1f} ms"
+        )
+
+
+def bench_pack(args: argparse.Namespace) -> None:
+    """Tokens per string and strings per second: one call each vs. packed."""
+    from micro_batch import translate_packed
+
+    labels = ["Save", "Cancel", "Open file", "Delete account", "Settings saved", "Sign out",
+              "Are you sure?", "Retry", "Upload failed", "Search results"]
+    items = [
+        {"text": f"{labels[i % len(labels)]} ({i})", "source_lang": "English", "target_lang": "French"}
+        for i in range(args.strings)
+    ]
+
+    def fake() -> FakeTranslationLLM:
+        return FakeTranslationLLM(
+            latency=args.latency, token_latency=args.token_latency, drop_rate=args.drop_rate, seed=3
+        )
+
+    print(f"{args.strings} short strings, fake latency {args.latency * 1000:.0f} ms/call, "
+          f"concurrency {args.concurrency}, drop rate {args.drop_rate:.0%}\n")
+    print(f"{'mode':<10}{'calls':>8}{'prompt tok/str':>16}{'compl. tok/str':>16}{'strings/s':>12}")
+    for mode in ("single", "packed"):
+        llm = fake()
+        register_provider("fake", lambda model, temperature: llm)
+        start = time.perf_counter()
+        if mode == "single":
+            outputs = translate_batch(items, max_concurrency=args.concurrency, provider="fake")
+        else:
+            outputs = translate_packed(
+                items, max_pack_items=args.pack_items, max_concurrency=args.concurrency, provider="fake"
+            )
+        wall = time.perf_counter() - start
+        assert all(outputs), "missing translations"
+        print(
+            f"{mode:<10}{llm.calls:>8}{llm.prompt_tokens / args.strings:>16.1f}"
+            f"{llm.completion_tokens / args.strings:>16.1f}{args.strings / wall:>12.1f}"
+        )
+
+
+def bench_ratelimit(args: argparse.Namespace) -> None:
+    """Throughput and failures against a throttling stub, with and without rate_limit."""
+    from langchain_core.output_parsers import StrOutputParser
+
+    from rate_limit import configure_limits, get_limiter
+
+    items = [
+        {"text": f"{SAMPLE_TEXT} ({i})", "source_lang": "English", "target_lang": "French"}
+        for i in range(args.requests)
+    ]
+    configure_limits("fake", requests_per_minute=args.rpm or None, initial_concurrency=args.concurrency)
+
+    def fake() -> FakeTranslationLLM:
+        return FakeTranslationLLM(
+            latency=args.latency,
+            max_concurrency=args.provider_concurrency,
+            error_rate=args.error_rate,
+            retry_after=args.retry_after,
+            seed=5,
+        )
+
+    print(f"{args.requests} requests at concurrency {args.concurrency}; stub admits "
+          f"{args.provider_concurrency} concurrent calls, {args.error_rate:.0%} random 503s\n")
+    print(f"{'mode':<10}{'ok':>7}{'failed':>8}{'429s':>7}{'503s':>7}{'retries':>9}"
+          f"{'req/s':>9}{'limit':>7}")
+    for mode in ("raw", "limited"):
+        llm = fake()
+        register_provider("fake", lambda model, temperature: llm)
+        start = time.perf_counter()
+        if mode == "raw":
+            chain = translator_agent.TRANSLATION_PROMPT | llm | StrOutputParser()
+            outputs = chain.batch(
+                [translator_agent.make_payload(i["text"], i["source_lang"], i["target_lang"], None)
+                 for i in items],
+                config={"max_concurrency": args.concurrency},
+                return_exceptions=True,
+            )
+        else:
+            outputs = translate_batch(
+                items, max_concurrency=args.concurrency, provider="fake", return_exceptions=True
+            )
+        wall = time.perf_counter() - start
+        ok = sum(not isinstance(o, BaseException) for o in outputs)
+        limiter = get_limiter("fake", translator_agent.DEFAULT_MODEL)
+        retries = limiter.retries if mode == "limited" else 0
+        limit = f"{limiter.concurrency.limit:.1f}" if mode == "limited" else "-"
+        print(
+            f"{mode:<10}{ok:>7}{len(outputs) - ok:>8}{llm.throttled:>7}{llm.errors:>7}"
+            f"{retries:>9}{ok / wall:>9.1f}{limit:>7}"
+        )
+
+
+def bench_route(args: argparse.Namespace) -> None:
+    """Fixed 70B model vs. the router; the fast model goes down half-way."""
+    from rate_limit import configure_limits
+    from router import Route, Router, set_router
+
+    latencies = {
+        ("fake-groq", "small"): args.latency,
+        ("fake-groq", "large"): args.latency * 8,
+        ("fake-google", "flash"): args.latency * 3,
+        ("fake-google", "pro"): args.latency * 12,
+    }
+    rng = random.Random(11)
+    short = ["Thanks, see you tomorrow!", "Where is the station?", "Your order has shipped."]
+    workload = []
+    for i in range(args.requests):
+        if rng.random() < args.quality_share:
+            workload.append((f"The licensee shall indemnify the licensor ({i}).", "legal contract"))
+        else:
+            workload.append((f"{rng.choice(short)} ({i})", "casual chat"))
+
+    print(f"{args.requests} requests ({args.quality_share:.0%} legal), concurrency {args.concurrency}; "
+          f"fake-groq/small fails from request {args.requests // 2}\n")
+    print(f"{'mode':<10}{'ok':>6}{'failed':>8}{'p50 ms':>9}{'p95 ms':>9}   routes (1st half | 2nd half)")
+    for mode in ("fixed", "auto"):
+        models: Dict[Tuple[str, str], FakeTranslationLLM] = {}
+        for provider in ("fake-groq", "fake-google"):
+            configure_limits(provider, max_retries=0)
+            register_provider(
+                provider,
+                lambda model, temperature, provider=provider: models.setdefault(
+                    (provider, model), FakeTranslationLLM(latency=latencies[(provider, model)])
+                ),
+            )
+        set_router(Router(
+            tiers={
+                "fast": [Route("fake-groq", "small"), Route("fake-google", "flash")],
+                "quality": [Route("fake-groq", "large"), Route("fake-google", "pro")],
+            },
+            cooldown=args.cooldown,
+        ))
+
+        async def run() -> Tuple[List[float], int, List[Dict[str, int]]]:
+            limit = asyncio.Semaphore(args.concurrency)
+            samples: List[float] = []
+            calls: List[Dict[str, int]] = []
+            failed = 0
+
+            async def one(text: str, domain: str) -> None:
+                nonlocal failed
+                async with limit:
+                    start = time.perf_counter()
+                    try:
+                        if mode == "fixed":
+                            await translator_agent.atranslate(text, "English", "German", domain, "fake-groq", "large")
+                        else:
+                            await translator_agent.atranslate(text, "English", "German", domain, "auto")
+                        samples.append(time.perf_counter() - start)
+                    except Exception:
+                        failed += 1
+
+            half = len(workload) // 2
+            for n, phase in enumerate((workload[:half], workload[half:])):
+                if n == 1:
+                    # Provider outage: every call to the small model now fails.
+                    get_chat_model("small", translator_agent.DEFAULT_TEMPERATURE, "fake-groq").error_rate = 1.0
+                before = {k: m.calls for k, m in models.items()}
+                await asyncio.gather(*(one(text, domain) for text, domain in phase))
+                calls.append({f"{p}/{m}": llm.calls - before.get((p, m), 0) for (p, m), llm in models.items()})
+            return samples, failed, calls
+
+        samples, failed, calls = asyncio.run(run())
+        routes = " | ".join(
+            " ".join(f"{name}={n}" for name, n in sorted(phase.items()) if n) for phase in calls
+        )
+        print(
+            f"{mode:<10}{len(samples):>6}{failed:>8}{_percentile(samples, 50) * 1000:>9.0f}"
+            f"{_percentile(samples, 95) * 1000:>9.0f}   {routes}"
+        )
+
+
+def bench_hedge(args: argparse.Namespace) -> None:
+    """Tail latency with and without hedging against a heavy-tailed fake."""
+    from hedging import configure_hedging, get_hedge_policy
+
+    items = [f"{SAMPLE_TEXT} ({i})" for i in range(args.requests)]
+    print(f"{args.requests} requests, concurrency {args.concurrency}; fake latency "
+          f"{args.latency * 1000:.0f} ms + up to {args.jitter * 1000:.0f} ms jitter, "
+          f"{args.tail_rate:.1%} of calls +{args.tail_latency * 1000:.0f} ms\n")
+    print(f"{'mode':<8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}{'extra calls':>13}{'backup wins':>13}")
+    for mode in ("off", "hedged"):
+        provider = f"fake-{mode}"
+        llm = FakeTranslationLLM(
+            latency=args.latency, jitter=args.jitter,
+            tail_rate=args.tail_rate, tail_latency=args.tail_latency, seed=9,
+        )
+        register_provider(provider, lambda model, temperature: llm)
+        if mode == "hedged":
+            configure_hedging(provider, percentile=args.percentile, budget=args.budget)
+
+        async def run() -> List[float]:
+            limit = asyncio.Semaphore(args.concurrency)
+            samples: List[float] = []
+
+            async def one(text: str) -> None:
+                async with limit:
+                    start = time.perf_counter()
+                    await translator_agent.atranslate(text, "English", "French", None, provider)
+                    samples.append(time.perf_counter() - start)
+
+            await asyncio.gather(*(one(text) for text in items))
+            return samples
+
+        samples = asyncio.run(run())
+        policy = get_hedge_policy(provider, translator_agent.DEFAULT_MODEL)
+        extra = llm.calls - args.requests
+        wins = policy.hedge_wins if policy else 0
+        print(
+            f"{mode:<8}{_percentile(samples, 50) * 1000:>9.0f}{_percentile(samples, 95) * 1000:>9.0f}"
+            f"{_percentile(samples, 99) * 1000:>9.0f}{max(samples) * 1000:>9.0f}"
+            f"{extra / args.requests:>12.1%} {wins:>12}"
+        )
+
+
+def bench_detect(args: argparse.Namespace) -> None:
+    """Model calls saved by local language detection on "auto" traffic."""
+    from lang_detect import detect_language
+
+    english = ["The payment was declined by your bank.", "Please check your address before placing the order."]
+    french = ["Le paiement a été refusé par votre banque.", "Merci de vérifier votre adresse avant de valider la commande."]
+    rng = random.Random(4)
+    texts = [
+        f"{rng.choice(french if rng.random() < args.same_share else english)} ({i})"
+        for i in range(args.strings)
+    ]
+    samples = _time_calls(lambda: detect_language(texts[0]), 2000)
+    _report("detect_language()", samples)
+
+    print(f"\n{args.strings} strings to French, {args.same_share:.0%} already French, "
+          f"fake latency {args.latency * 1000:.0f} ms\n")
+    print(f"{'source':<10}{'calls':>7}{'prompt tokens':>15}{'seconds':>9}")
+    for source in ("English", "auto"):
+        llm = FakeTranslationLLM(latency=args.latency)
+        register_provider("fake", lambda model, temperature: llm)
+        items = [{"text": text, "source_lang": source, "target_lang": "French"} for text in texts]
+        start = time.perf_counter()
+        translate_batch(items, max_concurrency=args.concurrency, provider="fake")
+        wall = time.perf_counter() - start
+        print(f"{source:<10}{llm.calls:>7}{llm.prompt_tokens:>15}{wall:>9.2f}")
+
+
+def bench_protect(args: argparse.Namespace) -> None:
+    """Prompt tokens and damaged spans, with and without protected spans."""
+    from langchain_core.output_parsers import StrOutputParser
+
+    from protected_spans import mask
+
+    templates = [
+        "Hello {user_name}, your build #{build_id} failed. See https://ci.example.com/builds/{build_id}/logs",
+        "Run `pip install --upgrade translator-agent==2.4.1` and restart the worker.",
+        "Set the timeout with:\n```yaml\nrequest_timeout_seconds: 30\nretry_backoff: exponential\n```\nthen redeploy.",
+        "You have %(count)d unread messages since 2024-05-12 09:30.",
+    ]
+    texts = [f"{templates[i % len(templates)]} ({i})" for i in range(args.strings)]
+    payloads = [translator_agent.make_payload(t, "English", "German", "software") for t in texts]
+
+    print(f"{args.strings} technical strings\n")
+    print(f"{'mode':<11}{'calls':>7}{'prompt tok/str':>16}{'damaged spans':>15}")
+    for mode in ("raw", "protected"):
+        llm = FakeTranslationLLM()
+        chain = translator_agent.TRANSLATION_PROMPT | llm | StrOutputParser()
+        if mode == "protected":
+            register_provider("fake", lambda model, temperature: llm)
+            chain = translator_agent.get_translation_chain(provider="fake")
+        outputs = chain.batch(payloads, config={"max_concurrency": 8})
+        damaged = sum(
+            span not in output for text, output in zip(texts, outputs) for span in mask(text).spans
+        )
+        print(f"{mode:<11}{llm.calls:>7}{llm.prompt_tokens / args.strings:>16.1f}{damaged:>15}")
+
+
+def bench_prompts(args: argparse.Namespace) -> None:
+    """Prompt tokens per request: verbose prompt vs compact per (mode, domain)."""
+    from langchain_core.output_parsers import StrOutputParser
+
+    from prompts import compile_prompt
+
+    # What main2 used to send: the verbose prompt, mode text glued to the domain.
+    legacy_modes = {
+        "Standard": "",
+        "Formal": " Use formal and professional language.",
+        "Technical": " Maintain technical terminology and precision.",
+    }
+    domains = ["general conversation", "software and technology", "legal documents and contracts",
+               "Release notes for a mobile banking app"]
+    texts = [f"Your session expired, please sign in again to continue ({i})." for i in range(args.strings)]
+
+    print(f"{args.strings} short strings per row, prompt tokens per request\n")
+    print(f"{'mode':<10}{'domain':<40}{'verbose':>9}{'compact':>9}{'static':>8}{'saved':>8}")
+    for mode, suffix in legacy_modes.items():
+        for domain in domains:
+            legacy = FakeTranslationLLM()
+            chain = translator_agent.TRANSLATION_PROMPT | legacy | StrOutputParser()
+            chain.batch([translator_agent.make_payload(t, "English", "German", domain + suffix) for t in texts])
+
+            compact = FakeTranslationLLM()
+            register_provider("fake", lambda model, temperature: compact)
+            translator_agent.clear_translation_chains()
+            items = [{"text": t, "source_lang": "English", "target_lang": "German", "domain": domain,
+                      "mode": mode} for t in texts]
+            translate_batch(items, provider="fake")
+
+            before = legacy.prompt_tokens / args.strings
+            after = compact.prompt_tokens / args.strings
+            static = compile_prompt(mode, domain).static_tokens
+            print(f"{mode:<10}{domain[:38]:<40}{before:>9.1f}{after:>9.1f}{static:>8}{1 - after / before:>8.0%}")
+
+
+def bench_edit(args: argparse.Namespace) -> None:
+    """Re-translating an edited document: whole text vs changed paragraphs only."""
+    from translator_agent import align_paragraphs, translate_incremental
+
+    llm = FakeTranslationLLM(latency=args.latency, token_latency=args.token_latency)
+    register_provider("fake", lambda model, temperature: llm)
+    paragraphs = [f"{i}. {SAMPLE_TEXT} " + " ".join([SAMPLE_TEXT] * 3) for i in range(args.paragraphs)]
+    document = "\n\n".join(paragraphs)
+    translation = translate(document, "English", "French", "general", provider="fake")
+    alignment = align_paragraphs(document, translation, "English", "French", "general")
+    assert alignment is not None, "paragraphs lost"
+
+    print(f"{args.paragraphs} paragraphs, fake latency {args.latency * 1000:.0f} ms "
+          f"+ {args.token_latency * 1000:.1f} ms/token\n")
+    print(f"{'edited':>7}{'full s':>9}{'incremental s':>15}{'sent':>6}")
+    for edited in (1, 3, args.paragraphs // 2):
+        changed = list(paragraphs)
+        for i in range(edited):
+            changed[i * len(paragraphs) // edited] += " Edited."
+        text = "\n\n".join(changed)
+
+        start = time.perf_counter()
+        translate(text, "English", "French", "general", provider="fake")
+        full = time.perf_counter() - start
+
+        start = time.perf_counter()
+        output, _alignment, sent = translate_incremental(
+            text, "English", "French", "general", alignment, provider="fake"
+        )
+        incremental = time.perf_counter() - start
+        assert output.count("\n\n") == text.count("\n\n")
+        print(f"{edited:>7}{full:>9.2f}{incremental:>15.2f}{sent:>6}")
+
+
+def bench_fanout(args: argparse.Namespace) -> None:
+    """One text into many languages: a translate() per target vs one fan-out job."""
+    from fan_out import translate_fan_out
+    from translation_cache import TranslationCache
+
+    targets = ["Hindi", "French", "German", "Spanish", "Chinese", "Japanese", "Arabic",
+               "Italian", "Russian", "Korean", "Portuguese", "English"][: args.targets]
+    llm = FakeTranslationLLM(latency=args.latency, token_latency=args.token_latency)
+    register_provider("fake", lambda model, temperature: llm)
+    texts = {
+        "short string": "Save your changes before closing the {app_name} window.",
+        "paragraph": " ".join([SAMPLE_TEXT] * 6),
+        "document": "\n\n".join(f"{i}. " + " ".join([SAMPLE_TEXT] * 8) for i in range(args.paragraphs)),
+    }
+
+    print(f"{len(targets)} target languages, fake latency {args.latency * 1000:.0f} ms "
+          f"+ {args.token_latency * 1000:.1f} ms/token\n")
+    print(f"{'input':<14}{'strategy':<18}{'calls':>7}{'prompt tok':>12}{'wall s':>9}")
+    for label, text in texts.items():
+        rows: List[Tuple[str, Callable[[], Any]]] = [
+            ("translate() each", lambda: [translate(text, "auto", t, "general", provider="fake") for t in targets]),
+            ("fan-out", lambda: translate_fan_out(
+                text, "auto", targets, provider="fake", cache=TranslationCache(path=None)
+            )),
+        ]
+        for strategy, run in rows:
+            calls, tokens = llm.calls, llm.prompt_tokens
+            start = time.perf_counter()
+            run()
+            wall = time.perf_counter() - start
+            print(f"{label:<14}{strategy:<18}{llm.calls - calls:>7}{llm.prompt_tokens - tokens:>12}{wall:>9.2f}")
+
+
+def bench_glossary(args: argparse.Namespace) -> None:
+    """Term lookup in a large glossary, and enforcement on translated strings."""
+    from glossary import Glossary, clear_glossaries, missing_terms, register_glossary
+
+    rng = random.Random(args.seed)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+
+    def word() -> str:
+        return "".join(rng.choice(letters) for _ in range(rng.randint(3, 9)))
+
+    vocabulary = [word() for _ in range(args.terms // 2)]
+    sources = set()
+    while len(sources) < args.terms:
+        sources.add(" ".join(rng.choice(vocabulary) for _ in range(rng.randint(1, 3))))
+    start = time.perf_counter()
+    glossary = Glossary("English", "French", ((source, source.upper()) for source in sources))
+    glossary.find("")
+    print(f"{args.terms} terms compiled in {time.perf_counter() - start:.2f} s\n")
+
+    common = [word() for _ in range(2000)]
+
+    def text_of(words: int) -> str:
+        # ~3% of the words come from the glossary's vocabulary.
+        return " ".join(rng.choice(vocabulary) if rng.random() < 0.03 else rng.choice(common) for _ in range(words))
+
+    print(f"{'input':<16}{'terms':>6}{'p50 ms':>9}{'p99 ms':>9}{'scan all terms ms':>19}")
+    for words in (20, 100, 400, 1500):
+        text = text_of(words)
+        samples = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            found = glossary.find(text)
+            samples.append(time.perf_counter() - start)
+        lowered = text.lower()
+        start = time.perf_counter()
+        [source for source in sources if source in lowered]
+        naive = time.perf_counter() - start
+        print(f"{f'{words} words':<16}{len(found):>6}{_percentile(samples, 50) * 1000:>9.3f}"
+              f"{_percentile(samples, 99) * 1000:>9.3f}{naive * 1000:>19.1f}")
+
+    llm = FakeTranslationLLM(term_miss_rate=args.miss_rate, seed=args.seed)
+    register_provider("fake", lambda model, temperature: llm)
+    register_glossary(glossary)
+    try:
+        items = [
+            {"text": text_of(12), "source_lang": "English", "target_lang": "French"}
+            for _ in range(args.strings)
+        ]
+        outputs = translate_batch(items, provider="fake")
+    finally:
+        clear_glossaries()
+    enforced = sum(len(glossary.terms_in(item["text"])) for item in items)
+    final = sum(
+        len(missing_terms(output, glossary.terms_in(item["text"]))) for item, output in zip(items, outputs)
+    )
+    print(f"\n{args.strings} strings, {enforced} glossary terms; the fake ignores "
+          f"{args.miss_rate:.0%} of terms not marked as required")
+    print(f"{llm.calls} calls ({llm.calls - args.strings} retries), {glossary.missed} terms missed "
+          f"by an answer, {final} missing from the returned translations")
+
+
+def bench_quality(args: argparse.Namespace) -> None:
+    """Cost of the local quality checks, and bad answers returned with and without the gate."""
+    import quality
+    from protected_spans import mask, restore
+
+    from fake_llm import fake_translate
+
+    templates = [
+        "Your order {order_id} has shipped and should arrive within three business days.",
+        "Click <b>Save</b> to keep your changes, or Cancel to discard them.",
+        "We could not reach https://status.example.com, please check your network connection.",
+        "The quarterly report is due on Friday; send questions to %s before noon.",
+    ]
+    targets = ["French", "German", "Hindi", "Japanese"]
+    sources = [f"{templates[i % len(templates)]} ({i % 50})" for i in range(args.strings)]
+    langs = [targets[i % len(targets)] for i in range(args.strings)]
+    outputs = []
+    for source, lang in zip(sources, langs):
+        masked = mask(source)
+        outputs.append(restore(fake_translate(masked.text, lang), masked.spans))
+
+    samples = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        quality.check_batch(sources, outputs, langs)
+        samples.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    flagged = sum(bool(quality.check_translation(*row)) for row in zip(sources, outputs, langs))
+    single = time.perf_counter() - start
+    print(f"{args.strings} answers, {len({*sources})} distinct sources: check_batch "
+          f"{_percentile(samples, 50) / args.strings * 1e6:.1f} us/answer (p50), one by one "
+          f"{single / args.strings * 1e6:.1f} us/answer; {flagged} good answers flagged\n")
+
+    items = [{"text": t, "source_lang": "English", "target_lang": lang} for t, lang in zip(sources, langs)]
+    print(f"fake spoils {args.bad_rate:.0%} of answers, retry budget {args.budget:.0%} of answers\n")
+    print(f"{'gate':<7}{'calls':>7}{'spoiled':>9}{'bad returned':>14}{'retries':>9}{'wall s':>9}")
+    for gated in (False, True):
+        llm = FakeTranslationLLM(bad_answer_rate=args.bad_rate, seed=args.seed)
+        translator_agent.QUALITY_GATE = gated
+        register_provider("fake", lambda model, temperature: llm)
+        budget = quality.QualityBudget(args.budget)
+        if gated:
+            # Each gate has its own budget; give this run's gate a fresh one.
+            chain = translator_agent.get_translation_chain(
+                translator_agent.DEFAULT_MODEL,
+                translator_agent.DEFAULT_TEMPERATURE,
+                "fake",
+                translator_agent.prompt_name_for(None, "general"),
+            )
+            chain.budget = budget
+        start = time.perf_counter()
+        results = translate_batch(items, provider="fake")
+        wall = time.perf_counter() - start
+        bad = sum(bool(quality.check_translation(s, r, lang)) for s, r, lang in zip(sources, results, langs))
+        print(f"{'on' if gated else 'off':<7}{llm.calls:>7}{llm.bad_answers:>9}{bad:>14}"
+              f"{budget.retries:>9}{wall:>9.2f}")
+    translator_agent.QUALITY_GATE = True
+    print(f"\nfirst answers failing each check: {budget.stats()['issues']}")
+
+
+def _typing_session(paragraphs: int, edits: int) -> List[str]:
+    """Successive versions of a document whose last paragraph is being typed."""
+    done = [f"{i}. {SAMPLE_TEXT}" for i in range(paragraphs - 1)]
+    words = " ".join([SAMPLE_TEXT] * (edits // len(SAMPLE_TEXT.split()) + 1)).split()
+    return ["\n\n".join(done + [" ".join(words[: i + 1])]) for i in range(edits)]
+
+
+def bench_live(args: argparse.Namespace) -> None:
+    """Translate-as-you-type: a request per edit vs debounced, cancellable jobs."""
+    from live_translation import LiveTranslator
+    from translator_agent import atranslate_incremental, translate_incremental
+
+    versions = _typing_session(args.paragraphs, args.edits)
+    llm = FakeTranslationLLM(latency=args.latency, token_latency=args.token_latency)
+    register_provider("fake", lambda model, temperature: llm)
+
+    # The finished paragraphs were translated before the session started.
+    primed = translate_incremental(versions[0], "English", "French", "general", None, provider="fake")[1]
+
+    def pauses() -> List[float]:
+        # Steady typing with an occasional pause to think.
+        rng = random.Random(args.seed)
+        return [args.pause if rng.random() < 0.1 else args.interval for _ in versions]
+
+    async def every_edit() -> float:
+        previous = primed
+        tasks = []
+        for text, pause in zip(versions, pauses()):
+            tasks.append(asyncio.ensure_future(atranslate_incremental(
+                text, "English", "French", "general", previous, provider="fake"
+            )))
+            await asyncio.sleep(pause)
+            if tasks[-1].done():
+                previous = tasks[-1].result()[1]
+        last_edit = time.perf_counter() - pauses()[-1]
+        await asyncio.gather(*tasks)
+        return time.perf_counter() - last_edit
+
+    def live(debounce: float) -> Tuple[float, Dict[str, int]]:
+        translator = LiveTranslator(debounce=debounce, provider="fake")
+        translator.alignment = primed
+        for text, pause in zip(versions, pauses()):
+            translator.submit(text, "English", "French", "general")
+            time.sleep(pause)
+        last_edit = time.perf_counter() - pauses()[-1]
+        result = translator.wait(timeout=60)
+        assert result is not None and result.text == versions[-1] and result.error is None
+        return time.perf_counter() - last_edit, translator.stats
+
+    print(f"{args.edits} edits to the last of {args.paragraphs} paragraphs, one every "
+          f"{args.interval * 1000:.0f} ms (10% pauses of {args.pause * 1000:.0f} ms), "
+          f"fake latency {args.latency * 1000:.0f} ms + {args.token_latency * 1000:.1f} ms/token\n")
+    print(f"{'strategy':<26}{'calls':>7}{'cancelled':>11}{'answered':>10}{'final s':>9}")
+    rows: List[Tuple[str, Callable[[], float]]] = [
+        ("request per edit", lambda: asyncio.run(every_edit())),
+        ("cancel stale, no debounce", lambda: live(0.0)[0]),
+        (f"debounce {args.debounce * 1000:.0f} ms + cancel", lambda: live(args.debounce)[0]),
+    ]
+    for label, run in rows:
+        calls, cancelled = llm.calls, llm.cancelled
+        final = run()
+        calls, cancelled = llm.calls - calls, llm.cancelled - cancelled
+        print(f"{label:<26}{calls:>7}{cancelled:>11}{calls - cancelled:>10}{final:>9.2f}")
+
+
+_STARTUP_SCRIPT = """
+import os, sys, time
+os.environ.setdefault("GROQ_API_KEY", "benchmark-dummy-key")
+start = time.perf_counter()
+import translator_agent
+imported = time.perf_counter()
+if sys.argv[1] == "warm":
+    translator_agent.warm_up()
+    time.sleep(float(sys.argv[2]))  # the user reading the page
+first = time.perf_counter()
+translator_agent.get_translation_chain()
+print(imported - start, time.perf_counter() - first)
+"""
+
+
+def bench_startup(args: argparse.Namespace) -> None:
+    """Import time and first-chain latency in fresh interpreters."""
+    import subprocess
+
+    print(f"median of {args.runs} fresh processes\n")
+    print(f"{'mode':<22}{'import ms':>11}{'first chain ms':>16}")
+    for mode in ("cold", "warm"):
+        rows = []
+        for _ in range(args.runs):
+            out = subprocess.run(
+                [sys.executable, "-c", _STARTUP_SCRIPT, mode, str(args.think_time)],
+                capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+            ).stdout.split()
+            rows.append((float(out[0]), float(out[1])))
+        label = "no warm-up" if mode == "cold" else f"warm_up() + {args.think_time:.0f}s idle"
+        imported = statistics.median(r[0] for r in rows) * 1000
+        first = statistics.median(r[1] for r in rows) * 1000
+        print(f"{label:<22}{imported:>11.0f}{first:>16.0f}")
+
+
+# -------------------- Suite --------------------
+SHORT_STRINGS = [
+    "Save changes?",
+    "Your password has been updated.",
+    "Unable to connect to the server. Check your network and try again.",
+    "Delete {count} selected files?",
+    "Last sync: {date}",
+    "Invite your team to collaborate on this project.",
+    "Payment received, thank you for your order!",
+    "This field is required.",
+]
+MIXED_STRINGS = {
+    "English": ["The meeting has been moved to Thursday afternoon.", "Please review the attached invoice."],
+    "French": ["La réunion a été déplacée à jeudi après-midi.", "Merci de vérifier la facture jointe."],
+    "German": ["Das Treffen wurde auf Donnerstagnachmittag verschoben.", "Bitte prüfen Sie die beigefügte Rechnung."],
+    "Spanish": ["La reunión se ha trasladado al jueves por la tarde.", "Por favor, revise la factura adjunta."],
+}
+
+
+def _suite_workloads(args: argparse.Namespace) -> Dict[str, Tuple[Callable[[Any], Any], List[Any]]]:
+    """Workload name -> (call, inputs); inputs depend only on the seed."""
+    from translation_cache import TranslationCache, cached_translate
+
+    rng = random.Random(args.seed)
+    n = args.requests
+
+    short = [f"{rng.choice(SHORT_STRINGS)} ({i})" for i in range(n)]
+
+    paragraph = " ".join([SAMPLE_TEXT] * 6)
+    documents = ["\n\n".join(f"{i}. {paragraph}" for i in range(args.paragraphs)) for _ in range(args.documents)]
+
+    unique = [f"{rng.choice(SHORT_STRINGS)} [{i}]" for i in range(max(1, n // 10))]
+    weights = [1 / (rank + 1) for rank in range(len(unique))]  # Zipf-like popularity
+    repeated = rng.choices(unique, weights, k=n)
+    cache = TranslationCache(":memory:")
+
+    mixed = []
+    for i in range(n):
+        language = rng.choice(list(MIXED_STRINGS))
+        text = rng.choice(MIXED_STRINGS[language])
+        if i % 5 == 0:  # some inputs switch language between paragraphs
+            other = rng.choice(list(MIXED_STRINGS))
+            text += "\n\n" + rng.choice(MIXED_STRINGS[other])
+        mixed.append(text)
+
+    return {
+        "short_burst": (lambda text: translate(text, "English", "German", "software", provider="fake"), short),
+        "long_document": (
+            lambda text: translate_long_document(
+                text, "English", "German", "general", max_chunk_tokens=400, max_workers=4, provider="fake"
+            ),
+            documents,
+        ),
+        "repeated": (
+            lambda text: cached_translate(text, "English", "German", "software", cache=cache, provider="fake"),
+            repeated,
+        ),
+        "mixed_languages": (lambda text: translate(text, "auto", "French", "general", provider="fake"), mixed),
+    }
+
+
+def _run_workload(call: Callable[[Any], Any], inputs: List[Any], concurrency: int) -> Dict[str, Any]:
+    def timed(value: Any) -> Tuple[float, bool]:
+        start = time.perf_counter()
+        try:
+            call(value)
+        except Exception:
+            return time.perf_counter() - start, False
+        return time.perf_counter() - start, True
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(timed, inputs))
+    wall = time.perf_counter() - start
+    samples = [seconds for seconds, _ok in results]
+    return {
+        "requests": len(inputs),
+        "failed": sum(not ok for _seconds, ok in results),
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(len(inputs) / wall, 2),
+        "p50_ms": round(_percentile(samples, 50) * 1000, 1),
+        "p95_ms": round(_percentile(samples, 95) * 1000, 1),
+        "p99_ms": round(_percentile(samples, 99) * 1000, 1),
+    }
+
+
+def _compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> bool:
+    """Print changes against `baseline`; False if anything regressed."""
+    ok = True
+    print(f"\n{'workload':<17}{'req/s':>16}{'p95 ms':>18}")
+    for name, row in report["workloads"].items():
+        old = baseline.get("workloads", {}).get(name)
+        if old is None:
+            print(f"{name:<17}{'(new)':>16}")
+            continue
+        speed = row["throughput_rps"] / old["throughput_rps"] - 1
+        latency = row["p95_ms"] / old["p95_ms"] - 1 if old["p95_ms"] else 0.0
+        regressed = speed < -tolerance or latency > tolerance
+        ok = ok and not regressed
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<17}{old['throughput_rps']:>7.1f} {speed:>+7.1%}{old['p95_ms']:>9.1f} {latency:>+7.1%}{flag}")
+    return ok
+
+
+def bench_suite(args: argparse.Namespace) -> None:
+    """Standard workloads against a seeded fake; table, JSON and comparison."""
+    from instrumentation import METRICS
+    from rate_limit import configure_limits
+
+    fake_settings = {
+        "latency": args.latency,
+        "latency_distribution": args.distribution,
+        "latency_sigma": args.sigma,
+        "token_latency": 1 / args.tokens_per_second if args.tokens_per_second else 0.0,
+        "error_rate": args.error_rate,
+        "seed": args.seed,
+    }
+    report: Dict[str, Any] = {"config": dict(fake_settings, requests=args.requests, concurrency=args.concurrency),
+                              "workloads": {}}
+    selected = set(args.workloads.split(",")) if args.workloads else None
+
+    print(f"{'workload':<17}{'req':>6}{'fail':>6}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'calls':>7}{'tok/req':>9}")
+    for name, (call, inputs) in _suite_workloads(args).items():
+        if selected is not None and name not in selected:
+            continue
+        llm = FakeTranslationLLM(**fake_settings)
+        register_provider("fake", lambda model, temperature: llm)
+        configure_limits("fake", base_delay=0.05, initial_concurrency=args.concurrency)
+        translator_agent.clear_translation_chains()
+        METRICS.reset()
+
+        row = _run_workload(call, inputs, args.concurrency)
+        row.update(
+            llm_calls=llm.calls,
+            prompt_tokens=llm.prompt_tokens,
+            completion_tokens=llm.completion_tokens,
+            injected_errors=llm.errors,
+            stages=METRICS.summary(),
+        )
+        report["workloads"][name] = row
+        tokens = (llm.prompt_tokens + llm.completion_tokens) / row["requests"]
+        print(f"{name:<17}{row['requests']:>6}{row['failed']:>6}{row['throughput_rps']:>9.1f}"
+              f"{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}{llm.calls:>7}{tokens:>9.1f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nreport written to {args.json}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if not _compare(report, baseline, args.tolerance):
+            sys.exit(1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    chain = sub.add_parser("chain", help="chain construction overhead per call")
+    chain.add_argument("--calls", type=int, default=500)
+    chain.set_defaults(func=bench_chain)
+
+    chunked = sub.add_parser("chunked", help="long-document chunking with parallel dispatch")
+    chunked.add_argument("--paragraphs", type=int, default=40)
+    chunked.add_argument("--chunk-tokens", type=int, default=400)
+    chunked.add_argument("--overlap", type=int, default=1)
+    chunked.add_argument("--workers", type=int, default=4)
+    chunked.add_argument("--latency", type=float, default=0.2, help="fixed seconds per call")
+    chunked.add_argument("--token-latency", type=float, default=0.0005, help="seconds per output token")
+    chunked.set_defaults(func=bench_chunked)
+
+    service = sub.add_parser("service", help="load test of the HTTP service with a stub LLM")
+    service.add_argument("--requests", type=int, default=2000)
+    service.add_argument("--clients", type=int, default=200)
+    service.add_argument("--unique", type=int, default=300, help="distinct texts in the workload")
+    service.add_argument("--in-flight", type=int, default=16)
+    service.add_argument("--queue", type=int, default=64)
+    service.add_argument("--latency", type=float, default=0.05)
+    service.add_argument("--backoff", type=float, default=0.05, help="client wait after a 429")
+    service.set_defaults(func=bench_service)
+
+    packed = sub.add_parser("pack", help="micro-batching of short strings")
+    packed.add_argument("--strings", type=int, default=500)
+    packed.add_argument("--pack-items", type=int, default=25)
+    packed.add_argument("--concurrency", type=int, default=8)
+    packed.add_argument("--latency", type=float, default=0.1)
+    packed.add_argument("--token-latency", type=float, default=0.001)
+    packed.add_argument("--drop-rate", type=float, default=0.02, help="packed lines the fake loses")
+    packed.set_defaults(func=bench_pack)
+
+    ratelimit = sub.add_parser("ratelimit", help="pacing, retries and AIMD against a throttling stub")
+    ratelimit.add_argument("--requests", type=int, default=400)
+    ratelimit.add_argument("--concurrency", type=int, default=32)
+    ratelimit.add_argument("--provider-concurrency", type=int, default=6, help="stub answers 429 above this")
+    ratelimit.add_argument("--error-rate", type=float, default=0.02, help="share of random 503s")
+    ratelimit.add_argument("--retry-after", type=float, default=None)
+    ratelimit.add_argument("--rpm", type=float, default=0, help="client-side requests/minute (0 = off)")
+    ratelimit.add_argument("--latency", type=float, default=0.05)
+    ratelimit.set_defaults(func=bench_ratelimit)
+
+    route = sub.add_parser("route", help="latency-aware routing and failover across fake providers")
+    route.add_argument("--requests", type=int, default=400)
+    route.add_argument("--concurrency", type=int, default=16)
+    route.add_argument("--quality-share", type=float, default=0.3, help="share of legal-domain requests")
+    route.add_argument("--latency", type=float, default=0.02, help="latency of the small model")
+    route.add_argument("--cooldown", type=float, default=30.0, help="seconds a failing route is skipped")
+    route.set_defaults(func=bench_route)
+
+    hedge = sub.add_parser("hedge", help="hedged requests against a heavy-tailed fake")
+    hedge.add_argument("--requests", type=int, default=2000)
+    hedge.add_argument("--concurrency", type=int, default=32)
+    hedge.add_argument("--latency", type=float, default=0.05)
+    hedge.add_argument("--jitter", type=float, default=0.02)
+    hedge.add_argument("--tail-rate", type=float, default=0.03, help="share of very slow calls")
+    hedge.add_argument("--tail-latency", type=float, default=1.0, help="extra seconds for a slow call")
+    hedge.add_argument("--percentile", type=float, default=95.0, help="hedge after this latency percentile")
+    hedge.add_argument("--budget", type=float, default=0.1, help="max backups per primary call")
+    hedge.set_defaults(func=bench_hedge)
+
+    detect = sub.add_parser("detect", help="local language detection on auto-source traffic")
+    detect.add_argument("--strings", type=int, default=1000)
+    detect.add_argument("--same-share", type=float, default=0.4, help="share already in the target language")
+    detect.add_argument("--concurrency", type=int, default=16)
+    detect.add_argument("--latency", type=float, default=0.05)
+    detect.set_defaults(func=bench_detect)
+
+    protect = sub.add_parser("protect", help="masking of code, URLs, placeholders and numbers")
+    protect.add_argument("--strings", type=int, default=300)
+    protect.set_defaults(func=bench_protect)
+
+    prompts = sub.add_parser("prompts", help="prompt tokens of the verbose vs compact templates")
+    prompts.add_argument("--strings", type=int, default=200)
+    prompts.set_defaults(func=bench_prompts)
+
+    edit = sub.add_parser("edit", help="incremental re-translation of an edited document")
+    edit.add_argument("--paragraphs", type=int, default=30)
+    edit.add_argument("--latency", type=float, default=0.1)
+    edit.add_argument("--token-latency", type=float, default=0.002)
+    edit.set_defaults(func=bench_edit)
+
+    glossary = sub.add_parser("glossary", help="glossary term lookup and enforcement")
+    glossary.add_argument("--terms", type=int, default=100000)
+    glossary.add_argument("--repeat", type=int, default=200)
+    glossary.add_argument("--strings", type=int, default=300)
+    glossary.add_argument("--miss-rate", type=float, default=0.2, help="share of unmarked terms the fake ignores")
+    glossary.add_argument("--seed", type=int, default=0)
+    glossary.set_defaults(func=bench_glossary)
+
+    quality = sub.add_parser("quality", help="local quality checks and gated retries")
+    quality.add_argument("--strings", type=int, default=1000)
+    quality.add_argument("--repeat", type=int, default=20)
+    quality.add_argument("--bad-rate", type=float, default=0.05, help="share of answers the fake spoils")
+    quality.add_argument("--budget", type=float, default=0.1, help="retries per checked answer")
+    quality.add_argument("--seed", type=int, default=0)
+    quality.set_defaults(func=bench_quality)
+
+    fanout = sub.add_parser("fanout", help="one text into many target languages")
+    fanout.add_argument("--targets", type=int, default=12)
+    fanout.add_argument("--paragraphs", type=int, default=20, help="paragraphs of the document input")
+    fanout.add_argument("--latency", type=float, default=0.2)
+    fanout.add_argument("--token-latency", type=float, default=0.002)
+    fanout.set_defaults(func=bench_fanout)
+
+    live = sub.add_parser("live", help="translate-as-you-type with debouncing and cancellation")
+    live.add_argument("--edits", type=int, default=40)
+    live.add_argument("--paragraphs", type=int, default=8)
+    live.add_argument("--interval", type=float, default=0.15, help="seconds between edits")
+    live.add_argument("--pause", type=float, default=1.0, help="seconds of an occasional pause")
+    live.add_argument("--debounce", type=float, default=0.4)
+    live.add_argument("--latency", type=float, default=0.3)
+    live.add_argument("--token-latency", type=float, default=0.004)
+    live.add_argument("--seed", type=int, default=0)
+    live.set_defaults(func=bench_live)
+
+    startup = sub.add_parser("startup", help="import time and first-request latency of a fresh process")
+    startup.add_argument("--runs", type=int, default=5)
+    startup.add_argument("--think-time", type=float, default=2.0, help="idle seconds after warm_up()")
+    startup.set_defaults(func=bench_startup)
+
+    suite = sub.add_parser("suite", help="standard workloads with JSON report and regression check")
+    suite.add_argument("--requests", type=int, default=400, help="requests per short-string workload")
+    suite.add_argument("--documents", type=int, default=4)
+    suite.add_argument("--paragraphs", type=int, default=30, help="paragraphs per long document")
+    suite.add_argument("--concurrency", type=int, default=16)
+    suite.add_argument("--latency", type=float, default=0.05, help="seconds per call (median/mean)")
+    suite.add_argument("--distribution", choices=LATENCY_DISTRIBUTIONS, default="lognormal")
+    suite.add_argument("--sigma", type=float, default=0.5, help="spread of the lognormal distribution")
+    suite.add_argument("--tokens-per-second", type=float, default=500.0, help="fake generation speed (0 = instant)")
+    suite.add_argument("--error-rate", type=float, default=0.01, help="share of calls failing with 503")
+    suite.add_argument("--seed", type=int, default=0)
+    suite.add_argument("--workloads", default="", help="comma-separated subset (default: all)")
+    suite.add_argument("--json", help="write the report to this file")
+    suite.add_argument("--compare", help="baseline report to compare against")
+    suite.add_argument("--tolerance", type=float, default=0.15, help="allowed relative regression")
+    suite.set_defaults(func=bench_suite)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,382 @@
+# bulk_translate.py
+"""Translate JSONL / CSV / gettext .po files from the command line.
+
+Input is streamed record by record and output is written as it goes, so
+file size is not limited by memory. Progress is checkpointed after every
+window; re-running the same command after an interruption resumes where
+it stopped instead of paying for finished rows again. The checkpoint
+never moves past a record whose translation failed: a run with failures
+keeps it and exits with status 1, and the next run starts again at the
+first failed record (rows translated after it come from the cache).
+An existing output without a checkpoint is only overwritten with --force.
+
+Usage:
+    python bulk_translate.py strings.jsonl --target French -o strings.fr.jsonl
+    python bulk_translate.py catalog.csv --target German --text-field source
+    python bulk_translate.py messages.po --source English --target Hindi --concurrency 16
+"""
+import argparse
+import asyncio
+import contextlib
+import csv
+import json
+import os
+import sys
+from itertools import islice
+from typing import Any, Dict, IO, Iterator, List, Optional, Tuple
+
+from micro_batch import atranslate_packed
+from translation_cache import DEFAULT_CACHE_PATH, TranslationCache, make_key
+from translator_agent import DEFAULT_MODEL, DEFAULT_PROVIDER, atranslate_batch
+
+
+# -------------------- Formats --------------------
+class JsonlFormat:
+    def __init__(self, text_field: str, output_field: str):
+        self.text_field = text_field
+        self.output_field = output_field
+
+    def read(self, fh: IO[str]) -> Iterator[Any]:
+        for line in fh:
+            if line.strip():
+                yield json.loads(line)
+
+    def texts(self, record: Dict[str, Any]) -> List[str]:
+        text = record.get(self.text_field)
+        return [text] if isinstance(text, str) and text.strip() else []
+
+    def write_header(self, fh: IO[str]) -> None:
+        pass
+
+    def write(self, fh: IO[str], record: Dict[str, Any], translations: List[Optional[str]]) -> None:
+        if translations:
+            record[self.output_field] = translations[0]
+        fh.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+class CsvFormat(JsonlFormat):
+    def __init__(self, text_field: str, output_field: str):
+        super().__init__(text_field, output_field)
+        self.fieldnames: List[str] = []
+
+    def read(self, fh: IO[str]) -> Iterator[Any]:
+        reader = csv.DictReader(fh)
+        self.fieldnames = list(reader.fieldnames or [])
+        if self.text_field not in self.fieldnames:
+            raise SystemExit(f"error: CSV has no column {self.text_field!r}")
+        if self.output_field not in self.fieldnames:
+            self.fieldnames.append(self.output_field)
+        yield from reader
+
+    def write_header(self, fh: IO[str]) -> None:
+        csv.writer(fh).writerow(self.fieldnames)
+
+    def write(self, fh: IO[str], record: Dict[str, Any], translations: List[Optional[str]]) -> None:
+        if translations:
+            record[self.output_field] = translations[0]
+        csv.DictWriter(fh, self.fieldnames, extrasaction="ignore").writerow(record)
+
+
+class PoEntry:
+    """One gettext entry. Comment lines are kept verbatim."""
+
+    __slots__ = ("comments", "msgctxt", "msgid", "msgid_plural", "msgstr")
+
+    def __init__(self) -> None:
+        self.comments: List[str] = []
+        self.msgctxt: Optional[str] = None
+        self.msgid: Optional[str] = None
+        self.msgid_plural: Optional[str] = None
+        self.msgstr: Dict[int, str] = {}
+
+
+def _po_unquote(value: str) -> str:
+    value = value.strip()
+    if len(value) < 2 or value[0] != '"' or value[-1] != '"':
+        raise ValueError(f"malformed PO string: {value!r}")
+    return (
+        value[1:-1]
+        .replace("\\\\", "\0")
+        .replace('\\"', '"')
+        .replace("\\n", "\n")
+        .replace("\\r", "\r")
+        .replace("\\t", "\t")
+        .replace("\0", "\\")
+    )
+
+
+def _po_quote(value: str, multiline: bool = False) -> str:
+    """A quoted PO string; values with inner line breaks (or `multiline`)
+    take the `""` + one quoted line per line form gettext writes."""
+    escaped = value.replace("\\", "\\\\").replace('"', '\\"').replace("\t", "\\t").replace("\r", "\\r")
+    if "\n" not in value[:-1] and not (multiline and "\n" in value):
+        return '"' + escaped.replace("\n", "\\n") + '"'
+    lines = escaped.split("\n")
+    parts = [line + "\\n" for line in lines[:-1]] + ([lines[-1]] if lines[-1] else [])
+    return '""\n' + "\n".join(f'"{part}"' for part in parts)
+
+
+class PoFormat:
+    def __init__(self, overwrite: bool):
+        self.overwrite = overwrite
+
+    def read(self, fh: IO[str]) -> Iterator[Any]:
+        entry = PoEntry()
+        field: Optional[str] = None
+        has_content = False
+
+        for raw in fh:
+            line = raw.rstrip("\n")
+            stripped = line.strip()
+            if not stripped:
+                if has_content:
+                    yield entry
+                entry, field, has_content = PoEntry(), None, False
+                continue
+            has_content = True
+            if stripped.startswith("#"):
+                entry.comments.append(line)
+                continue
+            if stripped.startswith('"'):
+                self._append(entry, field, _po_unquote(stripped))
+                continue
+            keyword, _, value = stripped.partition(" ")
+            field = keyword
+            self._append(entry, field, _po_unquote(value), new=True)
+        if has_content:
+            yield entry
+
+    @staticmethod
+    def _append(entry: PoEntry, field: Optional[str], value: str, new: bool = False) -> None:
+        if field in ("msgctxt", "msgid", "msgid_plural"):
+            current = None if new else getattr(entry, field)
+            setattr(entry, field, (current or "") + value)
+        elif field == "msgstr" or (field and field.startswith("msgstr[")):
+            index = 0 if field == "msgstr" else int(field[7:-1])
+            entry.msgstr[index] = ("" if new else entry.msgstr.get(index, "")) + value
+        else:
+            raise ValueError(f"unexpected PO keyword: {field!r}")
+
+    def texts(self, entry: PoEntry) -> List[str]:
+        if not entry.msgid:  # header entry or comment-only block
+            return []
+        if not self.overwrite and any(entry.msgstr.values()):
+            return []
+        return [entry.msgid] + ([entry.msgid_plural] if entry.msgid_plural else [])
+
+    def write_header(self, fh: IO[str]) -> None:
+        pass
+
+    def write(self, fh: IO[str], entry: PoEntry, translations: List[Optional[str]]) -> None:
+        if translations:
+            if entry.msgid_plural is None:
+                entry.msgstr = {0: translations[0] or ""}
+            else:
+                singular, plural = (translations + [None])[:2]
+                entry.msgstr = {
+                    i: (singular if i == 0 else plural) or ""
+                    for i in sorted(set(entry.msgstr) | {0, 1})
+                }
+        lines = list(entry.comments)
+        if entry.msgctxt is not None:
+            lines.append("msgctxt " + _po_quote(entry.msgctxt))
+        if entry.msgid is not None:
+            lines.append("msgid " + _po_quote(entry.msgid))
+        if entry.msgid_plural is not None:
+            lines.append("msgid_plural " + _po_quote(entry.msgid_plural))
+            for index, value in sorted(entry.msgstr.items()):
+                lines.append(f"msgstr[{index}] " + _po_quote(value))
+        elif entry.msgid is not None:
+            # The header (empty msgid) is always written one field per line.
+            lines.append("msgstr " + _po_quote(entry.msgstr.get(0, ""), multiline=not entry.msgid))
+        fh.write("\n".join(lines) + "\n\n")
+
+
+def _detect_format(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".jsonl", ".ndjson"):
+        return "jsonl"
+    if ext == ".csv":
+        return "csv"
+    if ext in (".po", ".pot"):
+        return "po"
+    raise SystemExit(f"error: cannot guess format of {path!r}; pass --format")
+
+
+# -------------------- Checkpoints --------------------
+def _load_checkpoint(path: str, input_path: str) -> Dict[str, int]:
+    try:
+        with open(path, encoding="utf-8") as fh:
+            state = json.load(fh)
+    except FileNotFoundError:
+        return {"records_done": 0, "output_bytes": 0}
+    if state.get("input") != os.path.abspath(input_path):
+        raise SystemExit(f"error: {path} belongs to another input; delete it to start over")
+    return state
+
+
+def _save_checkpoint(path: str, input_path: str, records_done: int, output_bytes: int) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(
+            {
+                "input": os.path.abspath(input_path),
+                "records_done": records_done,
+                "output_bytes": output_bytes,
+            },
+            fh,
+        )
+    os.replace(tmp, path)
+
+
+# -------------------- Driver --------------------
+async def _translate_texts(
+    texts: List[str],
+    args: argparse.Namespace,
+    cache: Optional[TranslationCache],
+) -> Dict[str, Optional[str]]:
+    """Translate the distinct texts of one window; failures map to None."""
+    results: Dict[str, Optional[str]] = {}
+    todo = []
+    for text in dict.fromkeys(texts):
+        hit = cache.get(make_key(text, args.source, args.target, args.domain)) if cache else None
+        if hit is not None:
+            results[text] = hit
+        else:
+            todo.append(text)
+
+    batch = [
+        {"text": text, "source_lang": args.source, "target_lang": args.target, "domain": args.domain}
+        for text in todo
+    ]
+    if args.pack:
+        outputs: List[Any] = await atranslate_packed(
+            batch, max_concurrency=args.concurrency, provider=args.provider, model=args.model
+        )
+    else:
+        outputs = await atranslate_batch(
+            batch,
+            max_concurrency=args.concurrency,
+            provider=args.provider,
+            model=args.model,
+            return_exceptions=True,
+        )
+    for text, output in zip(todo, outputs):
+        if output is None or isinstance(output, BaseException):
+            print(f"warning: failed to translate {text[:60]!r}: {output}", file=sys.stderr)
+            results[text] = None
+            continue
+        results[text] = output
+        if cache:
+            cache.put(make_key(text, args.source, args.target, args.domain), output)
+    return results
+
+
+async def run(args: argparse.Namespace) -> Dict[str, int]:
+    fmt_name = args.format or _detect_format(args.input)
+    if fmt_name == "jsonl":
+        fmt: Any = JsonlFormat(args.text_field, args.output_field)
+    elif fmt_name == "csv":
+        fmt = CsvFormat(args.text_field, args.output_field)
+    else:
+        fmt = PoFormat(args.overwrite)
+
+    checkpoint_path = args.output + ".checkpoint"
+    if (
+        not os.path.exists(checkpoint_path)
+        and os.path.exists(args.output)
+        and os.path.getsize(args.output)
+        and not args.force
+    ):
+        raise SystemExit(f"error: {args.output} exists and has no checkpoint; pass --force to overwrite it")
+    state = _load_checkpoint(checkpoint_path, args.input)
+    done = state["records_done"]
+    cache = None if args.no_cache else TranslationCache(args.cache)
+    totals = {"records": done, "translated": 0, "failed": 0, "skipped": done}
+    resume_at: Optional[Tuple[int, int]] = None  # (records, output bytes) before the first failed record
+
+    newline = "" if fmt_name == "csv" else None
+    with open(args.input, encoding="utf-8", newline=newline) as src, open(
+        args.output, "a+", encoding="utf-8", newline=newline
+    ) as out:
+        # Drop anything written after the last checkpoint (a half-flushed window).
+        out.seek(state["output_bytes"])
+        out.truncate()
+
+        records = fmt.read(src)
+        if done:
+            print(f"resuming after {done} records", file=sys.stderr)
+            for _ in islice(records, done):
+                pass
+
+        while True:
+            window = list(islice(records, args.window))
+            if not window:
+                break
+            if out.tell() == 0:
+                fmt.write_header(out)  # CSV columns are known once a row was read
+            texts = [t for record in window for t in fmt.texts(record)]
+            translated = await _translate_texts(texts, args, cache) if texts else {}
+            for n, record in enumerate(window):
+                outputs = [translated[t] for t in fmt.texts(record)]
+                failed = sum(1 for o in outputs if o is None)
+                totals["translated"] += len(outputs) - failed
+                totals["failed"] += failed
+                if failed and resume_at is None:
+                    out.flush()
+                    resume_at = (done + n, out.tell())
+                fmt.write(out, record, outputs)
+            out.flush()
+            os.fsync(out.fileno())
+            done += len(window)
+            totals["records"] = done
+            if resume_at is None:
+                _save_checkpoint(checkpoint_path, args.input, done, out.tell())
+            elif resume_at[0] >= done - len(window):  # failed in this window
+                _save_checkpoint(checkpoint_path, args.input, *resume_at)
+
+    if resume_at is None:
+        # No window was written (empty input, or nothing left to resume).
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(checkpoint_path)
+    return totals
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Translate JSONL / CSV / .po files.")
+    parser.add_argument("input")
+    parser.add_argument("-o", "--output", help="default: <input>.<target><ext>")
+    parser.add_argument("--source", default="auto", help="source language (default: auto)")
+    parser.add_argument("--target", required=True, help="target language")
+    parser.add_argument("--domain", default="general", help="domain / context hint")
+    parser.add_argument("--format", choices=["jsonl", "csv", "po"])
+    parser.add_argument("--text-field", default="text", help="JSONL key / CSV column to translate")
+    parser.add_argument("--output-field", default="translation", help="JSONL key / CSV column to write")
+    parser.add_argument("--overwrite", action="store_true", help=".po: retranslate entries that have a msgstr")
+    parser.add_argument("--concurrency", type=int, default=8, help="model calls in flight")
+    parser.add_argument("--window", type=int, default=64, help="records per checkpoint")
+    parser.add_argument("--pack", action="store_true", help="send short strings several per prompt")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH, help="translation cache file")
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--force", action="store_true", help="overwrite an existing output that has no checkpoint")
+    parser.add_argument("--provider", default=DEFAULT_PROVIDER)
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    args = parser.parse_args(argv)
+
+    if args.output is None:
+        stem, ext = os.path.splitext(args.input)
+        args.output = f"{stem}.{args.target.lower()}{ext}"
+
+    totals = asyncio.run(run(args))
+    print(
+        f"done: {totals['records']} records, {totals['translated']} strings translated, "
+        f"{totals['failed']} failed, {totals['skipped']} resumed from checkpoint -> {args.output}",
+        file=sys.stderr,
+    )
+    if totals["failed"]:
+        print("re-run the same command to retry the failed records", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+# fake_llm.py
+"""Deterministic local chat model used by the benchmarks (no API calls)."""
+import asyncio
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Iterator, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+from segmentation import estimate_tokens
+
+_TEXT_BLOCK = re.compile(r"```text\n(.*)\n```", re.DOTALL)
+_FAN_OUT_TARGETS = re.compile(r"^Target languages: (.+)$", re.MULTILINE)
+_TERMS = re.compile(r"^(Terms|Required terms, use exactly): (.+)$", re.MULTILINE)
+_TARGET = re.compile(r"^(?:.* -> |Target language: )(.+)$", re.MULTILINE)
+# First letter of the script a target language is written in; letters
+# are shifted there so answers look like they are in that script.
+_SCRIPT_BASES = {"Hindi": 0x0905, "Arabic": 0x0628, "Russian": 0x0430, "Korean": 0xAC00, "Japanese": 0x3042, "Chinese": 0x4E00}
+_WORD = re.compile(r"[^\W\d_]+")
+_STREAM_PIECE = re.compile(r"\S+\s*|\s+")
+LATENCY_DISTRIBUTIONS = ("constant", "lognormal", "exponential")
+BAD_ANSWERS = ("commentary", "untranslated", "truncated", "fenced")
+
+
+def extract_text(prompt: str) -> str:
+    """Pull the text-to-translate out of the rendered human prompt."""
+    match = _TEXT_BLOCK.search(prompt)
+    return match.group(1) if match else prompt
+
+
+def fake_translate(text: str, target_lang: Optional[str] = None) -> str:
+    """'Translate' by reversing every word; digits and punctuation stay put.
+
+    For a target language with its own script, ASCII letters are moved
+    into that script.
+    """
+    reversed_words = _WORD.sub(lambda m: m.group(0)[::-1], text)
+    base = _SCRIPT_BASES.get(target_lang or "")
+    if base is None:
+        return reversed_words
+    return "".join(
+        chr(base + ord(ch.lower()) - ord("a")) if "a" <= ch.lower() <= "z" else ch for ch in reversed_words
+    )
+
+
+class FakeProviderError(Exception):
+    """Provider-style HTTP error raised by the throttling stub."""
+
+    def __init__(self, status_code: int, retry_after: Optional[float] = None):
+        super().__init__(f"fake provider error {status_code}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def _packed_items(text: str) -> Optional[List[dict]]:
+    """Parse a micro-batch block (one JSON object per line), else None."""
+    lines = [line for line in text.split("\n") if line.strip()]
+    if not lines or not all(line.lstrip().startswith("{") for line in lines):
+        return None
+    try:
+        items = [json.loads(line) for line in lines]
+    except ValueError:
+        return None
+    return items if all(isinstance(i, dict) and "text" in i for i in items) else None
+
+
+class FakeTranslationLLM(BaseChatModel):
+    """Chat model that answers with `fake_translate` of the input.
+
+    `latency` is the delay per call: fixed, or with `latency_distribution`
+    "lognormal" its median (spread `latency_sigma`) or "exponential" its
+    mean. `token_latency` adds a delay per output token, mimicking a
+    model that generates sequentially. Packed
+    prompts (JSON lines) and fan-out prompts (several target languages)
+    are answered line by line; `drop_rate` makes the model lose some of
+    those lines. Glossary terms in the prompt are used, except for a
+    `term_miss_rate` share of them when they are not marked as required.
+    A `bad_answer_rate` share of plain answers is spoiled the way real
+    models fail (see BAD_ANSWERS) and counted in `bad_answers`. `jitter` adds a uniform random delay
+    of up to that many seconds, and a `tail_rate` share of calls takes an
+    extra `tail_latency` (a heavy tail). Token usage is tallied in `calls`,
+    `prompt_tokens` and `completion_tokens`, and reported on each answer
+    (streams: in a last, empty chunk) like a real provider does.
+
+    Throttling can be injected like a real provider: more than
+    `max_concurrency` calls at once or more than `requests_per_second`
+    calls in any one-second window fail with a 429 `FakeProviderError`
+    (with `retry_after`), and `error_rate` makes a share of calls fail
+    with `error_status` (503). Rejections are counted in `throttled` and `errors`,
+    async calls cancelled before they answered in `cancelled`.
+    """
+
+    model_name: str = "fake-translation"
+    latency: float = 0.0
+    latency_distribution: str = "constant"
+    latency_sigma: float = 0.5
+    token_latency: float = 0.0
+    drop_rate: float = 0.0
+    jitter: float = 0.0
+    tail_rate: float = 0.0
+    tail_latency: float = 0.0
+    seed: int = 0
+    calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    max_concurrency: Optional[int] = None
+    requests_per_second: Optional[float] = None
+    error_rate: float = 0.0
+    error_status: int = 503
+    term_miss_rate: float = 0.0
+    bad_answer_rate: float = 0.0
+    retry_after: Optional[float] = None
+    throttled: int = 0
+    errors: int = 0
+    cancelled: int = 0
+    bad_answers: int = 0
+
+    _rng: random.Random = PrivateAttr(default=None)
+    _lock: threading.Lock = PrivateAttr(default=None)
+    _active: int = PrivateAttr(default=0)
+    _recent: Deque[float] = PrivateAttr(default=None)
+
+    def model_post_init(self, __context: Any) -> None:
+        self._rng = random.Random(self.seed)
+        self._lock = threading.Lock()
+        self._recent = deque()
+
+    def _admit(self) -> None:
+        """Start a call, or raise the error a real provider would send."""
+        with self._lock:
+            now = time.monotonic()
+            while self._recent and now - self._recent[0] >= 1.0:
+                self._recent.popleft()
+            over_rate = self.requests_per_second is not None and len(self._recent) >= self.requests_per_second
+            over_concurrency = self.max_concurrency is not None and self._active >= self.max_concurrency
+            if over_rate or over_concurrency:
+                self.throttled += 1
+                raise FakeProviderError(429, self.retry_after)
+            if self.error_rate and self._rng.random() < self.error_rate:
+                self.errors += 1
+                raise FakeProviderError(self.error_status)
+            self._recent.append(now)
+            self._active += 1
+
+    def _finish(self) -> None:
+        with self._lock:
+            self._active -= 1
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-translation"
+
+    def _respond(self, messages: List[BaseMessage]) -> AIMessage:
+        prompt = str(messages[-1].content)
+        block = extract_text(prompt)
+        items = _packed_items(block)
+        targets = _FAN_OUT_TARGETS.search(prompt)
+        target = _TARGET.search(prompt)
+        target_lang = target.group(1).strip() if target else None
+        if targets is not None:
+            # Fan-out prompt: one JSON line per "n=Language" target.
+            answers = []
+            for pair in targets.group(1).split("; "):
+                n, _, language = pair.partition("=")
+                if not (self.drop_rate and self._rng.random() < self.drop_rate):
+                    answers.append({"id": int(n), "text": fake_translate(block, language)})
+            text = "\n".join(json.dumps(answer, ensure_ascii=False) for answer in answers)
+        elif items is None:
+            text = fake_translate(block, target_lang)
+            terms = _TERMS.search(prompt)
+            if terms is not None:
+                text = self._apply_terms(text, terms.group(2), terms.group(1) != "Terms", target_lang)
+            if self.bad_answer_rate and self._rng.random() < self.bad_answer_rate:
+                self.bad_answers += 1
+                text = self._spoil(block, text)
+        else:
+            text = "\n".join(
+                json.dumps(dict(item, text=fake_translate(item["text"], target_lang)), ensure_ascii=False)
+                for item in items
+                if not (self.drop_rate and self._rng.random() < self.drop_rate)
+            )
+
+        prompt_tokens = sum(estimate_tokens(str(m.content)) for m in messages)
+        completion_tokens = estimate_tokens(text)
+        self.calls += 1
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        return AIMessage(
+            content=text,
+            usage_metadata={
+                "input_tokens": prompt_tokens,
+                "output_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+            response_metadata={"model_name": self.model_name},
+        )
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        self._admit()
+        try:
+            message = self._respond(messages)
+            delay = self._delay(message.content)
+            if delay:
+                time.sleep(delay)
+        finally:
+            self._finish()
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        self._admit()
+        try:
+            message = self._respond(messages)
+            delay = self._delay(message.content)
+            if delay:
+                await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self._finish()
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        self._admit()
+        try:
+            message = self._respond(messages)
+            first = self._first_delay()
+            if first:
+                time.sleep(first)
+            for piece in _STREAM_PIECE.findall(message.content):
+                if self.token_latency:
+                    time.sleep(self.token_latency * estimate_tokens(piece))
+                chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece))
+                if run_manager:
+                    run_manager.on_llm_new_token(piece, chunk=chunk)
+                yield chunk
+            # Like Groq and OpenAI, report usage in a last, empty chunk.
+            usage = AIMessageChunk(
+                content="",
+                usage_metadata=message.usage_metadata,
+                response_metadata=message.response_metadata,
+            )
+            yield ChatGenerationChunk(message=usage)
+        finally:
+            self._finish()
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        self._admit()
+        try:
+            message = self._respond(messages)
+            first = self._first_delay()
+            if first:
+                await asyncio.sleep(first)
+            for piece in _STREAM_PIECE.findall(message.content):
+                if self.token_latency:
+                    await asyncio.sleep(self.token_latency * estimate_tokens(piece))
+                chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece))
+                if run_manager:
+                    await run_manager.on_llm_new_token(piece, chunk=chunk)
+                yield chunk
+            # Like Groq and OpenAI, report usage in a last, empty chunk.
+            usage = AIMessageChunk(
+                content="",
+                usage_metadata=message.usage_metadata,
+                response_metadata=message.response_metadata,
+            )
+            yield ChatGenerationChunk(message=usage)
+        finally:
+            self._finish()
+
+    def _apply_terms(self, text: str, terms: str, required: bool, target_lang: Optional[str]) -> str:
+        """Use the glossary's translations, ignoring `term_miss_rate` of them unless required."""
+        for pair in terms.split("; "):
+            source, _, target = pair.partition(" = ")
+            if required or not (self.term_miss_rate and self._rng.random() < self.term_miss_rate):
+                text = re.sub(re.escape(fake_translate(source, target_lang)), lambda _m: target, text, flags=re.IGNORECASE)
+        return text
+
+    def _spoil(self, source: str, text: str) -> str:
+        kind = self._rng.choice(BAD_ANSWERS)
+        if kind == "commentary":
+            return f"Here is the translation:\n{text}"
+        if kind == "untranslated":
+            return source
+        if kind == "truncated":
+            return text[: len(text) // 5]
+        return f"```text\n{text}\n```"
+
+    def _first_delay(self) -> float:
+        delay = self.latency
+        if self.latency_distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution: {self.latency_distribution!r}")
+        if delay and self.latency_distribution == "lognormal":
+            delay = self._rng.lognormvariate(math.log(delay), self.latency_sigma)
+        elif delay and self.latency_distribution == "exponential":
+            delay = self._rng.expovariate(1 / delay)
+        if self.jitter:
+            delay += self._rng.uniform(0, self.jitter)
+        if self.tail_rate and self._rng.random() < self.tail_rate:
+            delay += self.tail_latency
+        return delay
+
+    def _delay(self, text: str) -> float:
+        return self._first_delay() + self.token_latency * estimate_tokens(text)
@@ -0,0 +1,265 @@
+# fan_out.py
+"""Translate one source text into many target languages in one job.
+
+Everything about the source is done once and shared by every target:
+the source language is detected once (lang_detect.plan_runs), the text
+is cut into chunks once (segmentation.chunk_text) and each chunk is
+masked once (protected_spans). The per-target work is then:
+
+- packed: a short text is sent once with several target languages, and
+  the model answers one JSON line per language (parsed like
+  micro_batch's packs), so the prompt and the source are paid for once
+  per pack instead of once per language;
+- single: longer texts, targets with glossary terms in the text (the
+  packed prompt carries no terms) and targets a pack did not answer
+  cleanly or whose packed answer fails quality's checks get one request
+  per (target, chunk), all sent concurrently.
+
+Finished targets go through the translation cache under the same keys
+as translation_cache.cached_translate, so a target translated before,
+either way, is not sent again.
+"""
+import asyncio
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from langchain_core.prompts import ChatPromptTemplate
+
+from glossary import Glossary, glossary_for
+from instrumentation import METRICS, span
+from lang_detect import plan_runs, same_language
+from micro_batch import parse_pack
+from prompts import DEFAULT_MODE, MODE_INSTRUCTIONS
+from protected_spans import Masked, mask, missing_sentinels, restore
+from quality import QualityBudget, retry_flags
+from segmentation import chunk_text, estimate_tokens, needs_translation
+from translation_cache import TranslationCache, get_default_cache, make_key
+import translator_agent  # QUALITY_GATE is read per call
+from translator_agent import (
+    DEFAULT_MODEL,
+    DEFAULT_PROVIDER,
+    DEFAULT_TEMPERATURE,
+    atranslate_batch,
+    get_translation_chain,
+    make_payload,
+    register_prompt,
+)
+
+FAN_OUT_SYSTEM_PROMPT = """
+You are a professional translation engine.
+Translate the user's text into every listed target language, using the domain/context for terminology.
+Keep meaning, tone, formatting and line breaks. Copy markers like ⟦0⟧ unchanged.
+Answer with exactly one JSON line per target language, in the listed order: {{"id": <number>, "text": <translation>}}
+Output ONLY the JSON lines, no commentary.
+"""
+
+FAN_OUT_HUMAN_PROMPT = """
+Source language: {source_lang}
+Target languages: {target_lang}
+Domain / Context: {domain}
+
+Text to translate:
+```text
+{text}
+```"""
+
+FAN_OUT_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        ("system", FAN_OUT_SYSTEM_PROMPT),
+        ("human", FAN_OUT_HUMAN_PROMPT),
+    ]
+)
+register_prompt("fan_out", FAN_OUT_PROMPT)
+
+
+class Unit(NamedTuple):
+    """A piece of the source shared by every target."""
+
+    masked: Masked
+    separator: str
+    source_lang: str
+    certain: bool  # source_lang is sure enough to keep text already in a target
+
+
+def plan_units(text: str, source_lang: str, max_chunk_tokens: int = 800) -> List[Unit]:
+    """Detect, chunk and mask `text` once for all targets."""
+    units: List[Unit] = []
+    # No target yet: runs are only split by language here, never kept.
+    for run in plan_runs(text, source_lang, ""):
+        chunks = chunk_text(run.text, max_chunk_tokens)
+        for i, chunk in enumerate(chunks):
+            separator = chunk.separator if i < len(chunks) - 1 else chunk.separator + run.separator
+            units.append(Unit(mask(chunk.text), separator, run.source_lang, run.certain))
+    return units
+
+
+def render_targets(targets: Sequence[str]) -> str:
+    """'1=French; 2=German'; ids are positions within the pack (1-based)."""
+    return "; ".join(f"{n}={target}" for n, target in enumerate(targets, start=1))
+
+
+def _domain_with_mode(domain: Optional[str], mode: Optional[str]) -> str:
+    # The packed prompt is shared by all modes; the mode rides along in the domain.
+    domain = (domain or "").strip() or "general"
+    instruction = MODE_INSTRUCTIONS.get(mode or DEFAULT_MODE, "")
+    return f"{domain}. {instruction}" if instruction else domain
+
+
+async def atranslate_fan_out(
+    text: str,
+    source_lang: str,
+    targets: Sequence[str],
+    domain: Optional[str] = None,
+    mode: Optional[str] = None,
+    max_pack_targets: int = 6,
+    max_pack_tokens: int = 800,
+    max_chunk_tokens: int = 800,
+    max_concurrency: int = 8,
+    provider: str = DEFAULT_PROVIDER,
+    model: str = DEFAULT_MODEL,
+    temperature: float = DEFAULT_TEMPERATURE,
+    cache: Optional[TranslationCache] = None,
+    glossary: Optional[Glossary] = None,
+) -> Dict[str, Optional[str]]:
+    """Translate `text` into each of `targets`; returns {target: translation}.
+
+    A target that still fails after its own request maps to None. Parts
+    of the text already in a target language are kept as they are.
+    `cache` defaults to the process-wide translation cache. `glossary`
+    is used for its own target instead of the registered one.
+    """
+    if cache is None:
+        cache = get_default_cache()
+    results: Dict[str, Optional[str]] = {}
+    keys = {
+        target: make_key(text, source_lang, target, domain, mode, glossary) for target in dict.fromkeys(targets)
+    }
+    with span("cache"):
+        for target, key in keys.items():
+            hit = cache.get(key)
+            METRICS.count_cache(hit is not None)
+            if hit is not None:
+                results[target] = hit
+    targets = [target for target in keys if target not in results]
+    if not targets:
+        return {target: results[target] for target in keys}
+
+    units = plan_units(text, source_lang, max_chunk_tokens)
+    done: Dict[Tuple[str, int], str] = {}  # (target, unit index) -> translation
+    todo: List[Tuple[str, int]] = []
+    for target in targets:
+        for i, unit in enumerate(units):
+            if (unit.certain and same_language(unit.source_lang, target)) or not needs_translation(unit.masked.text):
+                done[target, i] = unit.masked.text
+            else:
+                todo.append((target, i))
+
+    singles = todo
+    if len(units) == 1 and todo:
+        unit = units[0]
+        size = estimate_tokens(unit.masked.text) + 8  # JSON framing per answer line
+        per_pack = max(1, min(max_pack_targets, max_pack_tokens // size))
+        if per_pack > 1:
+            singles, pending = [], []
+            for target, _i in todo:
+                target_glossary = glossary_for(unit.source_lang, target, glossary)
+                if target_glossary is not None and target_glossary.terms_in(unit.masked.text):
+                    singles.append((target, 0))
+                else:
+                    pending.append(target)
+            packs = [pending[k:k + per_pack] for k in range(0, len(pending), per_pack)]
+            chain = get_translation_chain(model, temperature, provider, prompt_name="fan_out")
+            payloads = [
+                make_payload(unit.masked.text, unit.source_lang, render_targets(pack), _domain_with_mode(domain, mode))
+                for pack in packs
+            ]
+            outputs = await chain.abatch(
+                payloads, config={"max_concurrency": max_concurrency}, return_exceptions=True
+            )
+            answered: List[str] = []
+            for pack, output in zip(packs, outputs):
+                parsed = {} if isinstance(output, BaseException) else parse_pack(output, len(pack))
+                for n, target in enumerate(pack, start=1):
+                    if n in parsed and not missing_sentinels(parsed[n], unit.masked.spans):
+                        done[target, 0] = parsed[n]
+                        answered.append(target)
+                    else:
+                        singles.append((target, 0))
+            if answered and translator_agent.QUALITY_GATE:
+                # The fan_out chain has no QualityGate; failed answers go to the gated one.
+                source = restore(unit.masked.text, unit.masked.spans)
+                flags = retry_flags(
+                    QualityBudget(),
+                    [source] * len(answered),
+                    [restore(done[target, 0], unit.masked.spans) for target in answered],
+                    answered,
+                )
+                singles.extend((target, 0) for target, retry in zip(answered, flags) if retry)
+
+    if singles:
+        # Masked texts go through as they are: ProtectedChain leaves text
+        # that already holds sentinels alone, and they are checked below.
+        outputs = await atranslate_batch(
+            [
+                {
+                    "text": units[i].masked.text,
+                    "source_lang": units[i].source_lang,
+                    "target_lang": target,
+                    "domain": domain,
+                    "mode": mode,
+                    "glossary": glossary,
+                }
+                for target, i in singles
+            ],
+            max_concurrency,
+            provider,
+            model,
+            temperature,
+            return_exceptions=True,
+        )
+        retry = []
+        for (target, i), output in zip(singles, outputs):
+            if isinstance(output, BaseException) or missing_sentinels(output, units[i].masked.spans):
+                retry.append((target, i))
+            else:
+                done[target, i] = output.strip()
+        if retry:
+            # Last resort, as in ProtectedChain: send the unmasked text.
+            outputs = await atranslate_batch(
+                [
+                    {
+                        "text": restore(units[i].masked.text, units[i].masked.spans),
+                        "source_lang": units[i].source_lang,
+                        "target_lang": target,
+                        "domain": domain,
+                        "mode": mode,
+                        "glossary": glossary,
+                    }
+                    for target, i in retry
+                ],
+                max_concurrency,
+                provider,
+                model,
+                temperature,
+                return_exceptions=True,
+            )
+            for (target, i), output in zip(retry, outputs):
+                if not isinstance(output, BaseException):
+                    # Already unmasked; restore() below finds no sentinels in it.
+                    done[target, i] = output.strip()
+
+    for target in targets:
+        if any((target, i) not in done for i in range(len(units))):
+            results[target] = None
+            continue
+        results[target] = "".join(
+            restore(done[target, i], unit.masked.spans) + unit.separator for i, unit in enumerate(units)
+        )
+        cache.put(keys[target], results[target])
+    return {target: results[target] for target in keys}
+
+
+def translate_fan_out(
+    text: str, source_lang: str, targets: Sequence[str], **kwargs: Any
+) -> Dict[str, Optional[str]]:
+    """Blocking wrapper around `atranslate_fan_out`."""
+    return asyncio.run(atranslate_fan_out(text, source_lang, targets, **kwargs))
@@ -0,0 +1,328 @@
+# glossary.py
+"""Terminology enforcement: glossary terms found in a text go into its prompt.
+
+A `Glossary` holds the term base of one language pair (source term ->
+required translation), loaded from CSV/TSV and compiled into an
+Aho-Corasick automaton, so finding every term in a text costs one pass
+over the text however many terms there are. Matching is
+case-insensitive, respects word boundaries (except in scripts written
+without spaces) and keeps the leftmost-longest terms.
+
+translator_agent wraps the compact-prompt chains in `GlossaryChain`:
+only the terms present in a request are put into its prompt, and the
+answer is checked for their translations. An answer that misses some is
+asked for once more with the terms marked as required, and the better
+of the two answers is kept.
+
+A glossary is either registered for the whole process
+(`register_glossary`, e.g. a CLI's term base) or passed with a request
+as `input["glossary"]` (e.g. one a UI user uploaded), so it never
+applies to anyone else's requests.
+"""
+import csv
+import re
+import threading
+import time
+from typing import IO, Any, AsyncIterator, Dict, Iterable, Iterator, List, Mapping, NamedTuple, Optional, Tuple
+
+from langchain_core.runnables import Runnable, RunnableConfig
+
+from instrumentation import METRICS
+from lang_detect import AUTO, canonical_language
+
+
+class Term(NamedTuple):
+    source: str
+    target: str
+
+
+class TermMatch(NamedTuple):
+    start: int
+    end: int
+    term: Term
+
+
+# Words, and single characters of scripts written without spaces (kana,
+# Han), so terms always start and end on a word boundary in spaced text
+# and anywhere in Chinese or Japanese.
+_UNSPACED = "\u3040-\u30ff\u3400-\u9fff\uf900-\ufaff"
+_TOKEN = re.compile(f"[{_UNSPACED}]|[^\\W{_UNSPACED}]+")
+
+
+_GAP = re.compile(r"\s*|\s*[-‐'’]\s*")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+
+class _Automaton(NamedTuple):
+    goto: List[Dict[str, int]]  # node -> token -> child
+    fail: List[int]
+    output: List[Optional[Term]]  # term ending at the node
+    report: List[int]  # node, or nearest suffix node, that ends a term
+    depth: List[int]  # tokens from the root
+
+
+class Glossary:
+    """Term base of one language pair. Thread-safe; `add()` recompiles lazily."""
+
+    def __init__(self, source_lang: str, target_lang: str, terms: Iterable[Tuple[str, str]] = ()):
+        self.source_lang = source_lang
+        self.target_lang = target_lang
+        self.checked = 0  # terms verified in answers
+        self.missed = 0  # of which the answer lacked the translation
+        self._terms: Dict[Tuple[str, ...], Term] = {}  # source tokens -> term
+        self._lock = threading.Lock()
+        self._automaton: Optional[_Automaton] = None
+        for source, target in terms:
+            self.add(source, target)
+
+    def add(self, source: str, target: str) -> None:
+        source, target = source.strip(), target.strip()
+        key = tuple(tokenize(source))
+        if not key or not target:
+            return
+        with self._lock:
+            self._terms[key] = Term(source, target)
+            self._automaton = None
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    @classmethod
+    def from_csv(cls, fh: IO[str], source_lang: str, target_lang: str, delimiter: str = ",") -> "Glossary":
+        """Read (source, target) rows; a "source,target" header row is skipped."""
+        glossary = cls(source_lang, target_lang)
+        for row in csv.reader(fh, delimiter=delimiter):
+            if len(row) < 2 or row[0].startswith("#"):
+                continue
+            if not len(glossary) and (row[0].strip().lower(), row[1].strip().lower()) == ("source", "target"):
+                continue
+            glossary.add(row[0], row[1])
+        glossary._compile()  # pay for the automaton now, not on the first request
+        return glossary
+
+    @classmethod
+    def load(cls, path: str, source_lang: str, target_lang: str) -> "Glossary":
+        """`from_csv` on a file; .tsv files are tab-separated."""
+        with open(path, encoding="utf-8", newline="") as fh:
+            return cls.from_csv(fh, source_lang, target_lang, "\t" if path.endswith(".tsv") else ",")
+
+    # ---- matching ----
+    def _compile(self) -> "_Automaton":
+        automaton = self._automaton
+        if automaton is not None:
+            return automaton
+        with self._lock:
+            if self._automaton is None:
+                goto: List[Dict[str, int]] = [{}]
+                output: List[Optional[Term]] = [None]
+                depth = [0]
+                for key, term in self._terms.items():
+                    node = 0
+                    for token in key:
+                        nxt = goto[node].get(token)
+                        if nxt is None:
+                            nxt = len(goto)
+                            goto[node][token] = nxt
+                            goto.append({})
+                            output.append(None)
+                            depth.append(depth[node] + 1)
+                        node = nxt
+                    output[node] = term
+                # Breadth-first: failure links, and `report`: the node itself
+                # if it ends a term, else the nearest proper suffix that
+                # does (-1 if none).
+                fail = [0] * len(goto)
+                report = [-1] * len(goto)
+                queue = list(goto[0].values())
+                for node in queue:
+                    if output[node] is not None:
+                        report[node] = node
+                    for token, child in goto[node].items():
+                        queue.append(child)
+                        state = fail[node]
+                        while state and token not in goto[state]:
+                            state = fail[state]
+                        target = goto[state].get(token, 0)
+                        fail[child] = target if target != child else 0
+                        report[child] = report[fail[child]]
+                self._automaton = _Automaton(goto, fail, output, report, depth)
+            return self._automaton
+
+    def find(self, text: str) -> List[TermMatch]:
+        """Non-overlapping terms in `text`, leftmost-longest first, in order."""
+        if not self._terms:
+            return []
+        goto, fail, output, report, depth = self._compile()
+        lowered = text.lower()
+        if len(lowered) != len(text):  # lowercasing changed offsets; match as-is
+            lowered = text
+        root = goto[0]
+        spans: List[Tuple[int, int]] = []
+        hits: List[Tuple[int, int]] = []  # (token index, report node)
+        node = 0
+        for index, match in enumerate(_TOKEN.finditer(lowered)):
+            token = match.group()
+            spans.append(match.span())
+            while node and token not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(token, 0) if node else root.get(token, 0)
+            if report[node] > 0:
+                hits.append((index, report[node]))
+
+        found: List[TermMatch] = []
+        for index, hit in hits:
+            while hit > 0:
+                first = index - depth[hit] + 1
+                # Words of a term may only be apart by spaces or a hyphen.
+                if all(_GAP.fullmatch(text, spans[k][1], spans[k + 1][0]) for k in range(first, index)):
+                    found.append(TermMatch(spans[first][0], spans[index][1], output[hit]))
+                hit = report[fail[hit]]
+        found.sort(key=lambda m: (m.start, m.start - m.end))
+        kept: List[TermMatch] = []
+        for match in found:
+            if not kept or match.start >= kept[-1].end:
+                kept.append(match)
+        return kept
+
+    def terms_in(self, text: str) -> List[Term]:
+        """Distinct terms found in `text`, in order of first appearance."""
+        return list(dict.fromkeys(match.term for match in self.find(text)))
+
+    def check(self, output: str, terms: List[Term]) -> List[Term]:
+        """`missing_terms`, counted in `checked` and `missed`."""
+        missing = missing_terms(output, terms)
+        with self._lock:
+            self.checked += len(terms)
+            self.missed += len(missing)
+        return missing
+
+
+def missing_terms(output: str, terms: Iterable[Term]) -> List[Term]:
+    """Terms whose required translation does not appear in `output`."""
+    lowered = output.lower()
+    return [term for term in terms if term.target.lower() not in lowered]
+
+
+def render_terms(terms: Iterable[Term], required: bool = False) -> str:
+    """The prompt line for `terms` ("" for none)."""
+    pairs = "; ".join(f"{term.source} = {term.target}" for term in terms)
+    if not pairs:
+        return ""
+    return f"\nRequired terms, use exactly: {pairs}" if required else f"\nTerms: {pairs}"
+
+
+# -------------------- Registry --------------------
+_glossaries: Dict[Tuple[str, str], Glossary] = {}
+
+
+def register_glossary(glossary: Glossary) -> None:
+    """Use `glossary` for its language pair (source "auto" = any source)."""
+    key = (canonical_language(glossary.source_lang).lower(), canonical_language(glossary.target_lang).lower())
+    _glossaries[key] = glossary
+
+
+def get_glossary(source_lang: str, target_lang: str) -> Optional[Glossary]:
+    if not _glossaries:
+        return None
+    target = canonical_language(target_lang).lower()
+    return _glossaries.get((canonical_language(source_lang).lower(), target)) or _glossaries.get((AUTO, target))
+
+
+def clear_glossaries() -> None:
+    _glossaries.clear()
+
+
+def glossary_for(source_lang: str, target_lang: str, glossary: Optional[Glossary] = None) -> Optional[Glossary]:
+    """`glossary` if it is for this language pair, else the registered one."""
+    if glossary is not None:
+        source = canonical_language(glossary.source_lang).lower()
+        target = canonical_language(glossary.target_lang).lower()
+        pair = (canonical_language(source_lang).lower(), canonical_language(target_lang).lower())
+        if target == pair[1] and source in (AUTO, pair[0]):
+            return glossary
+    return get_glossary(source_lang, target_lang)
+
+
+# -------------------- Chain --------------------
+class GlossaryChain(Runnable):
+    """Puts the terms of `input["glossary"]` (or of the registered
+    glossary) found in `input["text"]` into `input["terms"]` for
+    `chain`, and checks the answer for them.
+
+    A non-streaming answer missing some translations is asked for again
+    up to `max_retries` times with the terms marked as required; the
+    answer missing the fewest is returned. Streams are only checked.
+    """
+
+    def __init__(self, chain: Runnable, max_retries: int = 1):
+        self.chain = chain
+        self.max_retries = max_retries
+
+    def _terms(self, input: Mapping[str, Any]) -> Tuple[Optional[Glossary], List[Term]]:
+        glossary = glossary_for(input["source_lang"], input["target_lang"], input.get("glossary"))
+        if glossary is None:
+            return None, []
+        started = time.perf_counter()
+        terms = glossary.terms_in(input["text"])
+        METRICS.observe("glossary", time.perf_counter() - started, terms=len(terms))
+        return glossary, terms
+
+    def invoke(self, input: Mapping[str, Any], config: Optional[RunnableConfig] = None, **kwargs: Any) -> str:
+        glossary, terms = self._terms(input)
+        if not terms:
+            return self.chain.invoke(input, config, **kwargs)
+        best, best_missing = "", None
+        for attempt in range(self.max_retries + 1):
+            output = self.chain.invoke(dict(input, terms=render_terms(terms, attempt > 0)), config, **kwargs)
+            missing = glossary.check(output, terms)
+            if best_missing is None or len(missing) < len(best_missing):
+                best, best_missing = output, missing
+            if not missing:
+                break
+        return best
+
+    async def ainvoke(
+        self, input: Mapping[str, Any], config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> str:
+        glossary, terms = self._terms(input)
+        if not terms:
+            return await self.chain.ainvoke(input, config, **kwargs)
+        best, best_missing = "", None
+        for attempt in range(self.max_retries + 1):
+            output = await self.chain.ainvoke(dict(input, terms=render_terms(terms, attempt > 0)), config, **kwargs)
+            missing = glossary.check(output, terms)
+            if best_missing is None or len(missing) < len(best_missing):
+                best, best_missing = output, missing
+            if not missing:
+                break
+        return best
+
+    def stream(
+        self, input: Mapping[str, Any], config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> Iterator[str]:
+        glossary, terms = self._terms(input)
+        if not terms:
+            yield from self.chain.stream(input, config, **kwargs)
+            return
+        parts = []
+        for part in self.chain.stream(dict(input, terms=render_terms(terms)), config, **kwargs):
+            parts.append(part)
+            yield part
+        glossary.check("".join(parts), terms)
+
+    async def astream(
+        self, input: Mapping[str, Any], config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> AsyncIterator[str]:
+        glossary, terms = self._terms(input)
+        if not terms:
+            async for part in self.chain.astream(input, config, **kwargs):
+                yield part
+            return
+        parts = []
+        async for part in self.chain.astream(dict(input, terms=render_terms(terms)), config, **kwargs):
+            parts.append(part)
+            yield part
+        glossary.check("".join(parts), terms)
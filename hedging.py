@@ -0,0 +1,233 @@
+# hedging.py
+"""Hedged requests: send a backup call when the primary is unusually slow.
+
+Each hedged (provider, model) keeps a rolling window of its call
+latencies. If a call hasn't finished by the window's p95 (configurable),
+a duplicate goes to the same route or to an alternate one; the first
+answer wins and the other call is cancelled. Backups are capped at a
+fraction of primary calls (`budget`) so a slow provider can't double
+our spend.
+
+Hedging is off by default. Enable it per route with `configure_hedging`
+or for every route with TRANSLATOR_HEDGE=1; translator_agent then wraps
+the chains it builds in `HedgedChain`. Only invoke/ainvoke (and the
+batch calls built on them) are hedged; streams go to the primary only.
+"""
+import asyncio
+import concurrent.futures
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Mapping, Optional, Tuple
+
+from langchain_core.runnables import Runnable, RunnableConfig
+
+
+class HedgePolicy:
+    """Rolling latency percentile and hedge budget for one route.
+
+    No backup is sent until `min_samples` latencies are known, nor
+    earlier than `min_delay` seconds. `alternate` is a (provider, model)
+    for the backup call; None sends it to the same route.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 95.0,
+        budget: float = 0.1,
+        min_samples: int = 20,
+        min_delay: float = 0.05,
+        window: int = 500,
+        alternate: Optional[Tuple[str, str]] = None,
+    ):
+        self.percentile = percentile
+        self.budget = budget
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.alternate = alternate
+        self.primaries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, hedge_won: bool = False) -> None:
+        with self._lock:
+            self._latencies.append(seconds)
+            if hedge_won:
+                self.hedge_wins += 1
+
+    def threshold(self) -> Optional[float]:
+        """Seconds to wait before hedging, or None while still warming up."""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))
+        return max(self.min_delay, ordered[index])
+
+    def start(self) -> Optional[float]:
+        """Count a primary call and return its hedge threshold."""
+        with self._lock:
+            self.primaries += 1
+        return self.threshold()
+
+    def allow_hedge(self) -> bool:
+        with self._lock:
+            if self.hedges + 1 > self.budget * self.primaries:
+                return False
+            self.hedges += 1
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        threshold = self.threshold()
+        return {
+            "primaries": self.primaries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "threshold_ms": round(threshold * 1000, 1) if threshold is not None else None,
+        }
+
+
+_executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> concurrent.futures.ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=32, thread_name_prefix="hedge"
+                )
+    return _executor
+
+
+class HedgedChain(Runnable):
+    """Runs `primary`, and `backup` as well once the primary is slow."""
+
+    def __init__(self, primary: Runnable, backup: Runnable, policy: HedgePolicy):
+        self.primary = primary
+        self.backup = backup
+        self.policy = policy
+
+    def invoke(self, input: Mapping[str, Any], config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        threshold = self.policy.start()
+        start = time.monotonic()
+        if threshold is None:
+            output = self.primary.invoke(input, config, **kwargs)
+            self.policy.record(time.monotonic() - start)
+            return output
+
+        # Threads can't be interrupted: a losing call runs to completion in
+        # the pool and its answer is dropped.
+        pool = _get_executor()
+        first = pool.submit(self.primary.invoke, input, config, **kwargs)
+        done, _ = concurrent.futures.wait([first], timeout=threshold)
+        if done or not self.policy.allow_hedge():
+            output = first.result()
+            self.policy.record(time.monotonic() - start)
+            return output
+
+        second = pool.submit(self.backup.invoke, input, config, **kwargs)
+        pending = {first, second}
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                for other in pending:
+                    other.cancel()
+                # When the backup wins, the caller's wait is also a lower
+                # bound for the slow primary, so it still feeds the window.
+                self.policy.record(time.monotonic() - start, hedge_won=future is second)
+                return future.result()
+        assert error is not None
+        raise error
+
+    async def ainvoke(
+        self, input: Mapping[str, Any], config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> Any:
+        threshold = self.policy.start()
+        start = time.monotonic()
+        if threshold is None:
+            output = await self.primary.ainvoke(input, config, **kwargs)
+            self.policy.record(time.monotonic() - start)
+            return output
+
+        first = asyncio.ensure_future(self.primary.ainvoke(input, config, **kwargs))
+        try:
+            done, _ = await asyncio.wait({first}, timeout=threshold)
+            if done or not self.policy.allow_hedge():
+                output = await first
+                self.policy.record(time.monotonic() - start)
+                return output
+
+            second = asyncio.ensure_future(self.backup.ainvoke(input, config, **kwargs))
+            pending = {first, second}
+            error: Optional[BaseException] = None
+            try:
+                while pending:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        if task.exception() is not None:
+                            error = task.exception()
+                            continue
+                        self.policy.record(time.monotonic() - start, hedge_won=task is second)
+                        return task.result()
+            finally:
+                for task in pending:
+                    task.cancel()
+            assert error is not None
+            raise error
+        finally:
+            if not first.done():
+                first.cancel()
+
+    def stream(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        return self.primary.stream(input, config, **kwargs)
+
+    def astream(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        return self.primary.astream(input, config, **kwargs)
+
+
+_policies: Dict[Tuple[str, str], HedgePolicy] = {}
+_hedge_config: Dict[Tuple[str, str], Dict[str, Any]] = {}
+_policies_lock = threading.Lock()
+
+
+def configure_hedging(provider: str, model: str = "*", **settings: Any) -> None:
+    """Turn hedging on for a provider (model "*" = all its models).
+
+    `settings` are `HedgePolicy` arguments. Call before the chains are
+    built, or call translator_agent.clear_translation_chains() after.
+    """
+    with _policies_lock:
+        _hedge_config[(provider, model)] = settings
+        for key in [k for k in _policies if k[0] == provider and model in ("*", k[1])]:
+            del _policies[key]
+
+
+def get_hedge_policy(provider: str, model: str) -> Optional[HedgePolicy]:
+    """The policy for (provider, model), or None if it isn't hedged."""
+    key = (provider, model)
+    policy = _policies.get(key)
+    if policy is None:
+        with _policies_lock:
+            policy = _policies.get(key)
+            if policy is None:
+                if key in _hedge_config:
+                    settings = _hedge_config[key]
+                elif (provider, "*") in _hedge_config:
+                    settings = _hedge_config[(provider, "*")]
+                elif os.getenv("TRANSLATOR_HEDGE", "").lower() in ("1", "true", "yes"):
+                    settings = {}
+                else:
+                    return None
+                policy = HedgePolicy(**settings)
+                _policies[key] = policy
+    return policy
@@ -0,0 +1,332 @@
+# instrumentation.py
+"""Per-stage latency and token metrics for translation calls.
+
+Every chain built by translator_agent carries a `MetricsCallbackHandler`
+and provider/model labels in its config metadata, so each call records:
+
+    prompt       building the prompt messages
+    network      the chat model call (time waiting on the provider)
+    first_token  time to the first streamed token
+    parse        output parsing (for streams, until the last chunk)
+    chain        one full prompt -> model -> parser pass
+    queue        waiting for the rate limiter (rate_limit.RateLimitedModel)
+    cache        translation memory lookups (translation_cache)
+    admission    waiting for a slot in the HTTP service
+
+plus prompt/completion tokens and model call outcomes. The numbers live
+in the process-wide `METRICS` registry: `summary()` gives p50/p95/p99
+per stage, `render_prometheus()` the Prometheus text format (served on
+the service's GET /metrics). With TRANSLATOR_TRACE_FILE set, every
+observation is also appended to that file as one JSON line.
+TRANSLATOR_METRICS=0 turns the callbacks off.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import IO, Any, Deque, Dict, Iterator, List, Mapping, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import ChatGeneration, LLMResult
+from langchain_core.runnables import RunnableConfig
+
+PROVIDER_KEY = "translator_provider"
+MODEL_KEY = "translator_model"
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[str, ...]
+
+
+def enabled() -> bool:
+    return os.getenv("TRANSLATOR_METRICS", "1").lower() not in ("0", "false", "no")
+
+
+class Histogram:
+    """Cumulative buckets for Prometheus plus a window of recent samples."""
+
+    def __init__(self, window: int = 2048):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.recent: Deque[float] = deque(maxlen=window)
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        self.recent.append(value)
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class Metrics:
+    """Thread-safe registry of stage histograms and counters."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._stages: Dict[Labels, Histogram] = {}  # (stage, provider, model)
+        self._tokens: Dict[Labels, int] = {}  # (kind, provider, model)
+        self._calls: Dict[Labels, int] = {}  # (provider, model, outcome)
+        self._cache: Dict[str, int] = {}  # result -> lookups
+        self._trace: Optional[IO[str]] = None
+        self._trace_path: Optional[str] = None
+
+    def observe(self, stage: str, seconds: float, provider: str = "", model: str = "", **fields: Any) -> None:
+        key = (stage, provider, model)
+        with self._lock:
+            histogram = self._stages.get(key)
+            if histogram is None:
+                histogram = self._stages[key] = Histogram()
+            histogram.observe(seconds)
+        self._write_trace(dict(fields, stage=stage, seconds=round(seconds, 6), provider=provider, model=model))
+
+    def count_tokens(self, provider: str, model: str, prompt: int, completion: int) -> None:
+        with self._lock:
+            for kind, n in (("prompt", prompt), ("completion", completion)):
+                key = (kind, provider, model)
+                self._tokens[key] = self._tokens.get(key, 0) + n
+
+    def count_call(self, provider: str, model: str, outcome: str) -> None:
+        key = (provider, model, outcome)
+        with self._lock:
+            self._calls[key] = self._calls.get(key, 0) + 1
+
+    def count_cache(self, hit: bool) -> None:
+        result = "hit" if hit else "miss"
+        with self._lock:
+            self._cache[result] = self._cache.get(result, 0) + 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stages.clear()
+            self._tokens.clear()
+            self._calls.clear()
+            self._cache.clear()
+
+    # ---- reading ----
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Per stage (all labels together): count and p50/p95/p99 in ms."""
+        merged: Dict[str, List[float]] = {}
+        counts: Dict[str, int] = {}
+        with self._lock:
+            for (stage, _provider, _model), histogram in self._stages.items():
+                merged.setdefault(stage, []).extend(histogram.recent)
+                counts[stage] = counts.get(stage, 0) + histogram.count
+        summary = {}
+        for stage, samples in sorted(merged.items()):
+            samples.sort()
+            row: Dict[str, Any] = {"count": counts[stage]}
+            for pct in (50, 95, 99):
+                value = samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+                row[f"p{pct}_ms"] = round(value * 1000, 1)
+            summary[stage] = row
+        return summary
+
+    def tokens(self) -> Dict[str, int]:
+        with self._lock:
+            totals = {"prompt": 0, "completion": 0}
+            for (kind, _provider, _model), n in self._tokens.items():
+                totals[kind] += n
+        return totals
+
+    def render_prometheus(self) -> str:
+        lines = [
+            "# HELP translator_stage_seconds Time spent per translation stage.",
+            "# TYPE translator_stage_seconds histogram",
+        ]
+        with self._lock:
+            for (stage, provider, model), h in sorted(self._stages.items()):
+                labels = _labels(stage=stage, provider=provider, model=model)
+                for bound, count in zip(BUCKETS, h.counts):
+                    lines.append(f"translator_stage_seconds_bucket{{{labels},le=\"{bound}\"}} {count}")
+                lines.append(f"translator_stage_seconds_bucket{{{labels},le=\"+Inf\"}} {h.count}")
+                lines.append(f"translator_stage_seconds_sum{{{labels}}} {h.sum:.6f}")
+                lines.append(f"translator_stage_seconds_count{{{labels}}} {h.count}")
+            lines += [
+                "# HELP translator_tokens_total Tokens sent to and received from models.",
+                "# TYPE translator_tokens_total counter",
+            ]
+            for (kind, provider, model), n in sorted(self._tokens.items()):
+                lines.append(f"translator_tokens_total{{{_labels(kind=kind, provider=provider, model=model)}}} {n}")
+            lines += [
+                "# HELP translator_model_calls_total Chat model calls by outcome.",
+                "# TYPE translator_model_calls_total counter",
+            ]
+            for (provider, model, outcome), n in sorted(self._calls.items()):
+                labels = _labels(provider=provider, model=model, outcome=outcome)
+                lines.append(f"translator_model_calls_total{{{labels}}} {n}")
+            lines += [
+                "# HELP translator_cache_lookups_total Translation memory lookups.",
+                "# TYPE translator_cache_lookups_total counter",
+            ]
+            for result, n in sorted(self._cache.items()):
+                lines.append(f"translator_cache_lookups_total{{{_labels(result=result)}}} {n}")
+        return "\n".join(lines) + "\n"
+
+    # ---- trace file ----
+    def _write_trace(self, event: Dict[str, Any]) -> None:
+        path = os.getenv("TRANSLATOR_TRACE_FILE")
+        if not path:
+            return
+        event["time"] = round(time.time(), 6)
+        line = json.dumps(event, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            if self._trace_path != path:
+                if self._trace is not None:
+                    self._trace.close()
+                self._trace = open(path, "a", encoding="utf-8")
+                self._trace_path = path
+            self._trace.write(line)
+            self._trace.flush()
+
+
+def _labels(**labels: str) -> str:
+    def escape(value: str) -> str:
+        return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    return ",".join(f'{name}="{escape(value)}"' for name, value in labels.items())
+
+
+METRICS = Metrics()
+
+
+def route_labels(config: Optional[RunnableConfig]) -> Tuple[str, str]:
+    """(provider, model) from a chain's config metadata."""
+    metadata = (config or {}).get("metadata") or {}
+    return metadata.get(PROVIDER_KEY, ""), metadata.get(MODEL_KEY, "")
+
+
+@contextmanager
+def span(stage: str, provider: str = "", model: str = "", **fields: Any) -> Iterator[None]:
+    """Time the body of a `with` block as `stage`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        METRICS.observe(stage, time.perf_counter() - start, provider, model, **fields)
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """Turns LangChain run events into `METRICS` observations."""
+
+    run_inline = True  # timestamps must not wait for an executor
+
+    _STAGES = {"prompt": "prompt", "parser": "parse"}
+
+    def __init__(self, metrics: Metrics = METRICS):
+        self.metrics = metrics
+        self._lock = threading.Lock()
+        # run -> (stage, start, provider, model, trace id = outermost tracked run)
+        self._runs: Dict[UUID, Tuple[str, float, str, str, UUID]] = {}
+        self._first_token: Dict[UUID, bool] = {}
+
+    def _start(
+        self,
+        run_id: UUID,
+        parent_run_id: Optional[UUID],
+        stage: str,
+        metadata: Optional[Mapping[str, Any]],
+    ) -> None:
+        metadata = metadata or {}
+        provider, model = metadata.get(PROVIDER_KEY, ""), metadata.get(MODEL_KEY, "")
+        with self._lock:
+            parent = self._runs.get(parent_run_id) if parent_run_id else None
+            trace = parent[4] if parent else run_id
+            self._runs[run_id] = (stage, time.perf_counter(), provider, model, trace)
+
+    def _end(self, run_id: UUID, **fields: Any) -> Optional[Tuple[str, str]]:
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+            self._first_token.pop(run_id, None)
+        if run is None:
+            return None
+        stage, start, provider, model, trace = run
+        if stage:
+            self.metrics.observe(stage, time.perf_counter() - start, provider, model, trace=trace, **fields)
+        return provider, model
+
+    # ---- chains: prompt, parser and the chain as a whole ----
+    def on_chain_start(
+        self,
+        serialized: Dict[str, Any],
+        inputs: Any,
+        *,
+        run_id: UUID,
+        parent_run_id: Optional[UUID] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        run_type: Optional[str] = None,
+        **kwargs: Any,
+    ) -> None:
+        if run_type in self._STAGES:
+            stage = self._STAGES[run_type]
+        elif parent_run_id is None or parent_run_id not in self._runs:
+            stage = "chain"
+        else:
+            stage = ""  # nested chains are tracked for the trace id only
+        self._start(run_id, parent_run_id, stage, metadata)
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id)
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id, error=type(error).__name__)
+
+    # ---- chat model: network time, first token and usage ----
+    def on_chat_model_start(
+        self,
+        serialized: Dict[str, Any],
+        messages: Any,
+        *,
+        run_id: UUID,
+        parent_run_id: Optional[UUID] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> None:
+        self._start(run_id, parent_run_id, "network", metadata)
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run is None or self._first_token.get(run_id):
+                return
+            self._first_token[run_id] = True
+        _stage, start, provider, model, trace = run
+        self.metrics.observe("first_token", time.perf_counter() - start, provider, model, trace=trace)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        usage = None
+        try:
+            generation = response.generations[0][0]
+            if isinstance(generation, ChatGeneration):
+                usage = generation.message.usage_metadata  # type: ignore[attr-defined]
+        except (IndexError, AttributeError):
+            pass
+        fields = {}
+        if usage:
+            fields = {"prompt_tokens": usage["input_tokens"], "completion_tokens": usage["output_tokens"]}
+        labels = self._end(run_id, **fields)
+        if labels is None:
+            return
+        self.metrics.count_call(*labels, outcome="ok")
+        if usage:
+            self.metrics.count_tokens(*labels, prompt=usage["input_tokens"], completion=usage["output_tokens"])
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        labels = self._end(run_id, error=type(error).__name__)
+        if labels is not None:
+            self.metrics.count_call(*labels, outcome="error")
+
+
+HANDLER = MetricsCallbackHandler()
+
+
+def chain_config(provider: str, model: str) -> RunnableConfig:
+    """Config for a translation chain: labels, plus the handler if enabled."""
+    config: RunnableConfig = {"metadata": {PROVIDER_KEY: provider, MODEL_KEY: model}}
+    if enabled():
+        config["callbacks"] = [HANDLER]
+    return config
@@ -0,0 +1,415 @@
+# lang_detect.py
+"""Offline language identification for "auto" sources.
+
+Non-Latin scripts (Devanagari, Arabic, Cyrillic, Hangul, kana, Han) are
+decided by their Unicode ranges. Latin-script text is scored with a
+character-trigram naive Bayes model trained on the small samples below,
+so the package needs no data files or extra dependencies.
+
+`plan_runs()` is what translator_agent uses: it resolves "auto" to a
+concrete language, marks text already in the target language so it is
+not sent to the model, and splits mixed-language input into runs of
+sentences that share a language.
+
+Detection only knows the languages below, so a language outside them
+comes out as a neighbour (Dutch as German, Ukrainian as Russian). That
+is harmless as a source hint, but text is only left untranslated when
+its language is certain (`confident_language`): a script only one
+language uses (Hangul, kana), or Latin text the trigram model both
+picks with high confidence and mostly covers with its own samples.
+"""
+import math
+import re
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from segmentation import needs_translation, split_segments
+
+AUTO = "auto"
+
+# ISO 639-1 codes accepted wherever a language name is.
+LANGUAGE_CODES = {
+    "en": "English", "hi": "Hindi", "fr": "French", "de": "German", "es": "Spanish",
+    "zh": "Chinese", "ja": "Japanese", "ar": "Arabic", "it": "Italian", "ru": "Russian",
+    "ko": "Korean", "pt": "Portuguese",
+}
+
+_LATIN_SAMPLES = {
+    "English": """
+        The quick answer is that we do not know yet, but we will tell you as soon as we can.
+        Please make sure that your account information is up to date before you continue.
+        This agreement shall be governed by the laws of the state in which the company is based.
+        The patient was admitted to the hospital with a high fever and was treated with antibiotics.
+        Thank you for your order, it will be shipped within two business days.
+        I would like to know what time the train leaves and where I can buy a ticket.
+        They have been working on this project for more than three years and it is almost finished.
+        If you have any questions about the product, please contact our support team.
+        What do you think about the new version of the application? It should be much faster.
+        There were many people at the meeting, and everyone agreed that the plan was a good one.
+        Click the button below to reset your password. The link will expire in one hour.
+        We are looking forward to working with you and hope to hear from you soon.
+        The file could not be saved because the disk is full. Do you want to try again?
+        Your changes have been saved and will be visible to other users in a few minutes.
+        She said that she would call back later, but nobody has heard from her since.
+        Enter your email address and we will send you a link to sign in.
+        This page is not available right now, so please come back later.
+        The weather was nice, so we went for a walk along the river after lunch.
+    """,
+    "French": """
+        La réponse courte est que nous ne le savons pas encore, mais nous vous le dirons dès que possible.
+        Veuillez vous assurer que les informations de votre compte sont à jour avant de continuer.
+        Le présent contrat est régi par les lois de l'État dans lequel la société a son siège.
+        Le patient a été admis à l'hôpital avec une forte fièvre et a été traité par antibiotiques.
+        Merci pour votre commande, elle sera expédiée dans les deux jours ouvrables.
+        Je voudrais savoir à quelle heure part le train et où je peux acheter un billet.
+        Ils travaillent sur ce projet depuis plus de trois ans et il est presque terminé.
+        Si vous avez des questions sur le produit, veuillez contacter notre équipe d'assistance.
+        Que pensez-vous de la nouvelle version de l'application ? Elle devrait être beaucoup plus rapide.
+        Il y avait beaucoup de monde à la réunion, et tout le monde était d'accord avec ce plan.
+        Cliquez sur le bouton ci-dessous pour réinitialiser votre mot de passe. Le lien expire dans une heure.
+        Nous avons hâte de travailler avec vous et espérons avoir bientôt de vos nouvelles.
+        Le fichier n'a pas pu être enregistré car le disque est plein. Voulez-vous réessayer ?
+        Vos modifications ont été enregistrées et seront visibles par les autres utilisateurs dans quelques minutes.
+        Elle a dit qu'elle rappellerait plus tard, mais personne n'a eu de ses nouvelles depuis.
+        Saisissez votre adresse e-mail et nous vous enverrons un lien pour vous connecter.
+        Cette page n'est pas disponible pour le moment, merci de revenir plus tard.
+        Il faisait beau, alors nous sommes allés nous promener le long de la rivière après le déjeuner.
+    """,
+    "German": """
+        Die kurze Antwort ist, dass wir es noch nicht wissen, aber wir sagen es Ihnen, sobald wir können.
+        Bitte stellen Sie sicher, dass Ihre Kontoinformationen aktuell sind, bevor Sie fortfahren.
+        Dieser Vertrag unterliegt den Gesetzen des Landes, in dem das Unternehmen seinen Sitz hat.
+        Der Patient wurde mit hohem Fieber ins Krankenhaus eingeliefert und mit Antibiotika behandelt.
+        Vielen Dank für Ihre Bestellung, sie wird innerhalb von zwei Werktagen versandt.
+        Ich möchte wissen, wann der Zug abfährt und wo ich eine Fahrkarte kaufen kann.
+        Sie arbeiten seit mehr als drei Jahren an diesem Projekt und es ist fast fertig.
+        Wenn Sie Fragen zu dem Produkt haben, wenden Sie sich bitte an unser Support-Team.
+        Was halten Sie von der neuen Version der Anwendung? Sie sollte viel schneller sein.
+        Es waren viele Leute bei der Besprechung, und alle waren sich einig, dass der Plan gut ist.
+        Klicken Sie auf die Schaltfläche unten, um Ihr Passwort zurückzusetzen. Der Link läuft in einer Stunde ab.
+        Wir freuen uns auf die Zusammenarbeit mit Ihnen und hoffen, bald von Ihnen zu hören.
+        Die Datei konnte nicht gespeichert werden, weil die Festplatte voll ist. Möchten Sie es erneut versuchen?
+        Ihre Änderungen wurden gespeichert und sind in wenigen Minuten für andere Benutzer sichtbar.
+        Sie sagte, dass sie später zurückrufen würde, aber seitdem hat niemand etwas von ihr gehört.
+        Geben Sie Ihre E-Mail-Adresse ein und wir schicken Ihnen einen Link zur Anmeldung.
+        Diese Seite ist im Moment nicht verfügbar, bitte versuchen Sie es später noch einmal.
+        Das Wetter war schön, also sind wir nach dem Mittagessen am Fluss spazieren gegangen.
+    """,
+    "Spanish": """
+        La respuesta corta es que todavía no lo sabemos, pero se lo diremos en cuanto podamos.
+        Por favor, asegúrese de que la información de su cuenta esté actualizada antes de continuar.
+        Este contrato se rige por las leyes del estado en el que la empresa tiene su sede.
+        El paciente ingresó en el hospital con fiebre alta y fue tratado con antibióticos.
+        Gracias por su pedido, será enviado en un plazo de dos días hábiles.
+        Me gustaría saber a qué hora sale el tren y dónde puedo comprar un billete.
+        Llevan más de tres años trabajando en este proyecto y ya está casi terminado.
+        Si tiene alguna pregunta sobre el producto, póngase en contacto con nuestro equipo de soporte.
+        ¿Qué opina de la nueva versión de la aplicación? Debería ser mucho más rápida.
+        Había mucha gente en la reunión y todos estuvieron de acuerdo en que el plan era bueno.
+        Haga clic en el botón de abajo para restablecer su contraseña. El enlace caduca en una hora.
+        Estamos deseando trabajar con usted y esperamos tener noticias suyas pronto.
+        No se pudo guardar el archivo porque el disco está lleno. ¿Quiere intentarlo de nuevo?
+        Sus cambios se han guardado y serán visibles para otros usuarios en unos minutos.
+        Ella dijo que volvería a llamar más tarde, pero nadie ha sabido nada de ella desde entonces.
+        Introduzca su correo electrónico y le enviaremos un enlace para iniciar sesión.
+        Esta página no está disponible en este momento, por favor vuelva más tarde.
+        Hacía buen tiempo, así que fuimos a dar un paseo por el río después de comer.
+    """,
+    "Italian": """
+        La risposta breve è che non lo sappiamo ancora, ma ve lo diremo appena possibile.
+        Assicurati che le informazioni del tuo account siano aggiornate prima di continuare.
+        Il presente contratto è regolato dalle leggi dello stato in cui la società ha sede.
+        Il paziente è stato ricoverato in ospedale con la febbre alta ed è stato curato con antibiotici.
+        Grazie per il tuo ordine, verrà spedito entro due giorni lavorativi.
+        Vorrei sapere a che ora parte il treno e dove posso comprare un biglietto.
+        Lavorano a questo progetto da più di tre anni ed è quasi finito.
+        Se hai domande sul prodotto, contatta il nostro team di assistenza.
+        Cosa ne pensi della nuova versione dell'applicazione? Dovrebbe essere molto più veloce.
+        C'erano molte persone alla riunione e tutti erano d'accordo che il piano fosse buono.
+        Fai clic sul pulsante qui sotto per reimpostare la password. Il link scade tra un'ora.
+        Non vediamo l'ora di lavorare con te e speriamo di sentirti presto.
+        Non è stato possibile salvare il file perché il disco è pieno. Vuoi riprovare?
+        Le tue modifiche sono state salvate e saranno visibili agli altri utenti tra pochi minuti.
+        Ha detto che avrebbe richiamato più tardi, ma da allora nessuno ha avuto sue notizie.
+        Inserisci il tuo indirizzo email e ti invieremo un link per accedere.
+        Questa pagina non è disponibile al momento, per favore torna più tardi.
+        Il tempo era bello, quindi dopo pranzo siamo andati a fare una passeggiata lungo il fiume.
+    """,
+    "Portuguese": """
+        A resposta curta é que ainda não sabemos, mas vamos informar você assim que pudermos.
+        Por favor, verifique se as informações da sua conta estão atualizadas antes de continuar.
+        Este contrato é regido pelas leis do estado em que a empresa tem a sua sede.
+        O paciente foi internado no hospital com febre alta e foi tratado com antibióticos.
+        Obrigado pelo seu pedido, ele será enviado dentro de dois dias úteis.
+        Eu gostaria de saber a que horas sai o trem e onde posso comprar uma passagem.
+        Eles estão trabalhando neste projeto há mais de três anos e ele está quase pronto.
+        Se você tiver alguma dúvida sobre o produto, entre em contato com a nossa equipe de suporte.
+        O que você acha da nova versão do aplicativo? Ela deve ser muito mais rápida.
+        Havia muitas pessoas na reunião, e todos concordaram que o plano era bom.
+        Clique no botão abaixo para redefinir a sua senha. O link expira em uma hora.
+        Estamos ansiosos para trabalhar com você e esperamos ter notícias suas em breve.
+        Não foi possível salvar o arquivo porque o disco está cheio. Deseja tentar novamente?
+        As suas alterações foram salvas e ficarão visíveis para outros usuários em alguns minutos.
+        Ela disse que ligaria mais tarde, mas desde então ninguém teve notícias dela.
+        Digite o seu endereço de e-mail e enviaremos um link para você entrar.
+        Esta página não está disponível no momento, por favor volte mais tarde.
+        O tempo estava bom, então fomos passear ao longo do rio depois do almoço.
+    """,
+}
+
+_SCRIPT_RANGES: List[Tuple[int, int, str]] = [
+    (0x0900, 0x097F, "Hindi"),
+    (0x0600, 0x06FF, "Arabic"),
+    (0x0750, 0x077F, "Arabic"),
+    (0x0400, 0x04FF, "Russian"),
+    (0x1100, 0x11FF, "Korean"),
+    (0x3130, 0x318F, "Korean"),
+    (0xAC00, 0xD7AF, "Korean"),
+    (0x3040, 0x30FF, "Japanese"),  # hiragana + katakana
+    (0x4E00, 0x9FFF, "Chinese"),  # Han; also used by Japanese
+]
+
+_LETTERS = re.compile(r"[^\W\d_]+")
+
+
+def canonical_language(name: str) -> str:
+    """'fr', 'french' and 'French' all become 'French'; unknown names pass through."""
+    stripped = (name or "").strip()
+    lowered = stripped.lower()
+    if lowered in LANGUAGE_CODES:
+        return LANGUAGE_CODES[lowered]
+    for language in LANGUAGE_CODES.values():
+        if language.lower() == lowered:
+            return language
+    return stripped
+
+
+def same_language(a: str, b: str) -> bool:
+    return canonical_language(a).lower() == canonical_language(b).lower()
+
+
+def _script_class(*languages: str) -> str:
+    return "".join(
+        f"\\u{low:04x}-\\u{high:04x}" for low, high, language in _SCRIPT_RANGES if language in languages
+    )
+
+
+_LATIN_LETTERS = re.compile("[A-Za-z\u00c0-\u024f]+")
+_NON_LATIN_LETTERS = re.compile(f"[{_script_class(*{language for _low, _high, language in _SCRIPT_RANGES})}]+")
+# Japanese is written with kana and Han.
+_OWN_SCRIPT = {
+    language: re.compile(f"[{_script_class(language, 'Chinese') if language == 'Japanese' else _script_class(language)}]+")
+    for _low, _high, language in _SCRIPT_RANGES
+}
+
+
+def script_known(language: str) -> bool:
+    """True when `in_expected_script` knows which script `language` is written in."""
+    language = canonical_language(language)
+    return language in _OWN_SCRIPT or language in _LATIN_SAMPLES
+
+
+def in_expected_script(text: str, language: str) -> bool:
+    """False when most letters of `text` are in another script than `language`'s.
+
+    Latin-script languages expect Latin letters, the others their own
+    script (see _SCRIPT_RANGES); languages it knows neither way are
+    taken as Latin (see `script_known`). Regex counts only, so it is
+    cheap enough to run on every answer.
+    """
+    own = _OWN_SCRIPT.get(canonical_language(language))
+    latin = sum(map(len, _LATIN_LETTERS.findall(text)))
+    if own is None:
+        return latin >= sum(map(len, _NON_LATIN_LETTERS.findall(text)))
+    return sum(map(len, own.findall(text))) >= latin
+
+
+def _script_counts(text: str) -> Counter:
+    counts: Counter = Counter()
+    for ch in text:
+        if not ch.isalpha():
+            continue
+        code = ord(ch)
+        if code < 0x0250:
+            counts["Latin"] += 1
+            continue
+        for low, high, language in _SCRIPT_RANGES:
+            if low <= code <= high:
+                counts[language] += 1
+                break
+    return counts
+
+
+def _trigrams(text: str) -> List[str]:
+    grams = []
+    for word in _LETTERS.findall(text.lower()):
+        padded = f" {word} "
+        grams.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class _TrigramModel:
+    """Multinomial naive Bayes over character trigrams."""
+
+    def __init__(self, samples: Dict[str, str], smoothing: float = 0.5):
+        self.languages = list(samples)
+        counts = {language: Counter(_trigrams(text)) for language, text in samples.items()}
+        vocabulary = set().union(*counts.values())
+        self.log_probs: Dict[str, Dict[str, float]] = {}
+        self.unseen: Dict[str, float] = {}
+        for language, counter in counts.items():
+            total = sum(counter.values()) + smoothing * (len(vocabulary) + 1)
+            self.log_probs[language] = {g: math.log((n + smoothing) / total) for g, n in counter.items()}
+            self.unseen[language] = math.log(smoothing / total)
+
+    def scores(self, text: str) -> Dict[str, float]:
+        grams = _trigrams(text)
+        return {
+            language: sum(self.log_probs[language].get(g, self.unseen[language]) for g in grams)
+            for language in self.languages
+        }
+
+
+_model: Optional[_TrigramModel] = None
+
+
+def _latin_model() -> _TrigramModel:
+    global _model
+    if _model is None:
+        _model = _TrigramModel(_LATIN_SAMPLES)
+    return _model
+
+
+def detect_language(text: str, min_letters: int = 12, min_margin: float = 4.0) -> Optional[Tuple[str, float]]:
+    """Return (language, confidence 0..1), or None when unsure.
+
+    Latin text with fewer than `min_letters` letters is never guessed. For
+    Latin-script text the best language must beat the runner-up by
+    `min_margin` nats of log-likelihood.
+    """
+    counts = _script_counts(text)
+    letters = sum(counts.values())
+    if not letters:
+        return None
+
+    script, count = counts.most_common(1)[0]
+    if script != "Latin":
+        # One CJK character says more than one Latin letter.
+        if letters < 2:
+            return None
+        if script == "Chinese" and counts["Japanese"]:
+            # Japanese mixes kana into Han text.
+            return "Japanese", (count + counts["Japanese"]) / letters
+        return script, count / letters
+
+    if letters < min_letters:
+        return None
+    scores = _latin_model().scores(text)
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    best, best_score = ranked[0]
+    margin = best_score - ranked[1][1]
+    if margin < min_margin:
+        return None
+    return best, 1.0 - math.exp(-margin / 4.0)
+
+
+KEEP_CONFIDENCE = 0.999
+KEEP_COVERAGE = 0.65  # share of the text's trigrams seen in the language's samples
+# Scripts no other language writes in; Cyrillic, Arabic, Devanagari and
+# Han alone are shared with languages detection doesn't know.
+_OWN_SCRIPT_LANGUAGES = ("Korean", "Japanese")
+
+
+def _confident(text: str, detected: Optional[Tuple[str, float]]) -> Optional[str]:
+    if detected is None:
+        return None
+    language, confidence = detected
+    if language in _OWN_SCRIPT_LANGUAGES:
+        return language
+    if language not in _LATIN_SAMPLES or confidence < KEEP_CONFIDENCE:
+        return None
+    grams = _trigrams(text)
+    known = _latin_model().log_probs[language]
+    if sum(1 for gram in grams if gram in known) < KEEP_COVERAGE * len(grams):
+        return None
+    return language
+
+
+def confident_language(text: str) -> Optional[str]:
+    """The language of `text` if it is certain enough to skip translating
+    text already in it, else None (see the module docstring)."""
+    return _confident(text, detect_language(text))
+
+
+def in_target_language(text: str, source_lang: str, target_lang: str) -> bool:
+    """True when `text` needs no translation: the given source is the
+    target, or the source is "auto" and `text` is certainly in the target."""
+    if same_language(source_lang, target_lang):
+        return True
+    if source_lang.strip().lower() != AUTO:
+        return False
+    return same_language(confident_language(text) or "", target_lang)
+
+
+def resolve_source(text: str, source_lang: str) -> str:
+    """Replace "auto" with the detected language when detection is confident."""
+    if source_lang.strip().lower() != AUTO:
+        return source_lang
+    detected = detect_language(text)
+    return detected[0] if detected else source_lang
+
+
+# -------------------- Runs --------------------
+class Run(NamedTuple):
+    text: str
+    separator: str  # whitespace between this run and the next
+    source_lang: str
+    keep: bool  # already in the target language; don't translate
+    certain: bool  # source_lang was given, or detected with certainty
+
+
+def plan_runs(text: str, source_lang: str, target_lang: str) -> List[Run]:
+    """Split `text` into runs to translate (or keep) with a resolved source.
+
+    Most inputs give one run. Only with `source_lang="auto"` and sentences
+    confidently detected in different languages is the text split; each
+    sentence that can't be told apart joins the run before it.
+    """
+    if same_language(source_lang, target_lang):
+        return [Run(text, "", source_lang, True, True)]
+    if source_lang.strip().lower() != AUTO:
+        return [Run(text, "", source_lang, False, True)]
+
+    overall = detect_language(text)
+    overall_lang = overall[0] if overall else AUTO
+    segments = split_segments(text)
+    labels: List[Optional[str]] = []
+    for sentence, _sep in segments:
+        detected = detect_language(sentence) if needs_translation(sentence) else None
+        labels.append(detected[0] if detected else None)
+
+    if len({label for label in labels if label}) <= 1:
+        certain = _confident(text, overall) is not None
+        return [Run(text, "", overall_lang, certain and same_language(overall_lang, target_lang), certain)]
+
+    # Unlabelled sentences follow the previous sentence (or the first label).
+    current = next(label for label in labels if label)
+    runs: List[Run] = []
+    pieces: List[str] = []
+    for (sentence, sep), label in zip(segments, labels):
+        label = label or current
+        if label != current and pieces:
+            runs.append(_make_run(pieces, current, target_lang))
+            pieces = []
+        current = label
+        pieces.extend([sentence, sep])
+    runs.append(_make_run(pieces, current, target_lang))
+    return runs
+
+
+def _make_run(pieces: List[str], language: str, target_lang: str) -> Run:
+    body = "".join(pieces)
+    stripped = body.rstrip()
+    # The run's label came from its sentences; the run as a whole must confirm it.
+    certain = confident_language(stripped) == language
+    return Run(stripped, body[len(stripped):], language, certain and same_language(language, target_lang), certain)
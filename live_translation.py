@@ -0,0 +1,190 @@
+# live_translation.py
+"""Translate-as-you-type: debounce edits and cancel stale requests.
+
+A `LiveTranslator` is fed every new version of the input with `submit()`.
+A job only starts once the text has stayed the same for `debounce`
+seconds, so a burst of edits costs one request. If a newer text arrives
+while a job is still running, that job is cancelled: its HTTP requests
+are closed, so the provider stops generating an answer nobody will read.
+
+Jobs run through `atranslate_incremental`, so paragraphs that are the
+same as in the last finished job are reused and only the edited ones
+are sent. All translators share one event loop on a daemon thread.
+"""
+import asyncio
+import threading
+import time
+from typing import Any, Dict, NamedTuple, Optional
+
+from glossary import Glossary
+from translator_agent import (
+    DEFAULT_MODEL,
+    DEFAULT_PROVIDER,
+    DEFAULT_TEMPERATURE,
+    Alignment,
+    atranslate_incremental,
+)
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="live-translation", daemon=True).start()
+                _loop = loop
+    return _loop
+
+
+class LiveResult(NamedTuple):
+    revision: int  # the submit() this result answers
+    text: str
+    translation: str
+    sent: int  # paragraphs sent to the model
+    seconds: float  # from the end of the debounce to the answer
+    error: Optional[BaseException]
+    request: Dict[str, Any]  # what was sent: text, source_lang, target_lang, domain, mode, glossary
+
+
+class LiveTranslator:
+    """Debounced, cancellable translation of the latest submitted text.
+
+    Thread-safe; meant to live in one UI session. `result()` is the
+    newest finished job, which may be older than the latest submit.
+    """
+
+    def __init__(
+        self,
+        debounce: float = 0.4,
+        provider: str = DEFAULT_PROVIDER,
+        model: str = DEFAULT_MODEL,
+        temperature: float = DEFAULT_TEMPERATURE,
+        max_concurrency: int = 4,
+    ):
+        self.debounce = debounce
+        self.provider = provider
+        self.model = model
+        self.temperature = temperature
+        self.max_concurrency = max_concurrency
+        self.revision = 0
+        # submitted: new texts; debounced: replaced before their job started;
+        # cancelled: replaced while their job was running.
+        self.stats = {"submitted": 0, "debounced": 0, "started": 0, "cancelled": 0, "completed": 0}
+        self.alignment: Optional[Alignment] = None
+        self._request: Optional[Dict[str, Any]] = None
+        self._result: Optional[LiveResult] = None
+        self._task: Optional["asyncio.Task[None]"] = None
+        self._cond = threading.Condition()
+
+    def submit(
+        self,
+        text: str,
+        source_lang: str,
+        target_lang: str,
+        domain: Optional[str],
+        mode: Optional[str] = None,
+        glossary: Optional[Glossary] = None,
+    ) -> int:
+        """Make `text` the one to translate; returns its revision.
+
+        Submitting the same request again is a no-op. `glossary` is the
+        session's own term base (see glossary).
+        """
+        request = {
+            "text": text,
+            "source_lang": source_lang,
+            "target_lang": target_lang,
+            "domain": domain,
+            "mode": mode,
+            "glossary": glossary,
+        }
+        with self._cond:
+            if request == self._request:
+                return self.revision
+            self._request = request
+            self.revision += 1
+            self.stats["submitted"] += 1
+            revision = self.revision
+        _get_loop().call_soon_threadsafe(self._schedule, revision, request)
+        return revision
+
+    def result(self) -> Optional[LiveResult]:
+        with self._cond:
+            return self._result
+
+    @property
+    def pending(self) -> bool:
+        """True while the latest submitted text has no result yet."""
+        with self._cond:
+            return self._pending_locked()
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[LiveResult]:
+        """Block until the latest submitted text is translated (or `timeout`)."""
+        with self._cond:
+            self._cond.wait_for(lambda: not self._pending_locked(), timeout)
+            return self._result
+
+    def cancel(self) -> None:
+        """Drop the pending or running job, if any (`wait()` then times out)."""
+        with self._cond:
+            self._request = None
+        _get_loop().call_soon_threadsafe(self._cancel_task)
+
+    def _pending_locked(self) -> bool:
+        return self.revision > 0 and (self._result is None or self._result.revision < self.revision)
+
+    # Everything below runs on the shared event loop.
+    def _cancel_task(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+
+    def _schedule(self, revision: int, request: Dict[str, Any]) -> None:
+        self._cancel_task()
+        self._task = asyncio.get_running_loop().create_task(self._run(revision, request))
+
+    async def _run(self, revision: int, request: Dict[str, Any]) -> None:
+        try:
+            await asyncio.sleep(self.debounce)
+        except asyncio.CancelledError:
+            self._count("debounced")
+            raise
+        self._count("started")
+        started = time.monotonic()
+        if not request["text"].strip():
+            self._finish(LiveResult(revision, request["text"], "", 0, 0.0, None, request), None)
+            return
+        try:
+            translation, alignment, sent = await atranslate_incremental(
+                previous=self.alignment,
+                provider=self.provider,
+                model=self.model,
+                temperature=self.temperature,
+                max_concurrency=self.max_concurrency,
+                **request,
+            )
+        except asyncio.CancelledError:
+            self._count("cancelled")
+            raise
+        except Exception as e:
+            self._finish(LiveResult(revision, request["text"], "", 0, time.monotonic() - started, e, request), None)
+        else:
+            result = LiveResult(
+                revision, request["text"], translation, sent, time.monotonic() - started, None, request
+            )
+            self._finish(result, alignment)
+
+    def _count(self, stat: str) -> None:
+        with self._cond:
+            self.stats[stat] += 1
+
+    def _finish(self, result: LiveResult, alignment: Optional[Alignment]) -> None:
+        with self._cond:
+            self.stats["completed"] += 1
+            if alignment is not None:
+                self.alignment = alignment
+            self._result = result
+            self._cond.notify_all()
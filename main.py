@@ -1,15 +1,14 @@
 # app.py
 import os
-from typing import List
 
 import streamlit as st
-from langchain_core.messages import HumanMessage, AIMessage
 
 from dotenv import load_dotenv
 
 load_dotenv()
 
-from translator_agent import translate
+from session_history import SessionHistory
+from translator_agent import translate, warm_up
 
 # --- Basic page config ---
 st.set_page_config(
@@ -26,10 +25,19 @@ Use **xAI Grok** + **LangChain** to translate text with context understanding.
 
 - English ↔ Any language
 - Domain-aware (legal, technical, marketing, etc.)
-- Keeps context across this session for more consistent terminology.
+- Keeps a short history of this session's translations.
 """
 )
 
+
+@st.cache_resource(show_spinner=False)
+def start_warm_up():
+    """Load the provider SDK and client in the background, once per process."""
+    return warm_up()
+
+
+start_warm_up()
+
 # --- Check API key ---
 if "GOOGLE_API_KEY" not in os.environ or not os.environ["GOOGLE_API_KEY"]:
     st.warning(
@@ -37,9 +45,9 @@ if "GOOGLE_API_KEY" not in os.environ or not os.environ["GOOGLE_API_KEY"]:
         "Set it locally before running, and as a secret when deploying."
     )
 
-# --- Session state for history ---
+# --- Session state for history (bounded; the translator itself is stateless) ---
 if "history" not in st.session_state:
-    st.session_state.history: List = []
+    st.session_state.history = SessionHistory(capacity=20)
 
 if "last_translation" not in st.session_state:
     st.session_state.last_translation = ""
@@ -94,7 +102,7 @@ domain = st.sidebar.text_input(
 )
 
 if st.sidebar.button("Clear session context"):
-    st.session_state.history = []
+    st.session_state.history.clear()
     st.session_state.last_translation = ""
     st.sidebar.success("Cleared conversation context.")
 
@@ -122,25 +130,14 @@ if translate_clicked:
     else:
         with st.spinner("Translating with Grok..."):
             try:
-                history_msgs: List = st.session_state.history
-
                 output = translate(
                     text=input_text,
                     source_lang=source_lang,
                     target_lang=target_lang,
                     domain=domain,
-                    history=history_msgs,
-                )
-
-                # Update history (agentic context)
-                history_msgs.append(
-                    HumanMessage(
-                        content=f"Translate ({source_lang} → {target_lang}, domain={domain}): {input_text}"
-                    )
                 )
-                history_msgs.append(AIMessage(content=output))
 
-                st.session_state.history = history_msgs
+                st.session_state.history.add(input_text, output, source_lang, target_lang)
                 st.session_state.last_translation = output
 
             except Exception as e:
@@ -152,8 +149,8 @@ if st.session_state.last_translation:
     st.write(st.session_state.last_translation)
 
 # --- Show minimal history so user sees context ---
-if st.session_state.history:
-    with st.expander("Conversation context used by the agent"):
-        for msg in st.session_state.history[-6:]:
-            role = "👤 User" if isinstance(msg, HumanMessage) else "🤖 Grok"
-            st.markdown(f"**{role}:** {msg.content}")
+if len(st.session_state.history):
+    with st.expander("Recent translations"):
+        for record in reversed(st.session_state.history.recent(3)):
+            st.markdown(f"**👤 User** ({record.source_lang} → {record.target_lang}): {record.input_preview}")
+            st.markdown(f"**🤖 Grok:** {record.output_preview}")
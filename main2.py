@@ -1,13 +1,29 @@
 # app.py (or main2.py)
+import csv
+import io
 import os
-from typing import List
+from typing import Any, Dict, List
 import time
+from collections import deque
 
 import streamlit as st
 from dotenv import load_dotenv
-from langchain_core.messages import HumanMessage, AIMessage
+from langchain_core.callbacks import get_usage_metadata_callback
 
-from translator_agent import translate
+from fan_out import translate_fan_out
+from glossary import Glossary, glossary_for, missing_terms
+from instrumentation import METRICS
+from live_translation import LiveTranslator
+from segment_memory import SegmentMemory
+from session_history import SessionHistory
+from translation_cache import TranslationCache, cached_translate, cached_translate_stream
+from translator_agent import (
+    align_paragraphs,
+    reusable_paragraphs,
+    translate_incremental,
+    translate_long_document,
+    warm_up,
+)
 
 # -------------------- Setup --------------------
 load_dotenv()
@@ -65,17 +81,91 @@ if "GOOGLE_API_KEY" not in os.environ or not os.environ["GOOGLE_API_KEY"]:
     st.error("⚠️ `GOOGLE_API_KEY` not set. Please configure it in your .env file.")
     st.stop()
 
+
+@st.cache_resource(show_spinner=False)
+def start_warm_up():
+    """Import the provider SDK and build the shared chain in the background,
+    once per server process, so the first page render doesn't wait for it."""
+    return warm_up()
+
+
+@st.cache_resource(show_spinner=False)
+def load_translation_cache():
+    """Translation memory shared by every session of this server."""
+    return TranslationCache()
+
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def load_glossary(data: bytes, name: str, source_lang: str, target_lang: str):
+    """Compile an uploaded term base once; reruns reuse the automaton."""
+    delimiter = "\t" if name.endswith(".tsv") else ","
+    return Glossary.from_csv(io.StringIO(data.decode("utf-8-sig")), source_lang, target_lang, delimiter)
+
+
+@st.cache_resource(show_spinner=False)
+def load_segment_memory():
+    """Sentence-level memory so edited documents only re-send changed sentences."""
+    return SegmentMemory()
+
+
+start_warm_up()
+translation_cache = load_translation_cache()
+segment_memory = load_segment_memory()
+
+@st.fragment(run_every=0.5)
+def live_panel():
+    """Poll the live translator; only this fragment reruns while waiting."""
+    live = st.session_state["live"]
+    result = live.result()
+    if live.pending:
+        st.caption("⏳ Translating your latest edit...")
+    if result is None:
+        return
+    if result.error is not None:
+        st.error(f"❌ Translation error: {result.error}")
+        return
+    st.markdown(result.translation)
+    st.caption(
+        f"⚡ {result.sent} paragraph(s) sent, {result.seconds:.2f}s • "
+        f"{live.stats['debounced']} edits merged, {live.stats['cancelled']} stale requests cancelled"
+    )
+    if result.revision > st.session_state["live_revision"]:
+        st.session_state["live_revision"] = result.revision
+        st.session_state["last_translation"] = result.translation
+        st.session_state["last_input"] = result.text
+        st.session_state["alignment"] = live.alignment
+        st.session_state["translation_count"] += 1
+        # The settings the text was sent with; the sidebar may have changed since.
+        request = result.request
+        st.session_state["history"].add(
+            result.text, result.translation, request["source_lang"], request["target_lang"], request["mode"]
+        )
+
+
 # -------------------- Session State --------------------
 if "history" not in st.session_state:
-    st.session_state["history"]: List = []
+    st.session_state["history"] = SessionHistory()
 if "last_translation" not in st.session_state:
     st.session_state["last_translation"] = ""
+if "alignment" not in st.session_state:
+    st.session_state["alignment"] = None  # paragraph pairs of the last job, for incremental edits
 if "last_input" not in st.session_state:
     st.session_state["last_input"] = ""
 if "translation_time" not in st.session_state:
     st.session_state["translation_time"] = 0.0
+if "first_token_time" not in st.session_state:
+    st.session_state["first_token_time"] = 0.0
 if "translation_count" not in st.session_state:
     st.session_state["translation_count"] = 0
+if "latencies" not in st.session_state:
+    # (total, first token) seconds of recent translations
+    st.session_state["latencies"] = deque(maxlen=1000)
+if "live" not in st.session_state:
+    st.session_state["live"] = LiveTranslator()  # debounced translate-as-you-type
+if "live_revision" not in st.session_state:
+    st.session_state["live_revision"] = 0  # last live result put into the history
+if "fan_out" not in st.session_state:
+    st.session_state["fan_out"] = None  # last multi-language job: input, results, seconds
 if "favorite_translations" not in st.session_state:
     st.session_state["favorite_translations"] = []
 if "translation_mode" not in st.session_state:
@@ -146,6 +236,18 @@ with st.sidebar:
 
     source_lang = language_options[source_label]
     target_lang = language_options[target_label]
+
+    fan_out_mode = st.checkbox(
+        "🌐 Translate into several languages",
+        value=False,
+        help="One job for all selected languages; the results come back as a table.",
+    )
+    if fan_out_mode:
+        fan_out_labels = [label for label in lang_labels if language_options[label] not in ("auto", "Other")]
+        fan_out_targets = [
+            language_options[label]
+            for label in st.multiselect("Target languages:", fan_out_labels, default=fan_out_labels)
+        ]
     
     st.divider()
     
@@ -180,8 +282,53 @@ with st.sidebar:
     
     if custom_context:
         domain = custom_context
+
+    glossary_file = st.file_uploader(
+        "📖 Glossary (CSV/TSV: source, target)",
+        type=["csv", "tsv"],
+        help="Terms found in the text are put into the prompt and checked in the answer. "
+        "Applies to the selected language pair, in this session only.",
+    )
+    # Kept per session and passed with each request, never registered process-wide
+    st.session_state["glossary"] = None
+    if glossary_file is not None:
+        st.session_state["glossary"] = load_glossary(
+            glossary_file.getvalue(), glossary_file.name, source_lang, target_lang
+        )
+        st.caption(f"📖 {len(st.session_state['glossary'])} terms for {source_lang} → {target_lang}")
+
+    reuse_sentences = st.checkbox(
+        "♻️ Reuse sentence memory",
+        value=True,
+        help="Only send new or changed sentences to the model.",
+    )
+
+    live_mode = st.checkbox(
+        "⚡ Live translation",
+        value=False,
+        disabled=fan_out_mode,
+        help="Translate after every edit, without clicking. Quick edits are merged "
+        "and a request that an edit made stale is cancelled.",
+    )
+    live_mode = live_mode and not fan_out_mode
+    if live_mode:
+        st.session_state["live"].debounce = st.slider("Wait after an edit (ms)", 0, 2000, 400, step=100) / 1000
     
     st.divider()
+
+    # Long-document mode
+    st.subheader("📄 Long Documents")
+    long_doc_mode = st.checkbox(
+        "Split into chunks and translate in parallel",
+        value=False,
+        help="For long texts: chunks are cut on paragraph/sentence boundaries.",
+    )
+    if long_doc_mode:
+        chunk_tokens = st.slider("Chunk size (tokens)", 200, 4000, 800, step=100)
+        overlap_sentences = st.slider("Context overlap (sentences)", 0, 3, 1)
+        chunk_workers = st.slider("Parallel requests", 1, 8, 4)
+
+    st.divider()
     
     # Statistics
     st.subheader("📊 Statistics")
@@ -190,16 +337,47 @@ with st.sidebar:
         st.metric("Translations", st.session_state["translation_count"])
     with col2:
         st.metric("Favorites", len(st.session_state["favorite_translations"]))
+    cache_stats = translation_cache.stats()
+    col3, col4 = st.columns(2)
+    with col3:
+        st.metric("Cache hits", cache_stats["hits"])
+    with col4:
+        st.metric("Cache misses", cache_stats["misses"])
+
+    latencies = st.session_state["latencies"]
+    if latencies:
+        totals = sorted(total for total, _first in latencies)
+        firsts = sorted(first for _total, first in latencies)
+
+        def pct(samples: List[float], p: int) -> str:
+            return f"{samples[min(len(samples) - 1, len(samples) * p // 100)]:.2f}s"
+
+        st.caption("Latency this session (total / first token)")
+        col5, col6, col7 = st.columns(3)
+        for col, p in zip((col5, col6, col7), (50, 95, 99)):
+            with col:
+                st.metric(f"p{p}", pct(totals, p), help=f"first token after {pct(firsts, p)}")
+    stage_stats = METRICS.summary()
+    if stage_stats:
+        with st.expander("⏱️ Stages (p50 / p95 / p99 ms)"):
+            st.dataframe(
+                [dict(stage=stage, **row) for stage, row in stage_stats.items()],
+                use_container_width=True,
+                hide_index=True,
+            )
+            tokens = METRICS.tokens()
+            st.caption(f"Tokens: prompt {tokens['prompt']} / completion {tokens['completion']}")
     
     st.divider()
     
     # Actions
     if st.button("🗑️ Clear History", use_container_width=True):
-        st.session_state["history"] = []
+        st.session_state["history"].clear()
         st.session_state["last_translation"] = ""
         st.success("History cleared!")
     
     if st.button("🔄 Reset All", use_container_width=True):
+        st.session_state["history"].clear()
         st.session_state.clear()
         st.experimental_rerun()
 
@@ -237,13 +415,55 @@ with tab1:
     with col2:
         st.markdown("### ✨ Translation")
         
-        translate_clicked = st.button(
+        if live_mode:
+            if input_text.strip():
+                st.session_state["live"].submit(
+                    input_text, source_lang, target_lang, domain, translation_mode, st.session_state["glossary"]
+                )
+            else:
+                st.session_state["live"].cancel()
+            live_panel()
+
+        translate_clicked = not live_mode and st.button(
             "🚀 Translate Now",
             use_container_width=True,
             type="primary",
         )
 
-        if translate_clicked:
+        if translate_clicked and fan_out_mode:
+            if not input_text.strip() or not fan_out_targets:
+                st.error("⚠️ Please enter some text and pick at least one language.")
+            else:
+                with st.spinner(f"🔄 Translating into {len(fan_out_targets)} languages..."):
+                    try:
+                        # Detection, chunking and masking run once for all targets
+                        start_time = time.time()
+                        results = translate_fan_out(
+                            input_text,
+                            source_lang,
+                            fan_out_targets,
+                            domain=domain,
+                            mode=translation_mode,
+                            cache=translation_cache,
+                            glossary=st.session_state["glossary"],
+                        )
+                        end_time = time.time()
+                        st.session_state["fan_out"] = {
+                            "input": input_text,
+                            "results": results,
+                            "seconds": end_time - start_time,
+                        }
+                        st.session_state["translation_count"] += 1
+                        st.session_state["latencies"].append((end_time - start_time, end_time - start_time))
+                        for language, output in results.items():
+                            if output is not None:
+                                st.session_state["history"].add(
+                                    input_text, output, source_lang, language, translation_mode
+                                )
+                    except Exception as e:
+                        st.error(f"❌ Translation error: {e}")
+
+        elif translate_clicked:
             # ⭐ This always uses the CURRENT content of the input box
             current_text = input_text
 
@@ -252,51 +472,153 @@ with tab1:
             else:
                 with st.spinner("🔄 Translating with AI..."):
                     try:
-                        mode_instructions = {
-                            "Formal": "Use formal and professional language.",
-                            "Casual": "Use casual and conversational language.",
-                            "Technical": "Maintain technical terminology and precision.",
-                            "Creative": "Be creative and expressive in translation.",
-                        }
-                        final_domain = domain
-                        if translation_mode in mode_instructions:
-                            final_domain += f" {mode_instructions[translation_mode]}"
-
+                        # The mode selects a pre-rendered compact prompt (prompts.py)
                         start_time = time.time()
-                        # NOTE: translator is stateless; no history passed
-                        output = translate(
-                            text=current_text,
-                            source_lang=source_lang,
-                            target_lang=target_lang,
-                            domain=final_domain,
+                        # Paragraphs unchanged since the last job are spliced back in
+                        previous = st.session_state["alignment"]
+                        reused, paragraphs = reusable_paragraphs(
+                            current_text, previous, source_lang, target_lang, domain, translation_mode
                         )
+                        job: Dict[str, Any] = {}
+
+                        def translate_edit(text, src, tgt, dom, mode=None, glossary=None):
+                            output, job["alignment"], job["sent"] = translate_incremental(
+                                text, src, tgt, dom, previous, mode=mode, glossary=glossary
+                            )
+                            return output
+
+                        with get_usage_metadata_callback() as usage:
+                            # NOTE: translator is stateless; no history passed
+                            if reused and paragraphs > 1:
+                                output, from_cache = cached_translate(
+                                    text=current_text,
+                                    source_lang=source_lang,
+                                    target_lang=target_lang,
+                                    domain=domain,
+                                    mode=translation_mode,
+                                    cache=translation_cache,
+                                    translate_fn=translate_edit,
+                                    glossary=st.session_state["glossary"],
+                                )
+                                first_token_time = time.time()
+                            elif long_doc_mode:
+                                output, from_cache = cached_translate(
+                                    text=current_text,
+                                    source_lang=source_lang,
+                                    target_lang=target_lang,
+                                    domain=domain,
+                                    mode=translation_mode,
+                                    cache=translation_cache,
+                                    translate_fn=translate_long_document,
+                                    glossary=st.session_state["glossary"],
+                                    max_chunk_tokens=chunk_tokens,
+                                    overlap_sentences=overlap_sentences,
+                                    max_workers=chunk_workers,
+                                )
+                                first_token_time = time.time()
+                            else:
+                                chunks, from_cache = cached_translate_stream(
+                                    text=current_text,
+                                    source_lang=source_lang,
+                                    target_lang=target_lang,
+                                    domain=domain,
+                                    mode=translation_mode,
+                                    cache=translation_cache,
+                                    memory=segment_memory if reuse_sentences else None,
+                                    glossary=st.session_state["glossary"],
+                                )
+                                # Live preview while tokens arrive
+                                stream_box = st.empty()
+                                output = ""
+                                first_token_time = None
+                                for chunk in chunks:
+                                    if first_token_time is None:
+                                        first_token_time = time.time()
+                                    output += chunk
+                                    stream_box.markdown(output + "▌")
+                                stream_box.empty()
                         end_time = time.time()
+                        if first_token_time is None:
+                            first_token_time = end_time
 
                         # update UI state
                         st.session_state["last_translation"] = output
+                        st.session_state["alignment"] = job.get("alignment") or align_paragraphs(
+                            current_text, output, source_lang, target_lang, domain, translation_mode
+                        )
                         st.session_state["last_input"] = current_text
                         st.session_state["translation_time"] = end_time - start_time
+                        st.session_state["first_token_time"] = first_token_time - start_time
                         st.session_state["translation_count"] += 1
+                        st.session_state["latencies"].append(
+                            (end_time - start_time, first_token_time - start_time)
+                        )
+                        st.session_state["prompt_tokens"] = sum(
+                            u["input_tokens"] for u in usage.usage_metadata.values()
+                        )
+                        st.session_state["completion_tokens"] = sum(
+                            u["output_tokens"] for u in usage.usage_metadata.values()
+                        )
 
-                        # history just for UI / context display
-                        st.session_state["history"].append(
-                            HumanMessage(
-                                content=f"[{translation_mode}] "
-                                        f"{source_lang} → {target_lang}: "
-                                        f"{current_text}"
-                            )
+                        # history just for UI display (bounded, see session_history)
+                        st.session_state["history"].add(
+                            current_text, output, source_lang, target_lang, translation_mode
                         )
-                        st.session_state["history"].append(AIMessage(content=output))
 
+                        source_note = " (⚡ from cache)" if from_cache else ""
                         st.success(
-                            f"✅ Translated in {st.session_state['translation_time']:.2f}s"
+                            f"✅ Translated in {st.session_state['translation_time']:.2f}s "
+                            f"(first token after {st.session_state['first_token_time']:.2f}s)"
+                            f"{source_note}"
                         )
+                        glossary = glossary_for(source_lang, target_lang, st.session_state["glossary"])
+                        terms = glossary.terms_in(current_text) if glossary is not None else []
+                        if terms:
+                            missing = missing_terms(output, terms)
+                            st.caption(
+                                f"📖 {len(terms) - len(missing)} of {len(terms)} glossary terms used"
+                                + (f"; missing: {', '.join(t.source for t in missing)}" if missing else "")
+                            )
+                        if "sent" in job:
+                            st.caption(
+                                f"♻️ Re-translated {job['sent']} of {paragraphs} paragraphs; "
+                                f"the rest were reused from the previous translation."
+                            )
+                        if not from_cache:
+                            st.caption(
+                                f"🔢 Tokens: prompt {st.session_state['prompt_tokens']} / "
+                                f"completion {st.session_state['completion_tokens']}"
+                            )
 
                     except Exception as e:
                         st.error(f"❌ Translation error: {e}")
 
+        # Show the last multi-language job as a table
+        if fan_out_mode and st.session_state["fan_out"]:
+            job = st.session_state["fan_out"]
+            failed = [language for language, output in job["results"].items() if output is None]
+            st.success(f"✅ {len(job['results'])} languages in {job['seconds']:.2f}s")
+            if failed:
+                st.warning(f"⚠️ Failed: {', '.join(failed)}")
+            rows = [
+                {"Language": language, "Translation": output if output is not None else "❌"}
+                for language, output in job["results"].items()
+            ]
+            st.dataframe(rows, hide_index=True, use_container_width=True)
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(["language", "source", "translation"])
+            writer.writerows([row["Language"], job["input"], row["Translation"]] for row in rows)
+            st.download_button(
+                "⬇️ Download CSV",
+                buffer.getvalue(),
+                file_name="translations.csv",
+                mime="text/csv",
+                use_container_width=True,
+            )
+
         # Show last translation
-        if st.session_state["last_translation"]:
+        if st.session_state["last_translation"] and not live_mode and not fan_out_mode:
             st.markdown("**Source text used for this translation:**")
             st.code(st.session_state["last_input"])
 
@@ -358,18 +680,22 @@ with tab2:
 with tab3:
     st.markdown("### 📜 Translation History")
     
-    if st.session_state["history"]:
-        st.info(f"Context length: {len(st.session_state['history'])} messages")
-        
-        for msg in reversed(st.session_state["history"][-20:]):
-            if isinstance(msg, HumanMessage):
-                st.markdown("**👤 Request:**")
-                text = msg.content
-                st.text(text[:200] + "..." if len(text) > 200 else text)
-            else:
-                st.markdown("**🤖 Response:**")
-                text = msg.content
-                st.success(text[:200] + "..." if len(text) > 200 else text)
+    history = st.session_state["history"]
+    if len(history):
+        st.info(f"{history.total} translations this session, showing the last {min(len(history), 20)}")
+
+        for record in history.recent(20):
+            st.markdown(
+                f"**👤 Request** [{record.mode}] {record.source_lang} → {record.target_lang} · "
+                f"{time.strftime('%H:%M:%S', time.localtime(record.timestamp))}"
+            )
+            st.text(record.input_preview)
+            st.markdown("**🤖 Response:**")
+            st.success(record.output_preview)
+            if record.truncated and st.button("Show full text", key=f"full_{record.id}"):
+                full_input, full_output = history.load(record)
+                st.text(full_input)
+                st.success(full_output)
             st.divider()
     else:
         st.info("No translation history yet. Start translating!")
@@ -0,0 +1,198 @@
+# micro_batch.py
+"""Pack many short strings into one prompt ("micro-batching").
+
+For short UI strings the system prompt is often longer than the string
+itself. Strings that share a language pair and domain are sent together
+as numbered JSON lines, the answer is parsed back per item, and only the
+items that are missing or malformed in the answer are re-sent on their
+own through the regular translation chain. So are items containing
+glossary terms: the packed prompt has no room for per-item terms, and
+the regular chain puts them in and checks the answer (see glossary).
+Packed answers that fail quality's checks are re-sent the same way,
+within a retry budget per job.
+"""
+import asyncio
+import json
+import re
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from langchain_core.prompts import ChatPromptTemplate
+
+from glossary import glossary_for
+from lang_detect import in_target_language, resolve_source
+from protected_spans import mask, missing_sentinels, restore
+from quality import QualityBudget, retry_flags
+from segmentation import estimate_tokens
+import translator_agent  # QUALITY_GATE is read per call
+from translator_agent import (
+    DEFAULT_MODEL,
+    DEFAULT_PROVIDER,
+    DEFAULT_TEMPERATURE,
+    HUMAN_PROMPT,
+    atranslate_batch,
+    get_translation_chain,
+    make_payload,
+    register_prompt,
+)
+
+PACKED_SYSTEM_PROMPT = """
+You are a professional translation engine.
+Every input line is a JSON object {{"id": <number>, "text": <string>}}.
+Translate each "text" from the source language to the target language, using the domain/context for terminology.
+Answer with exactly one JSON line per input line, in the same order and with the same "id": {{"id": <number>, "text": <translation>}}
+Copy markers like ⟦0⟧ unchanged; they stand for code, links or numbers.
+Output ONLY the JSON lines, no commentary.
+"""
+
+PACKED_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        ("system", PACKED_SYSTEM_PROMPT),
+        ("human", HUMAN_PROMPT),
+    ]
+)
+register_prompt("packed", PACKED_PROMPT)
+
+_FENCE = re.compile(r"^```[a-z]*\s*$", re.MULTILINE)
+
+GroupKey = Tuple[str, str, str]  # (source_lang, target_lang, domain)
+
+
+def pack(
+    texts: Sequence[Tuple[int, str]],
+    max_items: int = 25,
+    max_tokens: int = 800,
+) -> List[List[Tuple[int, str]]]:
+    """Split (index, text) pairs into packs bounded by item count and tokens."""
+    packs: List[List[Tuple[int, str]]] = []
+    current: List[Tuple[int, str]] = []
+    tokens = 0
+    for index, text in texts:
+        size = estimate_tokens(text) + 8  # JSON framing per line
+        if current and (len(current) >= max_items or tokens + size > max_tokens):
+            packs.append(current)
+            current, tokens = [], 0
+        current.append((index, text))
+        tokens += size
+    if current:
+        packs.append(current)
+    return packs
+
+
+def render_pack(items: Sequence[Tuple[int, str]]) -> str:
+    """Numbered JSON lines; ids are positions within the pack (1-based)."""
+    return "\n".join(
+        json.dumps({"id": n, "text": text}, ensure_ascii=False)
+        for n, (_index, text) in enumerate(items, start=1)
+    )
+
+
+def parse_pack(output: str, size: int) -> Dict[int, str]:
+    """Map pack ids (1..size) to translations; bad or missing lines are left out."""
+    parsed: Dict[int, str] = {}
+    for line in _FENCE.sub("", output).splitlines():
+        line = line.strip()
+        if not line.startswith("{"):
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError:
+            continue
+        if not isinstance(item, dict):
+            continue
+        n, text = item.get("id"), item.get("text")
+        if isinstance(n, int) and 1 <= n <= size and isinstance(text, str) and n not in parsed:
+            parsed[n] = text
+    return parsed
+
+
+async def atranslate_packed(
+    items: Sequence[Mapping[str, Any]],
+    max_pack_items: int = 25,
+    max_pack_tokens: int = 800,
+    short_item_tokens: int = 64,
+    max_concurrency: int = 4,
+    provider: str = DEFAULT_PROVIDER,
+    model: str = DEFAULT_MODEL,
+    temperature: float = DEFAULT_TEMPERATURE,
+) -> List[Optional[str]]:
+    """Translate `items` (as for `atranslate_batch`), packing short strings.
+
+    Items longer than `short_item_tokens` or holding glossary terms, and
+    packed items the model did not answer cleanly (including lost ⟦n⟧
+    markers, see protected_spans), go through the regular chain one by one. Results
+    are in input order; an item that still fails is None. Items already
+    in their target language are returned unchanged.
+    """
+    results: List[Optional[str]] = [None] * len(items)
+    sources = [resolve_source(item["text"], item["source_lang"]) for item in items]
+    groups: Dict[GroupKey, List[Tuple[int, str]]] = {}
+    singles: List[int] = []
+    masked = {}
+    for index, item in enumerate(items):
+        text = item["text"]
+        if in_target_language(text, item["source_lang"], item["target_lang"]):
+            results[index] = text
+            continue
+        if estimate_tokens(text) > short_item_tokens or "\n" in text:
+            singles.append(index)
+            continue
+        glossary = glossary_for(sources[index], item["target_lang"], item.get("glossary"))
+        if glossary is not None and glossary.terms_in(text):
+            singles.append(index)
+            continue
+        masked[index] = mask(text)
+        payload = make_payload("", sources[index], item["target_lang"], item.get("domain"))
+        key = (payload["source_lang"], payload["target_lang"], payload["domain"])
+        groups.setdefault(key, []).append((index, masked[index].text))
+
+    packs: List[Tuple[GroupKey, List[Tuple[int, str]]]] = [
+        (key, chunk)
+        for key, texts in groups.items()
+        for chunk in pack(texts, max_pack_items, max_pack_tokens)
+    ]
+    if packs:
+        packed_chain = get_translation_chain(model, temperature, provider, prompt_name="packed")
+        outputs = await packed_chain.abatch(
+            [make_payload(render_pack(chunk), *key) for key, chunk in packs],
+            config={"max_concurrency": max_concurrency},
+            return_exceptions=True,
+        )
+        answered: List[int] = []
+        for (_key, chunk), output in zip(packs, outputs):
+            parsed = {} if isinstance(output, BaseException) else parse_pack(output, len(chunk))
+            for n, (index, _text) in enumerate(chunk, start=1):
+                spans = masked[index].spans
+                if n in parsed and not missing_sentinels(parsed[n], spans):
+                    results[index] = restore(parsed[n], spans)
+                    answered.append(index)
+                else:
+                    singles.append(index)
+        if answered and translator_agent.QUALITY_GATE:
+            # The packed chain has no QualityGate; failed answers go to the gated one.
+            flags = retry_flags(
+                QualityBudget(),
+                [items[i]["text"] for i in answered],
+                [results[i] for i in answered],
+                [items[i]["target_lang"] for i in answered],
+            )
+            singles.extend(index for index, retry in zip(answered, flags) if retry)
+
+    if singles:
+        singles.sort()
+        outputs = await atranslate_batch(
+            [dict(items[i], source_lang=sources[i]) for i in singles],
+            max_concurrency,
+            provider,
+            model,
+            temperature,
+            return_exceptions=True,
+        )
+        for index, output in zip(singles, outputs):
+            if not isinstance(output, BaseException):
+                results[index] = output
+    return results
+
+
+def translate_packed(items: Sequence[Mapping[str, Any]], **kwargs: Any) -> List[Optional[str]]:
+    """Blocking wrapper around `atranslate_packed`."""
+    return asyncio.run(atranslate_packed(items, **kwargs))
@@ -0,0 +1,109 @@
+# prompts.py
+"""Compact translation prompts, pre-rendered per (mode, domain preset).
+
+The verbose SYSTEM_PROMPT in translator_agent costs the same tokens on
+every call, and the UI used to append free-text mode instructions to the
+domain. Here each (mode, domain preset) pair gets one minimal template,
+built once and reused:
+
+- the system message starts with STATIC_PREFIX, identical for every
+  request, so providers that cache prompt prefixes can reuse it; the
+  mode and preset lines follow it;
+- the human message only carries what changes per request, including
+  the glossary terms found in the text (`terms`, see glossary.py) and
+  a similar sentence translated earlier (`reference`, see
+  segment_memory.py).
+
+Domains that aren't presets (custom context, chunk context) use a
+generic template with the domain as a variable, so the number of
+templates stays bounded.
+"""
+import threading
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from langchain_core.prompts import ChatPromptTemplate
+
+from segmentation import estimate_tokens
+
+STATIC_PREFIX = (
+    "Translate the user's text into the target language. Keep meaning, tone, "
+    "formatting and line breaks. Copy markers like ⟦0⟧ unchanged. If the source "
+    "is \"auto\", detect it. Reply with the translation only."
+)
+
+DEFAULT_MODE = "Standard"
+
+MODE_INSTRUCTIONS: Dict[str, str] = {
+    "Standard": "",
+    "Formal": "Use formal, professional language.",
+    "Casual": "Use casual, conversational language.",
+    "Technical": "Keep technical terms precise.",
+    "Creative": "Be creative and expressive.",
+}
+
+# Preset domain -> terminology hint baked into its template.
+DOMAIN_PRESETS: Dict[str, str] = {
+    "general": "",
+    "general conversation": "",
+    "legal documents and contracts": "Domain: legal. Use precise legal terminology.",
+    "medical and healthcare": "Domain: medical. Use standard clinical terminology.",
+    "software and technology": "Domain: software. Keep product and UI terms consistent.",
+    "marketing and advertising": "Domain: marketing. Keep it persuasive and natural.",
+    "academic and research": "Domain: academic. Keep an academic register.",
+    "movies and entertainment": "Domain: entertainment.",
+    "news and journalism": "Domain: news. Keep a neutral journalistic tone.",
+    "business communication": "Domain: business communication.",
+    "creative writing and arts": "Domain: creative writing.",
+}
+
+COMPACT_HUMAN = "{source_lang} -> {target_lang}{terms}{reference}\n```text\n{text}\n```"
+GENERIC_HUMAN = "{source_lang} -> {target_lang}\nDomain: {domain}{terms}{reference}\n```text\n{text}\n```"
+
+
+class CompiledPrompt(NamedTuple):
+    name: str  # key for translator_agent.register_prompt
+    template: ChatPromptTemplate
+    static_tokens: int  # prompt tokens before the per-request variables
+
+
+def _escape(text: str) -> str:
+    return text.replace("{", "{{").replace("}", "}}")
+
+
+_compiled: Dict[Tuple[str, str], CompiledPrompt] = {}
+_compiled_lock = threading.Lock()
+
+
+def compile_prompt(mode: Optional[str], domain: Optional[str]) -> CompiledPrompt:
+    """The cached template for (mode, domain); unknown modes count as Standard."""
+    mode = mode if mode in MODE_INSTRUCTIONS else DEFAULT_MODE
+    normalized = (domain or "general").strip().lower()
+    preset = normalized if normalized in DOMAIN_PRESETS else "*"
+    key = (mode, preset)
+    compiled = _compiled.get(key)
+    if compiled is None:
+        with _compiled_lock:
+            compiled = _compiled.get(key)
+            if compiled is None:
+                lines = [STATIC_PREFIX, MODE_INSTRUCTIONS[mode]]
+                if preset != "*":
+                    lines.append(DOMAIN_PRESETS[preset])
+                system = "\n".join(_escape(line) for line in lines if line)
+                human = COMPACT_HUMAN if preset != "*" else GENERIC_HUMAN
+                # `terms` and `reference` default to empty; GlossaryChain
+                # and translator_agent's memory path fill them in.
+                template = ChatPromptTemplate.from_messages([("system", system), ("human", human)]).partial(
+                    terms="", reference=""
+                )
+                static = template.format(source_lang="", target_lang="", domain="", text="")
+                compiled = CompiledPrompt(f"compact:{mode}:{preset}", template, estimate_tokens(static))
+                _compiled[key] = compiled
+    return compiled
+
+
+def prompt_tokens(
+    template: ChatPromptTemplate, text: str, source_lang: str, target_lang: str, domain: str
+) -> int:
+    """Estimated prompt tokens of one rendered request."""
+    rendered = template.format(source_lang=source_lang, target_lang=target_lang, domain=domain, text=text)
+    return estimate_tokens(rendered)
@@ -0,0 +1,195 @@
+# protected_spans.py
+"""Keep code, URLs, placeholders and long numbers away from the model.
+
+Before a text is sent, every protected span is replaced by a short
+sentinel (⟦0⟧, ⟦1⟧, ...); identical spans share one sentinel. The
+model is told to copy sentinels as they are, and the spans are put back
+into its answer afterwards. An answer that lost or invented a sentinel
+is re-requested, and if that also fails the unmasked text is sent
+instead, so a translation never comes back with a placeholder missing.
+
+translator_agent wraps its translation chains in `ProtectedChain`, which
+does all of this for invoke, batch and streaming calls.
+"""
+import re
+from collections import Counter
+from typing import Any, AsyncIterator, Iterator, List, Mapping, NamedTuple, Optional
+
+from langchain_core.runnables import Runnable, RunnableConfig
+
+SENTINEL_OPEN, SENTINEL_CLOSE = "⟦", "⟧"
+
+# Spans a translation must carry over verbatim.
+_VERBATIM = [
+    r"```.*?```",  # fenced code block
+    r"`[^`\n]+`",  # inline code
+    r"\b(?:https?://|www\.)[^\s<>\"'`]+",  # URL
+    r"\b[\w.+-]+@[\w-]+(?:\.[\w-]+)+",  # e-mail
+    r"\{\{[^{}\n]*\}\}|\$\{[^{}\n]+\}|\{[\w.:\-\[\]]*\}",  # {name}, {{name}}, ${name}
+    r"%(?:\(\w+\))?[-+#0]*\d*(?:\.\d+)?[sdifgxXeEr]",  # printf-style
+    r"</?[A-Za-z][^<>\n]*>",  # markup tags
+]
+_NUMBER = r"(?<![\w.,])[-+]?\d[\d,.:/]{2,}\d*(?![\w])"  # numbers of 3+ characters, dates, times
+_PROTECTED = re.compile("|".join(_VERBATIM + [_NUMBER]), re.DOTALL)
+# Numbers are left out: a translation may format them for its locale.
+_PLACEHOLDER = re.compile("|".join(_VERBATIM), re.DOTALL)
+_SENTINEL = re.compile(r"⟦\s*(\d+)\s*⟧")
+_TRAILING_PUNCTUATION = ".,;:!?)]}'\""
+
+
+class Masked(NamedTuple):
+    text: str
+    spans: List[str]  # spans[i] is what ⟦i⟧ stands for
+
+
+def sentinel(index: int) -> str:
+    return f"{SENTINEL_OPEN}{index}{SENTINEL_CLOSE}"
+
+
+def mask(text: str) -> Masked:
+    """Replace protected spans with sentinels.
+
+    Text that already contains a sentinel bracket is left alone, since
+    its markers couldn't be told apart from ours.
+    """
+    if SENTINEL_OPEN in text or SENTINEL_CLOSE in text:
+        return Masked(text, [])
+    spans: List[str] = []
+    index_of = {}
+    pieces: List[str] = []
+    last = 0
+    for match in _PROTECTED.finditer(text):
+        span = match.group(0)
+        end = match.end()
+        if span[0].isalpha() or span[0] in "+-" or span[0].isdigit():
+            # URLs, e-mails and numbers don't take the sentence's closing punctuation.
+            stripped = span.rstrip(_TRAILING_PUNCTUATION)
+            end -= len(span) - len(stripped)
+            span = stripped
+        if not span:
+            continue
+        if span not in index_of:
+            index_of[span] = len(spans)
+            spans.append(span)
+        pieces.append(text[last:match.start()])
+        pieces.append(sentinel(index_of[span]))
+        last = end
+    if not spans:
+        return Masked(text, [])
+    pieces.append(text[last:])
+    return Masked("".join(pieces), spans)
+
+
+def placeholders(text: str) -> Counter:
+    """Code, URLs, e-mails, placeholders and markup in `text`, counted."""
+    return Counter(
+        # As in mask(): URLs and e-mails don't take the sentence's closing punctuation.
+        span.rstrip(_TRAILING_PUNCTUATION) if span[0].isalpha() else span
+        for span in _PLACEHOLDER.findall(text)
+    )
+
+
+def missing_sentinels(output: str, spans: List[str]) -> List[int]:
+    """Indices that don't appear in `output`, plus any the model made up."""
+    found = {int(n) for n in _SENTINEL.findall(output)}
+    expected = set(range(len(spans)))
+    return sorted((expected - found) | (found - expected))
+
+
+def restore(output: str, spans: List[str]) -> str:
+    def put_back(match: "re.Match[str]") -> str:
+        index = int(match.group(1))
+        return spans[index] if index < len(spans) else match.group(0)
+
+    return _SENTINEL.sub(put_back, output)
+
+
+class StreamRestorer:
+    """Restore sentinels in streamed text, holding back half-received ones."""
+
+    def __init__(self, spans: List[str]):
+        self.spans = spans
+        self._pending = ""
+
+    def feed(self, part: str) -> str:
+        text = self._pending + part
+        cut = text.rfind(SENTINEL_OPEN)
+        if cut != -1 and SENTINEL_CLOSE not in text[cut:] and len(text) - cut <= 8:
+            self._pending, text = text[cut:], text[:cut]
+        else:
+            self._pending = ""
+        return restore(text, self.spans)
+
+    def flush(self) -> str:
+        text, self._pending = self._pending, ""
+        return restore(text, self.spans)
+
+
+class ProtectedChain(Runnable):
+    """Masks `input["text"]` for `chain` and restores its answer.
+
+    A non-streaming answer with missing or unknown sentinels is asked
+    for again up to `max_retries` times, then the unmasked input is
+    sent. Streams can't take text back, so they are only restored.
+    """
+
+    def __init__(self, chain: Runnable, max_retries: int = 1):
+        self.chain = chain
+        self.max_retries = max_retries
+
+    def invoke(self, input: Mapping[str, Any], config: Optional[RunnableConfig] = None, **kwargs: Any) -> str:
+        masked = mask(input["text"])
+        if not masked.spans:
+            return self.chain.invoke(input, config, **kwargs)
+        payload = dict(input, text=masked.text)
+        for _attempt in range(self.max_retries + 1):
+            output = self.chain.invoke(payload, config, **kwargs)
+            if not missing_sentinels(output, masked.spans):
+                return restore(output, masked.spans)
+        return self.chain.invoke(input, config, **kwargs)
+
+    async def ainvoke(
+        self, input: Mapping[str, Any], config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> str:
+        masked = mask(input["text"])
+        if not masked.spans:
+            return await self.chain.ainvoke(input, config, **kwargs)
+        payload = dict(input, text=masked.text)
+        for _attempt in range(self.max_retries + 1):
+            output = await self.chain.ainvoke(payload, config, **kwargs)
+            if not missing_sentinels(output, masked.spans):
+                return restore(output, masked.spans)
+        return await self.chain.ainvoke(input, config, **kwargs)
+
+    def stream(
+        self, input: Mapping[str, Any], config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> Iterator[str]:
+        masked = mask(input["text"])
+        if not masked.spans:
+            yield from self.chain.stream(input, config, **kwargs)
+            return
+        restorer = StreamRestorer(masked.spans)
+        for part in self.chain.stream(dict(input, text=masked.text), config, **kwargs):
+            text = restorer.feed(part)
+            if text:
+                yield text
+        tail = restorer.flush()
+        if tail:
+            yield tail
+
+    async def astream(
+        self, input: Mapping[str, Any], config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> AsyncIterator[str]:
+        masked = mask(input["text"])
+        if not masked.spans:
+            async for part in self.chain.astream(input, config, **kwargs):
+                yield part
+            return
+        restorer = StreamRestorer(masked.spans)
+        async for part in self.chain.astream(dict(input, text=masked.text), config, **kwargs):
+            text = restorer.feed(part)
+            if text:
+                yield text
+        tail = restorer.flush()
+        if tail:
+            yield tail
@@ -0,0 +1,314 @@
+# quality.py
+"""Cheap local checks on answers, so a bad one is retried instead of returned.
+
+Each answer is checked against its source without another model call:
+
+- empty: the source has words, the answer none;
+- commentary: the answer opens with "Here is the translation:" and the like;
+- fence: the answer still has the ``` of the prompt's text block;
+- length: the answer is far shorter (truncated) or longer than the
+  source, allowing for scripts that need fewer characters (Chinese,
+  Japanese, Korean);
+- script: most letters are not in the target language's script (only
+  for languages whose script lang_detect knows);
+- untranslated: most of the source's words come back unchanged;
+- placeholders: code, URLs, {placeholders} or markup differ from the
+  source's, or a ⟦n⟧ marker was left in.
+
+translator_agent wraps the prose chains in `QualityGate`. Its batch calls
+check all answers together and send only the failed ones again. Retries
+are capped at a share of checked answers (`QualityBudget`, one per gate),
+so a model that keeps failing a check can't multiply the spend; the
+answer with the fewest issues is kept. Packed prompts (micro_batch,
+fan_out) check their answers with `retry_flags` and send the failed ones
+through the gated chain instead.
+"""
+import re
+import threading
+import time
+from collections import Counter
+from typing import Any, AsyncIterator, Dict, Iterator, List, Mapping, NamedTuple, Optional, Sequence, Union
+
+from langchain_core.runnables import Runnable, RunnableConfig
+
+from instrumentation import METRICS
+from lang_detect import canonical_language, in_expected_script, script_known
+from protected_spans import SENTINEL_OPEN, placeholders
+
+_WORDS = re.compile(r"[^\W\d_]+")
+_COMMENTARY = re.compile(
+    r"\s*(?:sure|certainly|of course|here(?:'s| is| are)|below is|translation|translated text)\b[^\n]{0,80}:\s*\n?",
+    re.IGNORECASE,
+)
+_DENSE_SCRIPTS = {"Chinese", "Japanese", "Korean"}
+MIN_LENGTH_CHECK = 20  # letters; shorter sources vary too much in length
+
+
+class SourceFeatures(NamedTuple):
+    letters: int
+    words: frozenset
+    placeholders: Counter
+    fence: bool
+    commentary: bool
+    sentinels: bool
+    dense: bool
+
+
+def _prose(text: str, spans: Counter) -> str:
+    # Code, URLs and placeholders are kept as they are in any language.
+    for span in spans:
+        text = text.replace(span, " ")
+    return text
+
+
+def source_features(text: str) -> SourceFeatures:
+    spans = placeholders(text)
+    words = _WORDS.findall(_prose(text, spans).lower())
+    return SourceFeatures(
+        letters=sum(map(len, words)),
+        words=frozenset(word for word in words if len(word) > 1),
+        placeholders=spans,
+        fence="```" in text,
+        commentary=_COMMENTARY.match(text) is not None,
+        sentinels=SENTINEL_OPEN in text,
+        dense=any(in_expected_script(text, script) for script in _DENSE_SCRIPTS),
+    )
+
+
+def _check(source: SourceFeatures, output: str, target_lang: str) -> List[str]:
+    issues: List[str] = []
+    found = placeholders(output)
+    prose = _prose(output, found)
+    words = _WORDS.findall(prose.lower())
+    letters = sum(map(len, words))
+    if "```" in output and not source.fence:
+        issues.append("fence")
+    if source.letters and not letters:
+        return issues + ["empty"]
+    if _COMMENTARY.match(output) and not source.commentary:
+        issues.append("commentary")
+    if source.letters >= MIN_LENGTH_CHECK:
+        low, high = 0.3, 3.0
+        dense = canonical_language(target_lang) in _DENSE_SCRIPTS
+        if dense and not source.dense:
+            low, high = 0.1, 1.5
+        elif source.dense and not dense:
+            low, high = 0.6, 8.0
+        if not low <= letters / source.letters <= high:
+            issues.append("length")
+    if letters >= 4 and script_known(target_lang) and not in_expected_script(prose, target_lang):
+        issues.append("script")
+    if len(source.words) >= 4 and len(source.words.intersection(words)) >= 0.7 * len(source.words):
+        issues.append("untranslated")
+    if found != source.placeholders or (SENTINEL_OPEN in output and not source.sentinels):
+        issues.append("placeholders")
+    return issues
+
+
+def check_translation(source: str, output: str, target_lang: str) -> List[str]:
+    """Names of the checks `output` fails as a translation of `source`."""
+    return _check(source_features(source), output, target_lang)
+
+
+def check_batch(sources: Sequence[str], outputs: Sequence[str], target_langs: Sequence[str]) -> List[List[str]]:
+    """`check_translation` for many answers; each distinct source is analysed once."""
+    features: Dict[str, SourceFeatures] = {}
+    results = []
+    for source, output, target_lang in zip(sources, outputs, target_langs):
+        feature = features.get(source)
+        if feature is None:
+            feature = features[source] = source_features(source)
+        results.append(_check(feature, output, target_lang))
+    return results
+
+
+# -------------------- Budget --------------------
+class QualityBudget:
+    """Counts checked answers and caps retries at `budget` per answer.
+
+    `burst` retries are allowed on top, so the first answers can be
+    retried too.
+    """
+
+    def __init__(self, budget: float = 0.1, burst: int = 3):
+        self.budget = budget
+        self.burst = burst
+        self.checked = 0  # first answers
+        self.failed = 0  # of which failed a check
+        self.retries = 0
+        self.recovered = 0  # retries that fixed every issue
+        self.issues: Counter = Counter()  # check -> first answers failing it
+        self._lock = threading.Lock()
+
+    def record(self, issues: Sequence[List[str]]) -> None:
+        with self._lock:
+            self.checked += len(issues)
+            for found in issues:
+                if found:
+                    self.failed += 1
+                    self.issues.update(found)
+
+    def allow_retry(self) -> bool:
+        with self._lock:
+            if self.retries + 1 > self.budget * self.checked + self.burst:
+                return False
+            self.retries += 1
+            return True
+
+    def record_recovered(self) -> None:
+        with self._lock:
+            self.recovered += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "checked": self.checked,
+                "failed": self.failed,
+                "retries": self.retries,
+                "recovered": self.recovered,
+                "issues": dict(self.issues),
+            }
+
+
+def retry_flags(
+    budget: QualityBudget, sources: Sequence[str], outputs: Sequence[str], target_langs: Sequence[str]
+) -> List[bool]:
+    """For each answer: it failed a check and `budget` allows asking again."""
+    issues = check_batch(sources, outputs, target_langs)
+    budget.record(issues)
+    return [bool(found) and budget.allow_retry() for found in issues]
+
+
+# -------------------- Chain --------------------
+class QualityGate(Runnable):
+    """Checks `chain`'s answers against `input["text"]` and asks again
+    for the ones that fail, while `budget` (by default its own) allows it.
+
+    Each failed answer is retried up to `max_retries` times and the one
+    with the fewest issues is kept. Batches are checked together and
+    only their failed items are sent again, as one smaller batch.
+    Streams are only checked.
+    """
+
+    def __init__(self, chain: Runnable, budget: Optional[QualityBudget] = None, max_retries: int = 1):
+        self.chain = chain
+        self.budget = budget if budget is not None else QualityBudget()
+        self.max_retries = max_retries
+
+    def _check(self, inputs: Sequence[Mapping[str, Any]], outputs: Sequence[str]) -> List[List[str]]:
+        started = time.perf_counter()
+        issues = check_batch([i["text"] for i in inputs], outputs, [i["target_lang"] for i in inputs])
+        METRICS.observe("quality", time.perf_counter() - started, items=len(inputs))
+        return issues
+
+    def _first_check(self, inputs: Sequence[Mapping[str, Any]], outputs: Sequence[Any]) -> Dict[int, List[str]]:
+        """{index: issues} of the failed answers; errors are left to the caller."""
+        answered = [i for i, output in enumerate(outputs) if not isinstance(output, BaseException)]
+        issues = self._check([inputs[i] for i in answered], [outputs[i] for i in answered])
+        self.budget.record(issues)
+        return {i: found for i, found in zip(answered, issues) if found}
+
+    def _retryable(self, failing: Dict[int, List[str]]) -> List[int]:
+        return [i for i in failing if self.budget.allow_retry()]
+
+    def _keep_better(
+        self,
+        inputs: Sequence[Mapping[str, Any]],
+        outputs: List[Any],
+        failing: Dict[int, List[str]],
+        indexes: List[int],
+        retried: Sequence[Any],
+    ) -> None:
+        answered = [(i, output) for i, output in zip(indexes, retried) if not isinstance(output, BaseException)]
+        issues = self._check([inputs[i] for i, _ in answered], [output for _, output in answered])
+        for (i, output), found in zip(answered, issues):
+            if len(found) < len(failing[i]):
+                outputs[i] = output
+                failing[i] = found
+                if not found:
+                    self.budget.record_recovered()
+                    del failing[i]
+
+    def invoke(self, input: Mapping[str, Any], config: Optional[RunnableConfig] = None, **kwargs: Any) -> str:
+        outputs = [self.chain.invoke(input, config, **kwargs)]
+        failing = self._first_check([input], outputs)
+        for _ in range(self.max_retries):
+            if not self._retryable(failing):
+                break
+            self._keep_better([input], outputs, failing, [0], [self.chain.invoke(input, config, **kwargs)])
+        return outputs[0]
+
+    async def ainvoke(
+        self, input: Mapping[str, Any], config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> str:
+        outputs = [await self.chain.ainvoke(input, config, **kwargs)]
+        failing = self._first_check([input], outputs)
+        for _ in range(self.max_retries):
+            if not self._retryable(failing):
+                break
+            self._keep_better([input], outputs, failing, [0], [await self.chain.ainvoke(input, config, **kwargs)])
+        return outputs[0]
+
+    def batch(
+        self,
+        inputs: List[Mapping[str, Any]],
+        config: Optional[Union[RunnableConfig, List[RunnableConfig]]] = None,
+        *,
+        return_exceptions: bool = False,
+        **kwargs: Any,
+    ) -> List[Any]:
+        if not inputs:
+            return []
+        outputs = self.chain.batch(inputs, config, return_exceptions=return_exceptions, **kwargs)
+        failing = self._first_check(inputs, outputs)
+        configs = config if isinstance(config, list) else [config] * len(inputs)
+        for _ in range(self.max_retries):
+            indexes = self._retryable(failing)
+            if not indexes:
+                break
+            retried = self.chain.batch(
+                [inputs[i] for i in indexes], [configs[i] for i in indexes], return_exceptions=True, **kwargs
+            )
+            self._keep_better(inputs, outputs, failing, indexes, retried)
+        return outputs
+
+    async def abatch(
+        self,
+        inputs: List[Mapping[str, Any]],
+        config: Optional[Union[RunnableConfig, List[RunnableConfig]]] = None,
+        *,
+        return_exceptions: bool = False,
+        **kwargs: Any,
+    ) -> List[Any]:
+        if not inputs:
+            return []
+        outputs = await self.chain.abatch(inputs, config, return_exceptions=return_exceptions, **kwargs)
+        failing = self._first_check(inputs, outputs)
+        configs = config if isinstance(config, list) else [config] * len(inputs)
+        for _ in range(self.max_retries):
+            indexes = self._retryable(failing)
+            if not indexes:
+                break
+            retried = await self.chain.abatch(
+                [inputs[i] for i in indexes], [configs[i] for i in indexes], return_exceptions=True, **kwargs
+            )
+            self._keep_better(inputs, outputs, failing, indexes, retried)
+        return outputs
+
+    def stream(
+        self, input: Mapping[str, Any], config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> Iterator[str]:
+        parts = []
+        for part in self.chain.stream(input, config, **kwargs):
+            parts.append(part)
+            yield part
+        self._first_check([input], ["".join(parts)])
+
+    async def astream(
+        self, input: Mapping[str, Any], config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> AsyncIterator[str]:
+        parts = []
+        async for part in self.chain.astream(input, config, **kwargs):
+            parts.append(part)
+            yield part
+        self._first_check([input], ["".join(parts)])
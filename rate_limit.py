@@ -0,0 +1,394 @@
+# rate_limit.py
+"""Shared pacing, retry and adaptive concurrency for provider calls.
+
+Each (provider, model) gets one `ProviderLimiter` holding:
+
+- request and token buckets (requests/min, tokens/min) that pace calls
+  before they are sent,
+- an AIMD concurrency limit that halves when the provider throttles us
+  and grows by ~1 per round of successful calls,
+- retries with full-jitter exponential backoff on 429 / 5xx / timeouts,
+  honouring Retry-After when the provider sends one.
+
+`RateLimitedModel` wraps a chat model with its limiter; translator_agent
+puts it inside every chain it builds, so sync, async, batch and
+streaming calls are all covered. Time spent waiting on the limiter is
+recorded as the "queue" stage (see instrumentation).
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, Optional, Tuple
+
+from langchain_core.runnables import Runnable, RunnableConfig
+
+from instrumentation import METRICS, route_labels
+from segmentation import estimate_tokens
+
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504, 529}
+
+
+# -------------------- Errors --------------------
+def error_status(exc: BaseException) -> Optional[int]:
+    """HTTP-ish status of a provider error (also looks at wrapped causes)."""
+    seen = 0
+    while exc is not None and seen < 5:
+        for attr in ("status_code", "code", "status"):
+            value = getattr(exc, attr, None)
+            if isinstance(value, int) and 100 <= value < 600:
+                return value
+        response = getattr(exc, "response", None)
+        status = getattr(response, "status_code", None)
+        if isinstance(status, int):
+            return status
+        exc = exc.__cause__ or exc.__context__
+        seen += 1
+    return None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    status = error_status(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    name = type(exc).__name__
+    return any(key in name for key in ("Timeout", "RateLimit", "Connection", "Unavailable"))
+
+
+def is_throttle(exc: BaseException) -> bool:
+    return error_status(exc) == 429 or "RateLimit" in type(exc).__name__
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    """Seconds from a Retry-After header or attribute, if the error has one."""
+    value = getattr(exc, "retry_after", None)
+    if value is None:
+        headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+        value = headers.get("retry-after")
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+# -------------------- Token bucket --------------------
+class TokenBucket:
+    """Thread-safe token bucket refilled at `rate` units per second.
+
+    `reserve()` takes the units immediately (the balance may go negative)
+    and returns how long the caller must wait before using them, so sync
+    and async callers can share one bucket.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate * 60
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float = 1.0) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= min(amount, self.capacity)
+            return max(0.0, -self._tokens / self.rate)
+
+
+# -------------------- AIMD concurrency --------------------
+class AdaptiveConcurrency:
+    """Concurrency limit with additive increase / multiplicative decrease.
+
+    Usable from threads (`acquire`) and coroutines (`aacquire`) at once.
+    """
+
+    def __init__(
+        self,
+        initial: int = 8,
+        minimum: int = 1,
+        maximum: int = 64,
+        decrease: float = 0.5,
+    ):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease = decrease
+        self.in_flight = 0
+        self.throttles = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+        self._async_waiters: Deque[Tuple[asyncio.AbstractEventLoop, "asyncio.Future[None]"]] = deque()
+
+    def _has_room(self) -> bool:
+        return self.in_flight < max(self.minimum, int(self.limit))
+
+    def acquire(self) -> None:
+        with self._cond:
+            while not self._has_room():
+                self._cond.wait()
+            self.in_flight += 1
+
+    async def aacquire(self) -> None:
+        loop = asyncio.get_running_loop()
+        with self._cond:
+            if self._has_room() and not self._async_waiters:
+                self.in_flight += 1
+                return
+            future = loop.create_future()
+            self._async_waiters.append((loop, future))
+        # The releasing side counts the slot as ours before waking us up.
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._cond:
+                try:
+                    # Still waiting: just leave the queue.
+                    self._async_waiters.remove((loop, future))
+                    raise
+                except ValueError:
+                    pass
+            # Cancelled after the slot was handed over: give it back. (If
+            # the hand-over is still scheduled, `_hand_over` does that.)
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            self._wake()
+
+    def on_success(self) -> None:
+        with self._cond:
+            self.limit = min(self.maximum, self.limit + 1.0 / max(self.limit, 1.0))
+            self._wake()
+
+    def on_throttle(self, started: float) -> None:
+        """Shrink after a throttled call that was sent at `started`."""
+        with self._cond:
+            self.throttles += 1
+            # Calls sent before the last decrease saw the old limit; one
+            # overload should shrink the limit once, not once per call.
+            if started >= self._last_decrease:
+                self.limit = max(self.minimum, self.limit * self.decrease)
+                self._last_decrease = time.monotonic()
+
+    def _wake(self) -> None:
+        while self._async_waiters and self._has_room():
+            loop, future = self._async_waiters.popleft()
+            if future.done() or loop.is_closed():
+                continue
+            self.in_flight += 1
+            try:
+                loop.call_soon_threadsafe(self._hand_over, future)
+            except RuntimeError:  # the loop closed meanwhile; nobody takes the slot
+                self.in_flight -= 1
+        self._cond.notify_all()
+
+    def _hand_over(self, future: "asyncio.Future[None]") -> None:
+        if future.done():  # cancelled meanwhile; give the slot back
+            self.release()
+        else:
+            future.set_result(None)
+
+
+# -------------------- Per-provider limiter --------------------
+class ProviderLimiter:
+    """Pacing + retry policy for one (provider, model)."""
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        max_retries: int = 4,
+        base_delay: float = 0.5,
+        max_delay: float = 20.0,
+        initial_concurrency: int = 8,
+        max_concurrency: int = 64,
+    ):
+        self.requests = TokenBucket(requests_per_minute / 60.0) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute / 60.0) if tokens_per_minute else None
+        self.concurrency = AdaptiveConcurrency(initial_concurrency, maximum=max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retries = 0
+
+    def pacing_delay(self, tokens: int) -> float:
+        delay = self.requests.reserve() if self.requests else 0.0
+        if self.tokens:
+            delay = max(delay, self.tokens.reserve(tokens))
+        return delay
+
+    def backoff(self, attempt: int, exc: BaseException) -> float:
+        """Full-jitter exponential backoff, never shorter than Retry-After."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        hinted = retry_after(exc)
+        return max(delay, hinted) if hinted is not None else delay
+
+    def should_retry(self, attempt: int, exc: BaseException, started: float) -> bool:
+        if is_throttle(exc):
+            self.concurrency.on_throttle(started)
+        return attempt < self.max_retries and is_retryable(exc)
+
+
+_limiters: Dict[Tuple[str, str], ProviderLimiter] = {}
+_limits_config: Dict[Tuple[str, str], Dict[str, Any]] = {}
+_limiters_lock = threading.Lock()
+
+
+def configure_limits(provider: str, model: str = "*", **settings: Any) -> None:
+    """Set `ProviderLimiter` arguments for a provider (model "*" = all models).
+
+    Takes effect for limiters created afterwards.
+    """
+    with _limiters_lock:
+        _limits_config[(provider, model)] = settings
+        for key in [k for k in _limiters if k[0] == provider and model in ("*", k[1])]:
+            del _limiters[key]
+
+
+def get_limiter(provider: str, model: str) -> ProviderLimiter:
+    """The shared limiter for (provider, model), created on first use.
+
+    Defaults come from TRANSLATOR_RPM / TRANSLATOR_TPM when set.
+    """
+    key = (provider, model)
+    limiter = _limiters.get(key)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.get(key)
+            if limiter is None:
+                settings: Dict[str, Any] = {}
+                if os.getenv("TRANSLATOR_RPM"):
+                    settings["requests_per_minute"] = float(os.environ["TRANSLATOR_RPM"])
+                if os.getenv("TRANSLATOR_TPM"):
+                    settings["tokens_per_minute"] = float(os.environ["TRANSLATOR_TPM"])
+                settings.update(_limits_config.get((provider, "*"), {}))
+                settings.update(_limits_config.get(key, {}))
+                limiter = ProviderLimiter(**settings)
+                _limiters[key] = limiter
+    return limiter
+
+
+# -------------------- Runnable wrapper --------------------
+def _estimate_call_tokens(value: Any) -> int:
+    text = value.to_string() if hasattr(value, "to_string") else str(value)
+    # Reserve the prompt plus a completion of similar size.
+    return 2 * estimate_tokens(text)
+
+
+class RateLimitedModel(Runnable):
+    """Runs a chat model under its provider's `ProviderLimiter`."""
+
+    def __init__(self, llm: Runnable, limiter: ProviderLimiter):
+        self.llm = llm
+        self.limiter = limiter
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        limiter = self.limiter
+        attempt = 0
+        while True:
+            entered = time.monotonic()
+            time.sleep(limiter.pacing_delay(_estimate_call_tokens(input)))
+            limiter.concurrency.acquire()
+            started = time.monotonic()
+            try:
+                METRICS.observe("queue", started - entered, *route_labels(config), attempt=attempt)
+                result = self.llm.invoke(input, config, **kwargs)
+            except Exception as e:
+                if not limiter.should_retry(attempt, e, started):
+                    raise
+                wait = limiter.backoff(attempt, e)
+            else:
+                limiter.concurrency.on_success()
+                return result
+            finally:
+                limiter.concurrency.release()
+            limiter.retries += 1
+            attempt += 1
+            time.sleep(wait)
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        limiter = self.limiter
+        attempt = 0
+        while True:
+            entered = time.monotonic()
+            await asyncio.sleep(limiter.pacing_delay(_estimate_call_tokens(input)))
+            await limiter.concurrency.aacquire()
+            started = time.monotonic()
+            try:
+                METRICS.observe("queue", started - entered, *route_labels(config), attempt=attempt)
+                result = await self.llm.ainvoke(input, config, **kwargs)
+            except Exception as e:
+                if not limiter.should_retry(attempt, e, started):
+                    raise
+                wait = limiter.backoff(attempt, e)
+            else:
+                limiter.concurrency.on_success()
+                return result
+            finally:
+                limiter.concurrency.release()
+            limiter.retries += 1
+            attempt += 1
+            await asyncio.sleep(wait)
+
+    def stream(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Iterator[Any]:
+        limiter = self.limiter
+        attempt = 0
+        while True:
+            entered = time.monotonic()
+            time.sleep(limiter.pacing_delay(_estimate_call_tokens(input)))
+            limiter.concurrency.acquire()
+            started = time.monotonic()
+            streaming = False
+            try:
+                METRICS.observe("queue", started - entered, *route_labels(config), attempt=attempt)
+                for chunk in self.llm.stream(input, config, **kwargs):
+                    streaming = True
+                    yield chunk
+            except Exception as e:
+                # Once output has reached the caller a retry would duplicate it.
+                if streaming or not limiter.should_retry(attempt, e, started):
+                    raise
+                wait = limiter.backoff(attempt, e)
+            else:
+                limiter.concurrency.on_success()
+                return
+            finally:
+                limiter.concurrency.release()
+            limiter.retries += 1
+            attempt += 1
+            time.sleep(wait)
+
+    async def astream(
+        self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> AsyncIterator[Any]:
+        limiter = self.limiter
+        attempt = 0
+        while True:
+            entered = time.monotonic()
+            await asyncio.sleep(limiter.pacing_delay(_estimate_call_tokens(input)))
+            await limiter.concurrency.aacquire()
+            started = time.monotonic()
+            streaming = False
+            try:
+                METRICS.observe("queue", started - entered, *route_labels(config), attempt=attempt)
+                async for chunk in self.llm.astream(input, config, **kwargs):
+                    streaming = True
+                    yield chunk
+            except Exception as e:
+                if streaming or not limiter.should_retry(attempt, e, started):
+                    raise
+                wait = limiter.backoff(attempt, e)
+            else:
+                limiter.concurrency.on_success()
+                return
+            finally:
+                limiter.concurrency.release()
+            limiter.retries += 1
+            attempt += 1
+            await asyncio.sleep(wait)
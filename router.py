@@ -0,0 +1,319 @@
+# router.py
+"""Pick a provider and model per request, with latency-aware failover.
+
+Use it through translator_agent with `provider="auto"` (or set
+TRANSLATOR_PROVIDER=auto); the `model` argument is then ignored.
+
+Requests are sorted into tiers: short everyday text goes to small fast
+models, while long text and sensitive domains (legal, medical, ...) go
+to the 70B-class models. Within a tier the routes are ordered by live
+statistics (EWMA latency and error rate). A route that keeps failing is
+skipped for a cool-down period, and a failed or timed-out call falls
+through to the next route, then to the other tier.
+"""
+import asyncio
+import concurrent.futures
+import contextvars
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Mapping, NamedTuple, Optional, Sequence
+
+from langchain_core.runnables import Runnable, RunnableConfig
+
+from segmentation import estimate_tokens
+from translator_agent import DEFAULT_TEMPERATURE, get_translation_chain
+
+QUALITY_DOMAINS = (
+    "legal", "law", "contract", "medical", "clinical", "pharma", "patient", "health",
+    "finance", "financial", "regulatory", "compliance", "insurance",
+)
+
+
+class Route(NamedTuple):
+    provider: str
+    model: str
+
+
+DEFAULT_TIERS: Dict[str, List[Route]] = {
+    "fast": [Route("groq", "llama-3.1-8b-instant"), Route("google", "gemini-1.5-flash")],
+    "quality": [Route("groq", "llama-3.3-70b-versatile"), Route("google", "gemini-1.5-pro")],
+}
+
+
+class RouteStats:
+    """Live latency / error statistics and circuit state for one route."""
+
+    def __init__(self, alpha: float = 0.2):
+        self.alpha = alpha
+        self.latency: Optional[float] = None  # EWMA seconds per successful call
+        self.error_rate = 0.0  # EWMA of failures (0..1)
+        self.calls = 0
+        self.in_flight = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+
+    def record(self, seconds: float, ok: bool) -> None:
+        self.calls += 1
+        self.in_flight -= 1
+        self.error_rate += self.alpha * ((0.0 if ok else 1.0) - self.error_rate)
+        if ok:
+            self.consecutive_failures = 0
+            self.latency = seconds if self.latency is None else self.latency + self.alpha * (seconds - self.latency)
+        else:
+            self.failures += 1
+            self.consecutive_failures += 1
+
+    def score(self) -> float:
+        """Expected cost of a call.
+
+        An untried route scores 0 so one request probes it; the others
+        rank it last until that probe has reported back.
+        """
+        if self.latency is None:
+            return 0.0 if self.in_flight == 0 else float("inf")
+        return self.latency * (1.0 + 4.0 * self.error_rate)
+
+
+class Router:
+    """Routing policy plus the statistics it learns from.
+
+    `tiers` maps tier names ("fast", "quality") to routes in order of
+    preference. `fast_max_tokens` is the largest input the fast tier
+    takes. After `failure_threshold` consecutive failures a route is
+    skipped for `cooldown` seconds. `attempt_timeout` bounds each
+    attempt, sync or async, so a hanging provider fails over instead of
+    stalling.
+    """
+
+    def __init__(
+        self,
+        tiers: Optional[Mapping[str, Sequence[Route]]] = None,
+        fast_max_tokens: int = 120,
+        quality_domains: Sequence[str] = QUALITY_DOMAINS,
+        failure_threshold: int = 3,
+        cooldown: float = 30.0,
+        attempt_timeout: Optional[float] = 60.0,
+    ):
+        self.tiers = {name: [Route(*r) for r in routes] for name, routes in (tiers or DEFAULT_TIERS).items()}
+        self.fast_max_tokens = fast_max_tokens
+        self.quality_domains = tuple(d.lower() for d in quality_domains)
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.attempt_timeout = attempt_timeout
+        self._stats: Dict[Route, RouteStats] = {}
+        self._lock = threading.Lock()
+
+    # ---- policy ----
+    def tier_for(self, text: str, domain: Optional[str]) -> str:
+        # Only the first line: the rest may be context added by chunking.
+        head = (domain or "").split("\n", 1)[0].lower()
+        if any(word in head for word in self.quality_domains):
+            return "quality"
+        if estimate_tokens(text) > self.fast_max_tokens or "fast" not in self.tiers:
+            return "quality"
+        return "fast"
+
+    def candidates(self, text: str, domain: Optional[str]) -> List[Route]:
+        """Routes to try in order: the request's tier first, then the rest."""
+        tier = self.tier_for(text, domain)
+        ordered = self._rank(self.tiers[tier])
+        for name, routes in self.tiers.items():
+            if name != tier:
+                ordered += [r for r in self._rank(routes) if r not in ordered]
+        return ordered
+
+    def _rank(self, routes: Sequence[Route]) -> List[Route]:
+        now = time.monotonic()
+        with self._lock:
+            keyed = [
+                (self.stats(route).open_until > now, self.stats(route).score(), i, route)
+                for i, route in enumerate(routes)
+            ]
+        return [route for *_key, route in sorted(keyed)]
+
+    # ---- statistics ----
+    def stats(self, route: Route) -> RouteStats:
+        stats = self._stats.get(route)
+        if stats is None:
+            stats = self._stats.setdefault(route, RouteStats())
+        return stats
+
+    def start(self, route: Route) -> None:
+        with self._lock:
+            self.stats(route).in_flight += 1
+
+    def abandon(self, route: Route) -> None:
+        """The caller gave up (cancelled / closed the stream); no verdict."""
+        with self._lock:
+            self.stats(route).in_flight -= 1
+
+    def record(self, route: Route, seconds: float, ok: bool) -> None:
+        with self._lock:
+            stats = self.stats(route)
+            stats.record(seconds, ok)
+            if not ok and stats.consecutive_failures >= self.failure_threshold:
+                stats.open_until = time.monotonic() + self.cooldown
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Per-route statistics, e.g. for a health endpoint."""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                f"{route.provider}/{route.model}": {
+                    "calls": s.calls,
+                    "failures": s.failures,
+                    "latency_ms": round(s.latency * 1000, 1) if s.latency is not None else None,
+                    "error_rate": round(s.error_rate, 3),
+                    "open": s.open_until > now,
+                }
+                for route, s in self._stats.items()
+            }
+
+    def chain(self, temperature: float = DEFAULT_TEMPERATURE, prompt_name: str = "translate") -> "RoutedChain":
+        return RoutedChain(self, temperature, prompt_name)
+
+
+_executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> concurrent.futures.ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = concurrent.futures.ThreadPoolExecutor(max_workers=32, thread_name_prefix="route")
+    return _executor
+
+
+class RoutedChain(Runnable):
+    """Translation chain that routes each payload through a `Router`."""
+
+    def __init__(self, router: Router, temperature: float, prompt_name: str):
+        self.router = router
+        self.temperature = temperature
+        self.prompt_name = prompt_name
+
+    def _chain(self, route: Route) -> Runnable:
+        return get_translation_chain(route.model, self.temperature, route.provider, self.prompt_name)
+
+    def _candidates(self, input: Mapping[str, Any]) -> List[Route]:
+        return self.router.candidates(input.get("text", ""), input.get("domain"))
+
+    def invoke(self, input: Mapping[str, Any], config: Optional[RunnableConfig] = None, **kwargs: Any) -> str:
+        error: Optional[BaseException] = None
+        for route in self._candidates(input):
+            self.router.start(route)
+            start = time.monotonic()
+            try:
+                if self.router.attempt_timeout is None:
+                    output = self._chain(route).invoke(input, config, **kwargs)
+                else:
+                    # Threads can't be interrupted: a timed-out attempt runs
+                    # to completion in the pool and its answer is dropped.
+                    # Run in a copy of this context, so usage callbacks and traces see the call.
+                    future = _get_executor().submit(
+                        contextvars.copy_context().run, self._chain(route).invoke, input, config, **kwargs
+                    )
+                    output = future.result(timeout=self.router.attempt_timeout)
+            except Exception as e:
+                self.router.record(route, time.monotonic() - start, ok=False)
+                error = e
+                continue
+            except BaseException:
+                self.router.abandon(route)
+                raise
+            self.router.record(route, time.monotonic() - start, ok=True)
+            return output
+        raise RuntimeError("every translation route failed") from error
+
+    async def ainvoke(
+        self, input: Mapping[str, Any], config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> str:
+        error: Optional[BaseException] = None
+        for route in self._candidates(input):
+            self.router.start(route)
+            start = time.monotonic()
+            try:
+                output = await asyncio.wait_for(
+                    self._chain(route).ainvoke(input, config, **kwargs), self.router.attempt_timeout
+                )
+            except Exception as e:
+                self.router.record(route, time.monotonic() - start, ok=False)
+                error = e
+                continue
+            except BaseException:
+                self.router.abandon(route)
+                raise
+            self.router.record(route, time.monotonic() - start, ok=True)
+            return output
+        raise RuntimeError("every translation route failed") from error
+
+    def stream(
+        self, input: Mapping[str, Any], config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> Iterator[str]:
+        error: Optional[BaseException] = None
+        for route in self._candidates(input):
+            self.router.start(route)
+            start = time.monotonic()
+            streaming = False
+            try:
+                for part in self._chain(route).stream(input, config, **kwargs):
+                    streaming = True
+                    yield part
+            except Exception as e:
+                self.router.record(route, time.monotonic() - start, ok=False)
+                # Text already shown can't be taken back; only fail over before it.
+                if streaming:
+                    raise
+                error = e
+                continue
+            except BaseException:
+                self.router.abandon(route)
+                raise
+            self.router.record(route, time.monotonic() - start, ok=True)
+            return
+        raise RuntimeError("every translation route failed") from error
+
+    async def astream(
+        self, input: Mapping[str, Any], config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> AsyncIterator[str]:
+        error: Optional[BaseException] = None
+        for route in self._candidates(input):
+            self.router.start(route)
+            start = time.monotonic()
+            streaming = False
+            try:
+                async for part in self._chain(route).astream(input, config, **kwargs):
+                    streaming = True
+                    yield part
+            except Exception as e:
+                self.router.record(route, time.monotonic() - start, ok=False)
+                if streaming:
+                    raise
+                error = e
+                continue
+            except BaseException:
+                self.router.abandon(route)
+                raise
+            self.router.record(route, time.monotonic() - start, ok=True)
+            return
+        raise RuntimeError("every translation route failed") from error
+
+
+_router: Optional[Router] = None
+
+
+def get_router() -> Router:
+    """The process-wide router used by `provider="auto"`."""
+    global _router
+    if _router is None:
+        _router = Router()
+    return _router
+
+
+def set_router(router: Router) -> None:
+    """Replace the process-wide router (e.g. custom tiers or fake providers)."""
+    global _router
+    _router = router
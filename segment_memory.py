@@ -0,0 +1,174 @@
+# segment_memory.py
+"""Sentence-level translation memory with fuzzy lookup.
+
+Only exact matches are reused. A near match ("are not eligible" for "are
+now eligible") may mean something else entirely, so it is only handed to
+the model as a reference translation (see `similar()`).
+
+Near matches are found with MinHash signatures over character 3-grams,
+bucketed with LSH, so a lookup only compares against a handful of
+candidates instead of scanning the whole memory. Candidates are then
+scored with an edit-distance ratio (difflib).
+"""
+from collections import Counter, OrderedDict
+from difflib import SequenceMatcher
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+import random
+import threading
+import zlib
+
+from translation_cache import normalize_text
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+Context = Tuple[str, str, str]  # (source_lang, target_lang, domain)
+Bands = List[Tuple[int, Tuple[int, ...]]]
+
+
+class Reference(NamedTuple):
+    source: str
+    translation: str
+    similarity: float
+
+
+def _shingles(text: str, size: int = 3) -> Set[int]:
+    text = f" {text} "
+    if len(text) <= size:
+        return {zlib.crc32(text.encode("utf-8"))}
+    return {zlib.crc32(text[i:i + size].encode("utf-8")) for i in range(len(text) - size + 1)}
+
+
+class SegmentMemory:
+    """In-process translation memory. Thread-safe.
+
+    `lookup()` returns the stored translation of the identical sentence
+    (whitespace aside). `similar()` returns the closest stored sentence
+    scoring at least `reference_threshold`, as a reference for the model.
+    The least recently used sentences are dropped beyond `max_segments`.
+    """
+
+    def __init__(
+        self,
+        reference_threshold: float = 0.8,
+        max_segments: int = 100_000,
+        num_perm: int = 32,
+        bands: int = 8,
+        max_candidates: int = 8,
+        seed: int = 1,
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.reference_threshold = reference_threshold
+        self.max_segments = max_segments
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.max_candidates = max_candidates
+
+        rng = random.Random(seed)
+        self._perms = [
+            (rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+            for _ in range(num_perm)
+        ]
+        # (context, key) -> (translation, LSH bands), least recently used first
+        self._entries: "OrderedDict[Tuple[Context, str], Tuple[str, Bands]]" = OrderedDict()
+        # Keys per bucket; dicts as insertion-ordered sets, for O(1) eviction.
+        self._buckets: Dict[Tuple[Context, int, Tuple[int, ...]], Dict[str, None]] = {}
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.references = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _bands(self, key: str) -> Bands:
+        shingles = _shingles(key)
+        signature = [
+            min(((a * s + b) % _MERSENNE_PRIME) & _MAX_HASH for s in shingles)
+            for a, b in self._perms
+        ]
+        return [
+            (band, tuple(signature[band * self.rows:(band + 1) * self.rows]))
+            for band in range(self.bands)
+        ]
+
+    @staticmethod
+    def _key(segment: str) -> str:
+        # Case matters: "Apple" and "apple" may translate differently.
+        return normalize_text(segment)
+
+    def add(self, segment: str, translation: str, context: Context) -> None:
+        key = self._key(segment)
+        with self._lock:
+            entry = self._entries.get((context, key))
+            bands = entry[1] if entry is not None else self._bands(key)
+            if entry is None:
+                for band, values in bands:
+                    self._buckets.setdefault((context, band, values), {})[key] = None
+            self._entries[(context, key)] = (translation, bands)
+            self._entries.move_to_end((context, key))
+            while len(self._entries) > self.max_segments:
+                (old_context, old_key), (_translation, old_bands) = self._entries.popitem(last=False)
+                for band, values in old_bands:
+                    bucket = self._buckets[(old_context, band, values)]
+                    del bucket[old_key]
+                    if not bucket:
+                        del self._buckets[(old_context, band, values)]
+
+    def lookup(self, segment: str, context: Context) -> Optional[str]:
+        """The stored translation of `segment`, else None."""
+        key = self._key(segment)
+        with self._lock:
+            entry = self._entries.get((context, key))
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((context, key))
+            self.exact_hits += 1
+            return entry[0]
+
+    def similar(self, segment: str, context: Context) -> Optional[Reference]:
+        """The closest other stored sentence, if it scores `reference_threshold`."""
+        key = self._key(segment)
+        bands = self._bands(key)
+        with self._lock:
+            # Segments sharing more LSH bands are more similar; only the
+            # strongest few get the (comparatively slow) edit-distance check.
+            collisions: Counter = Counter()
+            for band, values in bands:
+                collisions.update(self._buckets.get((context, band, values), {}).keys())
+            collisions.pop(key, None)
+
+            best_key, best_score = None, 0.0
+            for candidate, _count in collisions.most_common(self.max_candidates):
+                matcher = SequenceMatcher(None, key, candidate, autojunk=False)
+                if matcher.real_quick_ratio() < self.reference_threshold:
+                    continue
+                if matcher.quick_ratio() < self.reference_threshold:
+                    continue
+                score = matcher.ratio()
+                if score > best_score:
+                    best_key, best_score = candidate, score
+
+            if best_key is None or best_score < self.reference_threshold:
+                return None
+            self.references += 1
+            return Reference(best_key, self._entries[(context, best_key)][0], best_score)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "segments": len(self._entries),
+            "exact_hits": self.exact_hits,
+            "references": self.references,
+            "misses": self.misses,
+        }
+
+
+def render_reference(reference: Optional[Reference]) -> str:
+    """The prompt line for `reference` ("" for none)."""
+    if reference is None:
+        return ""
+    return (
+        f"\nSimilar sentence, for reference only: {reference.source} => {reference.translation}"
+    )
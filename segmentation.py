@@ -0,0 +1,136 @@
+# segmentation.py
+"""Split text into sentence segments that can be translated independently."""
+import re
+from typing import List, Tuple
+
+# Break after sentence punctuation + whitespace, after CJK full stops,
+# and on line breaks. The separator is kept so the text can be rebuilt.
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?…])[ \t]+|(?<=[。！？])[ \t]*|[ \t]*\n\s*")
+_HAS_LETTERS = re.compile(r"[^\W\d_]")
+
+Segment = Tuple[str, str]  # (sentence, separator that followed it)
+
+
+def split_segments(text: str) -> List[Segment]:
+    """Split `text` into (sentence, separator) pairs.
+
+    `join_segments(split_segments(text)) == text` always holds; leading
+    whitespace is returned as a segment with an empty sentence.
+    """
+    segments: List[Segment] = []
+    stripped = text.lstrip()
+    if len(stripped) != len(text):
+        segments.append(("", text[: len(text) - len(stripped)]))
+
+    pos = 0
+    for match in _SENTENCE_BREAK.finditer(stripped):
+        if match.start() == pos and match.end() == pos:
+            continue
+        if match.start() == pos and segments:
+            # Separator directly after another separator: merge them.
+            sentence, sep = segments[-1]
+            segments[-1] = (sentence, sep + match.group(0))
+        else:
+            segments.append((stripped[pos:match.start()], match.group(0)))
+        pos = match.end()
+    if pos < len(stripped):
+        segments.append((stripped[pos:], ""))
+    return segments
+
+
+def join_segments(segments: List[Segment]) -> str:
+    return "".join(sentence + sep for sentence, sep in segments)
+
+
+_PARAGRAPH_SPLIT = re.compile(r"[ \t]*\n[ \t]*\n\s*")
+
+
+def split_paragraphs(text: str) -> List[Segment]:
+    """Split `text` into (paragraph, separator) pairs on blank lines.
+
+    Like `split_segments`, `join_segments(split_paragraphs(text)) == text`.
+    """
+    segments: List[Segment] = []
+    stripped = text.lstrip()
+    if len(stripped) != len(text):
+        segments.append(("", text[: len(text) - len(stripped)]))
+    pos = 0
+    for match in _PARAGRAPH_SPLIT.finditer(stripped):
+        segments.append((stripped[pos:match.start()], match.group(0)))
+        pos = match.end()
+    if pos < len(stripped):
+        segments.append((stripped[pos:], ""))
+    return segments
+
+
+def needs_translation(sentence: str) -> bool:
+    """Segments without any letters (numbers, bullets, blanks) pass through."""
+    return bool(_HAS_LETTERS.search(sentence))
+
+
+# -------------------- Token-budgeted chunks --------------------
+_PARAGRAPH_BREAK = re.compile(r"\n[ \t]*\n")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate: ~4 ASCII chars per token, 1 per other char."""
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars)
+
+
+class Chunk:
+    """A slice of the document plus the separator that followed it."""
+
+    __slots__ = ("text", "separator", "context")
+
+    def __init__(self, text: str, separator: str, context: str = ""):
+        self.text = text
+        self.separator = separator
+        self.context = context  # preceding source sentences, not to be translated
+
+    def __repr__(self) -> str:
+        return f"Chunk({self.text!r}, {self.separator!r}, context={self.context!r})"
+
+
+def chunk_text(text: str, max_tokens: int = 800, overlap_sentences: int = 0) -> List[Chunk]:
+    """Pack sentences into chunks of at most ~`max_tokens` tokens.
+
+    Chunks prefer to end on a paragraph break. A single sentence longer
+    than the budget becomes a chunk on its own. With `overlap_sentences`,
+    each chunk carries the last sentences of the previous chunk as
+    context.
+    """
+    segments = split_segments(text)
+    groups: List[List[Segment]] = []
+    current: List[Segment] = []
+    current_tokens = 0
+
+    for segment in segments:
+        tokens = estimate_tokens(segment[0])
+        if current and current_tokens + tokens > max_tokens:
+            # Back up to the last paragraph break if it keeps the chunk at
+            # least half full; the tail starts the next chunk.
+            cut = len(current)
+            for i in range(len(current) - 1, 0, -1):
+                if _PARAGRAPH_BREAK.search(current[i - 1][1]):
+                    if sum(estimate_tokens(s) for s, _ in current[:i]) * 2 >= max_tokens:
+                        cut = i
+                    break
+            groups.append(current[:cut])
+            current = current[cut:]
+            current_tokens = sum(estimate_tokens(s) for s, _ in current)
+        current.append(segment)
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+
+    chunks: List[Chunk] = []
+    previous: List[Segment] = []
+    for group in groups:
+        body = join_segments(group[:-1]) + group[-1][0]
+        context = ""
+        if overlap_sentences and previous:
+            context = " ".join(s for s, _ in previous[-overlap_sentences:] if s)
+        chunks.append(Chunk(body, group[-1][1], context))
+        previous = group
+    return chunks
@@ -0,0 +1,354 @@
+# service.py
+"""Headless HTTP API around translator_agent (plain ASGI, no web framework).
+
+Run with any ASGI server, e.g.:
+    uvicorn service:app --port 8000
+
+Endpoints:
+    POST /translate         {"text", "source_lang", "target_lang", "domain"?, "glossary"?}
+    POST /translate/batch   {"items": [<translate body>, ...], "max_concurrency"?}
+    POST /translate/stream  same body as /translate; answers NDJSON {"delta": ...} lines
+    GET  /health            queue and coalescing counters (+ per-route stats with provider "auto")
+    GET  /metrics           Prometheus text: per-stage latency, tokens, service counters
+
+A request's "glossary" ({"term": "translation", ...}) applies to that
+request only (see glossary).
+Identical requests that arrive while one is already in flight share its
+model call. At most `max_in_flight` model calls run at once and at most
+`max_queue` more may wait; beyond that the service answers 429 with
+Retry-After instead of queueing without bound. Batch items run at most
+`max_in_flight` at a time, so a batch of any size (up to MAX_BATCH_ITEMS)
+is admitted in parts.
+"""
+import asyncio
+import json
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Mapping, Optional, Tuple
+
+from glossary import Glossary
+from instrumentation import METRICS
+from router import get_router
+from translation_cache import make_key
+from translator_agent import (
+    AUTO_PROVIDER,
+    DEFAULT_MODEL,
+    DEFAULT_PROVIDER,
+    DEFAULT_TEMPERATURE,
+    atranslate,
+    atranslate_stream,
+    warm_up,
+)
+
+MAX_BODY_BYTES = 1 << 20
+MAX_BATCH_ITEMS = 1000
+
+Receive = Callable[[], Awaitable[Dict[str, Any]]]
+Send = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class ServiceBusy(Exception):
+    """The admission queue is full; the client should retry later."""
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _validate(body: Any) -> Dict[str, Any]:
+    if not isinstance(body, dict):
+        raise HTTPError(400, "request body must be a JSON object")
+    item = {}
+    for field in ("text", "source_lang", "target_lang"):
+        value = body.get(field)
+        if not isinstance(value, str) or not value.strip():
+            raise HTTPError(400, f"'{field}' must be a non-empty string")
+        item[field] = value
+    domain = body.get("domain")
+    if domain is not None and not isinstance(domain, str):
+        raise HTTPError(400, "'domain' must be a string")
+    item["domain"] = domain or ""
+    terms = body.get("glossary")
+    if terms is not None and (
+        not isinstance(terms, dict) or not all(isinstance(value, str) for value in terms.values())
+    ):
+        raise HTTPError(400, "'glossary' must be an object mapping terms to their translations")
+    item["glossary"] = Glossary(item["source_lang"], item["target_lang"], terms.items()) if terms else None
+    return item
+
+
+async def _read_json(receive: Receive) -> Any:
+    body = b""
+    more = True
+    while more:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            raise HTTPError(400, "client disconnected")
+        body += message.get("body", b"")
+        if len(body) > MAX_BODY_BYTES:
+            raise HTTPError(413, "request body too large")
+        more = message.get("more_body", False)
+    try:
+        return json.loads(body or b"null")
+    except ValueError:
+        raise HTTPError(400, "request body is not valid JSON") from None
+
+
+async def _send_json(
+    send: Send,
+    status: int,
+    payload: Any,
+    headers: Optional[List[Tuple[bytes, bytes]]] = None,
+) -> None:
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json")] + (headers or []),
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _send_text(send: Send, status: int, text: str, content_type: bytes) -> None:
+    await send({"type": "http.response.start", "status": status, "headers": [(b"content-type", content_type)]})
+    await send({"type": "http.response.body", "body": text.encode("utf-8")})
+
+
+class TranslationService:
+    """ASGI application with request coalescing and bounded admission."""
+
+    def __init__(
+        self,
+        max_in_flight: int = 16,
+        max_queue: int = 64,
+        provider: str = DEFAULT_PROVIDER,
+        model: str = DEFAULT_MODEL,
+        temperature: float = DEFAULT_TEMPERATURE,
+    ):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.provider = provider
+        self.model = model
+        self.temperature = temperature
+
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._admitted = 0
+        self._inflight: Dict[str, "asyncio.Task[str]"] = {}
+        self.requests = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.llm_calls = 0
+
+    # ---- admission ----
+    def _slots(self) -> asyncio.Semaphore:
+        # Created lazily so it binds to the server's event loop.
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        return self._semaphore
+
+    def _admit(self, n: int = 1) -> None:
+        if self._admitted + n > self.max_in_flight + self.max_queue:
+            self.rejected += n
+            raise ServiceBusy()
+        self._admitted += n
+
+    def stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {
+            "requests": self.requests,
+            "coalesced": self.coalesced,
+            "rejected": self.rejected,
+            "llm_calls": self.llm_calls,
+            "admitted": self._admitted,
+            "in_flight_keys": len(self._inflight),
+        }
+        if self.provider == AUTO_PROVIDER:
+            stats["routes"] = get_router().snapshot()
+        return stats
+
+    def metrics(self) -> str:
+        """Prometheus text: instrumentation.METRICS plus this service's counters."""
+        lines = [METRICS.render_prometheus().rstrip("\n")]
+        for name, value in (
+            ("requests_total", self.requests),
+            ("coalesced_total", self.coalesced),
+            ("rejected_total", self.rejected),
+            ("llm_calls_total", self.llm_calls),
+        ):
+            lines += [f"# TYPE translator_service_{name} counter", f"translator_service_{name} {value}"]
+        lines += ["# TYPE translator_service_admitted gauge", f"translator_service_admitted {self._admitted}"]
+        return "\n".join(lines) + "\n"
+
+    # ---- translation ----
+    async def translate(self, item: Mapping[str, Any]) -> Tuple[str, bool]:
+        """Translate one validated item; returns (translation, coalesced)."""
+        self.requests += 1
+        key = make_key(
+            item["text"], item["source_lang"], item["target_lang"], item["domain"], glossary=item.get("glossary")
+        )
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return await asyncio.shield(task), True
+
+        self._admit()
+        task = asyncio.get_running_loop().create_task(self._call_model(item))
+        self._inflight[key] = task
+        task.add_done_callback(lambda _t: self._inflight.pop(key, None))
+        # Shielded: a client hanging up must not cancel a call others share.
+        return await asyncio.shield(task), False
+
+    async def _call_model(self, item: Mapping[str, Any]) -> str:
+        try:
+            queued = time.perf_counter()
+            async with self._slots():
+                METRICS.observe("admission", time.perf_counter() - queued)
+                self.llm_calls += 1
+                return await atranslate(
+                    item["text"],
+                    item["source_lang"],
+                    item["target_lang"],
+                    item["domain"],
+                    self.provider,
+                    self.model,
+                    self.temperature,
+                    glossary=item.get("glossary"),
+                )
+        finally:
+            self._admitted -= 1
+
+    # ---- ASGI ----
+    async def __call__(self, scope: Dict[str, Any], receive: Receive, send: Send) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        method, path = scope["method"], scope["path"].rstrip("/")
+        try:
+            if path == "/health":
+                if method != "GET":
+                    raise HTTPError(405, "method not allowed")
+                await _send_json(send, 200, self.stats())
+            elif path == "/metrics":
+                if method != "GET":
+                    raise HTTPError(405, "method not allowed")
+                await _send_text(send, 200, self.metrics(), b"text/plain; version=0.0.4")
+            elif path == "/translate":
+                if method != "POST":
+                    raise HTTPError(405, "method not allowed")
+                item = _validate(await _read_json(receive))
+                translation, coalesced = await self.translate(item)
+                await _send_json(send, 200, {"translation": translation, "coalesced": coalesced})
+            elif path == "/translate/batch":
+                if method != "POST":
+                    raise HTTPError(405, "method not allowed")
+                await self._handle_batch(await _read_json(receive), send)
+            elif path == "/translate/stream":
+                if method != "POST":
+                    raise HTTPError(405, "method not allowed")
+                await self._handle_stream(_validate(await _read_json(receive)), send)
+            else:
+                raise HTTPError(404, "not found")
+        except ServiceBusy:
+            await _send_json(
+                send, 429, {"error": "translation queue is full"}, [(b"retry-after", b"1")]
+            )
+        except HTTPError as e:
+            await _send_json(send, e.status, {"error": e.message})
+        except Exception as e:
+            await _send_json(send, 502, {"error": f"translation failed: {e}"})
+
+    async def _handle_batch(self, body: Any, send: Send) -> None:
+        if not isinstance(body, dict) or not isinstance(body.get("items"), list):
+            raise HTTPError(400, "'items' must be a list")
+        requested = body.get("max_concurrency")
+        if requested is not None and (not isinstance(requested, int) or isinstance(requested, bool) or requested < 1):
+            raise HTTPError(400, "'max_concurrency' must be a positive integer")
+        items = [_validate(item) for item in body["items"]]
+        if len(items) > MAX_BATCH_ITEMS:
+            raise HTTPError(413, f"at most {MAX_BATCH_ITEMS} items per batch")
+        # Items are admitted one by one as the batch's own earlier items
+        # finish, so a batch larger than the queue still goes through; it
+        # is only turned away when its first wave doesn't fit.
+        concurrency = min(requested or self.max_in_flight, self.max_in_flight)
+        wave = min(len(items), concurrency)
+        if self._admitted + wave > self.max_in_flight + self.max_queue:
+            self.rejected += wave
+            raise ServiceBusy()
+
+        limit = asyncio.Semaphore(concurrency)
+
+        async def run(item: Mapping[str, Any]) -> Dict[str, Any]:
+            async with limit:
+                try:
+                    translation, _ = await self.translate(item)
+                    return {"translation": translation}
+                except ServiceBusy:
+                    return {"error": "translation queue is full"}
+                except Exception as e:
+                    return {"error": f"translation failed: {e}"}
+
+        results = await asyncio.gather(*(run(item) for item in items))
+        await _send_json(send, 200, {"results": results})
+
+    async def _handle_stream(self, item: Mapping[str, Any], send: Send) -> None:
+        self.requests += 1
+        self._admit()
+        try:
+            queued = time.perf_counter()
+            async with self._slots():
+                METRICS.observe("admission", time.perf_counter() - queued)
+                self.llm_calls += 1
+                await send(
+                    {
+                        "type": "http.response.start",
+                        "status": 200,
+                        "headers": [(b"content-type", b"application/x-ndjson")],
+                    }
+                )
+                try:
+                    async for part in atranslate_stream(
+                        item["text"],
+                        item["source_lang"],
+                        item["target_lang"],
+                        item["domain"],
+                        self.provider,
+                        self.model,
+                        self.temperature,
+                        glossary=item.get("glossary"),
+                    ):
+                        line = json.dumps({"delta": part}, ensure_ascii=False) + "\n"
+                        await send(
+                            {"type": "http.response.body", "body": line.encode("utf-8"), "more_body": True}
+                        )
+                except Exception as e:
+                    # Headers are already sent; report the failure in-band.
+                    line = json.dumps({"error": f"translation failed: {e}"}) + "\n"
+                    await send(
+                        {"type": "http.response.body", "body": line.encode("utf-8"), "more_body": True}
+                    )
+                await send({"type": "http.response.body", "body": b""})
+        finally:
+            self._admitted -= 1
+
+    async def _lifespan(self, receive: Receive, send: Send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                warm_up(self.provider, self.model, self.temperature)
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+app = TranslationService(
+    max_in_flight=int(os.getenv("TRANSLATOR_MAX_IN_FLIGHT", "16")),
+    max_queue=int(os.getenv("TRANSLATOR_MAX_QUEUE", "64")),
+)
@@ -0,0 +1,151 @@
+# session_history.py
+"""Bounded per-session translation history for the Streamlit apps.
+
+Each session keeps a ring buffer of compact `HistoryRecord`s: languages,
+mode, lengths, a content hash and short previews of the input and
+output. When a text is longer than its preview, the full bodies are
+written to a small JSON file under `spill_dir` and only read back when
+the user asks for them. Memory per session and the cost of rendering
+the history therefore stay flat however many translations a session
+makes.
+
+Spill files live in one directory per session and are deleted when
+their record leaves the buffer or the history is cleared; directories
+of abandoned sessions are swept after `max_age` seconds.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Deque, List, NamedTuple, Optional, Tuple
+
+DEFAULT_SPILL_DIR = os.getenv("TRANSLATOR_HISTORY_DIR", ".translation_history")
+
+
+class HistoryRecord(NamedTuple):
+    id: str  # content hash; also the spill file name
+    timestamp: float
+    source_lang: str
+    target_lang: str
+    mode: str
+    input_preview: str
+    output_preview: str
+    input_chars: int
+    output_chars: int
+
+    @property
+    def truncated(self) -> bool:
+        return self.input_chars > len(self.input_preview) or self.output_chars > len(self.output_preview)
+
+
+def _preview(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[: limit - 1] + "…"
+
+
+class SessionHistory:
+    """Ring buffer of the last `capacity` translations of one session."""
+
+    def __init__(
+        self,
+        capacity: int = 50,
+        preview_chars: int = 200,
+        spill_dir: Optional[str] = DEFAULT_SPILL_DIR,
+        max_age: float = 7 * 24 * 3600,
+    ):
+        self.capacity = capacity
+        self.preview_chars = preview_chars
+        self.total = 0  # translations ever added, including evicted ones
+        self._records: Deque[HistoryRecord] = deque()
+        self._lock = threading.Lock()
+        self._dir: Optional[str] = None
+        if spill_dir:
+            _sweep(spill_dir, max_age)
+            self._dir = os.path.join(spill_dir, uuid.uuid4().hex)
+
+    def add(
+        self,
+        input_text: str,
+        output_text: str,
+        source_lang: str,
+        target_lang: str,
+        mode: str = "",
+    ) -> HistoryRecord:
+        digest = hashlib.sha256(f"{input_text}\0{output_text}".encode("utf-8")).hexdigest()[:16]
+        record = HistoryRecord(
+            id=f"{self.total:06d}-{digest}",
+            timestamp=time.time(),
+            source_lang=source_lang,
+            target_lang=target_lang,
+            mode=mode,
+            input_preview=_preview(input_text, self.preview_chars),
+            output_preview=_preview(output_text, self.preview_chars),
+            input_chars=len(input_text),
+            output_chars=len(output_text),
+        )
+        if record.truncated and self._dir is not None:
+            os.makedirs(self._dir, exist_ok=True)
+            with open(self._path(record), "w", encoding="utf-8") as f:
+                json.dump({"input": input_text, "output": output_text}, f, ensure_ascii=False)
+        with self._lock:
+            self._records.append(record)
+            self.total += 1
+            evicted = self._records.popleft() if len(self._records) > self.capacity else None
+        if evicted is not None:
+            self._discard(evicted)
+        return record
+
+    def recent(self, n: Optional[int] = None) -> List[HistoryRecord]:
+        """The last `n` records (all if None), newest first."""
+        with self._lock:
+            records = list(self._records)
+        records.reverse()
+        return records if n is None else records[:n]
+
+    def load(self, record: HistoryRecord) -> Tuple[str, str]:
+        """Full (input, output) of a record; previews if the bodies are gone."""
+        if record.truncated and self._dir is not None:
+            try:
+                with open(self._path(record), encoding="utf-8") as f:
+                    bodies = json.load(f)
+                return bodies["input"], bodies["output"]
+            except (OSError, ValueError, KeyError):
+                pass
+        return record.input_preview, record.output_preview
+
+    def clear(self) -> None:
+        with self._lock:
+            self._records.clear()
+        if self._dir is not None:
+            shutil.rmtree(self._dir, ignore_errors=True)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def _path(self, record: HistoryRecord) -> str:
+        return os.path.join(self._dir, f"{record.id}.json")
+
+    def _discard(self, record: HistoryRecord) -> None:
+        if record.truncated and self._dir is not None:
+            try:
+                os.remove(self._path(record))
+            except OSError:
+                pass
+
+
+def _sweep(spill_dir: str, max_age: float) -> None:
+    """Remove session directories nobody has written to for `max_age` seconds."""
+    try:
+        entries = list(os.scandir(spill_dir))
+    except OSError:
+        return
+    cutoff = time.time() - max_age
+    for entry in entries:
+        try:
+            if entry.is_dir() and entry.stat().st_mtime < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+        except OSError:
+            pass
@@ -0,0 +1,463 @@
+# translation_cache.py
+"""Translation memory in front of `translator_agent.translate`.
+
+Two tiers: an in-process LRU for hot strings and a shared backend that
+survives restarts (a SQLite file in WAL mode by default, which every
+session and worker process on the machine can use at once). Entries
+expire after `ttl` seconds and the backend is trimmed to
+`max_disk_entries` (least recently used first).
+
+Concurrent first requests for the same key, from any thread or process
+sharing the backend, trigger one model call: the first takes a lease
+and the others wait for its result (`TranslationCache.single_flight`).
+"""
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+
+from glossary import Glossary, glossary_for
+from instrumentation import METRICS, span
+from translator_agent import translate, translate_stream
+
+DEFAULT_CACHE_PATH = os.getenv("TRANSLATION_CACHE_PATH", ".translation_cache.sqlite3")
+DEFAULT_TTL = 30 * 24 * 3600  # 30 days
+
+_INLINE_SPACE = re.compile(r"[ \t\f\v]+")
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+
+def normalize_text(text: str) -> str:
+    """Collapse insignificant whitespace but keep line/paragraph breaks."""
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    lines = [_INLINE_SPACE.sub(" ", line).strip() for line in text.split("\n")]
+    return _BLANK_LINES.sub("\n\n", "\n".join(lines)).strip()
+
+
+def make_key(
+    text: str,
+    source_lang: str,
+    target_lang: str,
+    domain: Optional[str],
+    mode: Optional[str] = None,
+    glossary: Optional[Glossary] = None,
+) -> str:
+    """Stable hash of everything that changes the translation."""
+    if not domain or not domain.strip():
+        domain = "general"
+    parts = [normalize_text(text), source_lang, target_lang, normalize_text(domain), mode or "Standard"]
+    # Glossary terms the prompt will carry; keys without any are unchanged.
+    glossary = glossary_for(source_lang, target_lang, glossary)
+    terms = glossary.terms_in(text) if glossary is not None else []
+    if terms:
+        parts.append([list(term) for term in terms])
+    raw = json.dumps(parts, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class CacheBackend:
+    """Shared storage behind `TranslationCache`'s in-process LRU.
+
+    Implementations must be safe to use from several threads. Leases
+    are what keeps processes sharing a backend from translating the same
+    key at once; a backend used by one process only may grant them all.
+    """
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        """(value, created_at), or None."""
+        raise NotImplementedError
+
+    def put(self, key: str, value: str, now: float) -> None:
+        raise NotImplementedError
+
+    def touch(self, key: str, now: float) -> None:
+        """Mark `key` as used (for least-recently-used trimming)."""
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def trim(self, expired_before: float, max_entries: int) -> None:
+        """Drop entries created before `expired_before`, then all but the newest `max_entries`."""
+
+    def try_lease(self, key: str, owner: str, now: float, ttl: float) -> bool:
+        """Take the lease on `key` unless someone else holds an unexpired one."""
+        return True
+
+    def release_lease(self, key: str, owner: str) -> None:
+        pass
+
+    def lease_active(self, key: str, now: float) -> bool:
+        return False
+
+
+class SQLiteBackend(CacheBackend):
+    """Local-file backend. WAL mode lets several processes (e.g. Streamlit
+    or service workers) read while one writes."""
+
+    def __init__(self, path: str, busy_timeout: float = 5.0):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=busy_timeout, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS translations_accessed ON translations (accessed_at)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS leases ("
+            " key TEXT PRIMARY KEY,"
+            " owner TEXT NOT NULL,"
+            " expires_at REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            return self._db.execute(
+                "SELECT value, created_at FROM translations WHERE key = ?", (key,)
+            ).fetchone()
+
+    def put(self, key: str, value: str, now: float) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO translations (key, value, created_at, accessed_at)"
+                " VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            self._db.commit()
+
+    def touch(self, key: str, now: float) -> None:
+        with self._lock:
+            self._db.execute("UPDATE translations SET accessed_at = ? WHERE key = ?", (now, key))
+            self._db.commit()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM translations WHERE key = ?", (key,))
+            self._db.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM translations")
+            self._db.commit()
+
+    def trim(self, expired_before: float, max_entries: int) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM translations WHERE created_at < ?", (expired_before,))
+            self._db.execute(
+                "DELETE FROM translations WHERE key IN ("
+                " SELECT key FROM translations ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (max_entries,),
+            )
+            self._db.commit()
+
+    def try_lease(self, key: str, owner: str, now: float, ttl: float) -> bool:
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO leases (key, owner, expires_at) VALUES (?, ?, ?)"
+                " ON CONFLICT (key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at"
+                " WHERE leases.expires_at < ?",
+                (key, owner, now + ttl, now),
+            )
+            self._db.commit()
+            return cursor.rowcount == 1
+
+    def release_lease(self, key: str, owner: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, owner))
+            self._db.commit()
+
+    def lease_active(self, key: str, now: float) -> bool:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT 1 FROM leases WHERE key = ? AND expires_at >= ?", (key, now)
+            ).fetchone()
+        return row is not None
+
+
+class TranslationCache:
+    """LRU in front of a shared backend (SQLite by default). Thread-safe.
+
+    Pass `path=None` for a memory-only cache, or `backend=` for other
+    storage. `single_flight()` makes concurrent misses for one key, in
+    this process or any other sharing the backend, wait for a single
+    translation instead of each calling the model.
+    """
+
+    POLL_INTERVAL = 0.05  # seconds between checks on another process's lease
+
+    def __init__(
+        self,
+        path: Optional[str] = DEFAULT_CACHE_PATH,
+        max_memory_entries: int = 1024,
+        max_disk_entries: int = 100_000,
+        ttl: float = DEFAULT_TTL,
+        backend: Optional[CacheBackend] = None,
+        lease_ttl: float = 120.0,
+    ):
+        self.path = path
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl = ttl
+        self.lease_ttl = lease_ttl
+
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes_since_trim = 0
+        self._leases: Dict[str, threading.Event] = {}  # keys this process is translating
+        self._owner = f"{os.getpid()}-{uuid.uuid4().hex}"
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+        if backend is None and path:
+            backend = SQLiteBackend(path)
+        self._backend = backend
+
+    # ---- lookups ----
+    def get(self, key: str) -> Optional[str]:
+        return self._lookup(key, count=True)
+
+    def put(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            self._writes_since_trim += 1
+            trim = self._writes_since_trim >= 100
+            if trim:
+                self._writes_since_trim = 0
+        if self._backend is None:
+            return
+        self._backend.put(key, value, now)
+        if trim:
+            self._backend.trim(now - self.ttl, self.max_disk_entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+        if self._backend is not None:
+            self._backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.memory_hits + self.disk_hits
+        total = hits + self.misses
+        return {
+            "hits": hits,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": hits / total if total else 0.0,
+            "memory_entries": len(self._memory),
+        }
+
+    # ---- stampede protection ----
+    @contextmanager
+    def single_flight(self, key: str) -> Iterator[Optional[str]]:
+        """Hold the lease on `key` for the body of a `with` block.
+
+        Yields the value if another caller produced it while we waited;
+        the body should then use it instead of translating. Yields None
+        when the caller should translate (and `put`) it; other callers
+        wait until the block exits. After waiting a whole `lease_ttl`
+        the caller translates without the lease.
+        """
+        event, value = self._claim(key)
+        if event is None:
+            yield value
+            return
+        try:
+            yield self._lookup(key, count=False)  # finished just before we got the lease?
+        finally:
+            with self._lock:
+                if self._leases.get(key) is event:
+                    del self._leases[key]
+            if self._backend is not None:
+                self._backend.release_lease(key, self._owner)
+            event.set()
+
+    def _claim(self, key: str) -> Tuple[Optional[threading.Event], Optional[str]]:
+        """(event, None) once we hold the lease, (None, value) if someone
+        else produced the value, (None, None) after a timeout."""
+        deadline = time.monotonic() + self.lease_ttl
+        while time.monotonic() < deadline:
+            with self._lock:
+                event = self._leases.get(key)
+                if event is None and (
+                    self._backend is None
+                    or self._backend.try_lease(key, self._owner, time.time(), self.lease_ttl)
+                ):
+                    event = self._leases[key] = threading.Event()
+                    return event, None
+            value = self._wait(key, event, deadline)
+            if value is not None:
+                self.coalesced += 1
+                return None, value
+        return None, None
+
+    def _wait(self, key: str, event: Optional[threading.Event], deadline: float) -> Optional[str]:
+        """Wait for the lease holder; its value, or None if it gave up."""
+        while time.monotonic() < deadline:
+            if event is not None:  # held in this process
+                event.wait(deadline - time.monotonic())
+            else:
+                time.sleep(self.POLL_INTERVAL)
+            value = self._lookup(key, count=False)
+            if value is not None:
+                return value
+            if event is not None and event.is_set():
+                return None
+            if event is None and not self._backend.lease_active(key, time.time()):
+                return None
+        return None
+
+    # ---- internals ----
+    def _lookup(self, key: str, count: bool) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created_at = entry
+                if now - created_at < self.ttl:
+                    self._memory.move_to_end(key)
+                    if count:
+                        self.memory_hits += 1
+                    return value
+                del self._memory[key]
+
+        if self._backend is not None:
+            row = self._backend.get(key)
+            if row is not None:
+                value, created_at = row
+                if now - created_at < self.ttl:
+                    self._backend.touch(key, now)
+                    with self._lock:
+                        self._remember(key, value, created_at)
+                        if count:
+                            self.disk_hits += 1
+                    return value
+                self._backend.delete(key)
+
+        if count:
+            with self._lock:
+                self.misses += 1
+        return None
+
+    def _remember(self, key: str, value: str, created_at: float) -> None:
+        # Caller holds the lock.
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+
+_default_cache: Optional[TranslationCache] = None
+_default_lock = threading.Lock()
+
+
+def get_default_cache() -> TranslationCache:
+    """Process-wide cache stored at DEFAULT_CACHE_PATH."""
+    global _default_cache
+    if _default_cache is None:
+        with _default_lock:
+            if _default_cache is None:
+                _default_cache = TranslationCache()
+    return _default_cache
+
+
+def cached_translate(
+    text: str,
+    source_lang: str,
+    target_lang: str,
+    domain: Optional[str],
+    mode: Optional[str] = None,
+    cache: Optional[TranslationCache] = None,
+    translate_fn: Callable[..., str] = translate,
+    **kwargs: Any,
+) -> Tuple[str, bool]:
+    """`translate()` (or another `translate_fn`) behind the translation memory.
+
+    Returns (translation, from_cache); a translation another caller was
+    already producing counts as from the cache. `mode` and extra keyword
+    arguments are passed through to `translate_fn`; a `glossary` among
+    them is part of the key.
+    """
+    if cache is None:
+        cache = get_default_cache()
+
+    key = make_key(text, source_lang, target_lang, domain, mode, kwargs.get("glossary"))
+    with span("cache"):
+        hit = cache.get(key)
+    METRICS.count_cache(hit is not None)
+    if hit is not None:
+        return hit, True
+
+    if mode is not None:
+        kwargs["mode"] = mode
+    with cache.single_flight(key) as shared:
+        if shared is not None:
+            return shared, True
+        output = translate_fn(text, source_lang, target_lang, domain, **kwargs)
+        cache.put(key, output)
+    return output, False
+
+
+def cached_translate_stream(
+    text: str,
+    source_lang: str,
+    target_lang: str,
+    domain: Optional[str],
+    mode: Optional[str] = None,
+    cache: Optional[TranslationCache] = None,
+    **kwargs: Any,
+) -> Tuple[Iterator[str], bool]:
+    """Streaming counterpart of `cached_translate`.
+
+    Returns (chunks, from_cache). A hit yields the stored translation as a
+    single chunk; a miss streams from the model and stores the result once
+    the stream has been fully consumed. If another caller is already
+    translating the same text, the stream waits for its result instead.
+    """
+    if cache is None:
+        cache = get_default_cache()
+
+    key = make_key(text, source_lang, target_lang, domain, mode, kwargs.get("glossary"))
+    with span("cache"):
+        hit = cache.get(key)
+    METRICS.count_cache(hit is not None)
+    if hit is not None:
+        return iter([hit]), True
+    if mode is not None:
+        kwargs["mode"] = mode
+
+    def stream() -> Iterator[str]:
+        # The lease is taken on first iteration, so an unconsumed stream holds none.
+        with cache.single_flight(key) as shared:
+            if shared is not None:
+                yield shared
+                return
+            parts = []
+            for part in translate_stream(text, source_lang, target_lang, domain, **kwargs):
+                parts.append(part)
+                yield part
+            cache.put(key, "".join(parts))
+
+    return stream(), False
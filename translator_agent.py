@@ -1,23 +1,52 @@
 # translator_agent.py
-from typing import Optional
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+)
+import asyncio
+import concurrent.futures
+import contextvars
 import os
+import threading
 
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_groq import ChatGroq
+from langchain_core.runnables import Runnable
 
+from glossary import GlossaryChain
+from hedging import HedgedChain, get_hedge_policy
+from instrumentation import chain_config
+from lang_detect import Run, in_target_language, plan_runs, resolve_source
+from prompts import DEFAULT_MODE, compile_prompt
+from protected_spans import ProtectedChain
+from quality import QualityGate
+from rate_limit import RateLimitedModel, get_limiter
+from segmentation import chunk_text, join_segments, needs_translation, split_paragraphs, split_segments
 
+if TYPE_CHECKING:
+    import httpx
+    from langchain_core.language_models import BaseChatModel
 
-def build_translation_chain():
-    """Create a stateless, context-aware translation chain using Google Gemini."""
-    llm = ChatGroq(
-        model="llama-3.3-70b-versatile",   # or "gemini-1.5-flash" for cheaper/faster
-        temperature=0.2,
-       api_key= os.getenv("GROQ_API_KEY")
-    )
+    from glossary import Glossary
+    from segment_memory import SegmentMemory
+
+# AUTO_PROVIDER lets router.py pick provider and model per request.
+AUTO_PROVIDER = "auto"
+DEFAULT_PROVIDER = os.getenv("TRANSLATOR_PROVIDER", "groq")
+DEFAULT_MODEL = "llama-3.3-70b-versatile"
+DEFAULT_TEMPERATURE = 0.2
 
-    system_prompt = """
+SYSTEM_PROMPT = """
 You are a professional, context-aware translation AGENT.
 
 Goals:
@@ -25,16 +54,12 @@ Goals:
 - Preserve meaning, tone, and technical details.
 - Use the provided domain/context (e.g., legal, medical, software, marketing) to choose correct terminology.
 - If source language is "auto", detect it yourself.
+- Copy markers like ⟦0⟧ unchanged; they stand for code, links or numbers.
 - Do NOT explain the translation or add commentary.
 - Output ONLY the translated text.
 """
 
-    prompt = ChatPromptTemplate.from_messages(
-        [
-            ("system", system_prompt),
-            (
-                "human",
-                """
+HUMAN_PROMPT = """
 Source language: {source_lang}
 Target language: {target_lang}
 Domain / Context: {domain}
@@ -42,32 +67,825 @@ Domain / Context: {domain}
 Text to translate:
 ```text
 {text}
-```""",
-            ),
-        ]
+```"""
+
+# Parsed once; every chain shares the same template object.
+TRANSLATION_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        ("system", SYSTEM_PROMPT),
+        ("human", HUMAN_PROMPT),
+    ]
+)
+
+
+# -------------------- Shared HTTP pool --------------------
+_http_client: Optional["httpx.Client"] = None
+_http_lock = threading.Lock()
+
+
+def get_http_client() -> "httpx.Client":
+    """Process-wide keep-alive pool shared by every provider client."""
+    global _http_client
+    if _http_client is None:
+        with _http_lock:
+            if _http_client is None:
+                import httpx
+
+                _http_client = httpx.Client(
+                    limits=httpx.Limits(
+                        max_connections=int(os.getenv("TRANSLATOR_MAX_CONNECTIONS", "20")),
+                        max_keepalive_connections=10,
+                    ),
+                    timeout=httpx.Timeout(60.0, connect=10.0),
+                )
+    return _http_client
+
+
+# -------------------- Providers --------------------
+# Provider SDKs are imported by their factory on first use, so importing
+# this module (and starting a Streamlit worker) doesn't pay for them.
+LLMFactory = Callable[[str, float], "BaseChatModel"]
+
+
+def _groq_llm(model: str, temperature: float) -> "BaseChatModel":
+    from langchain_groq import ChatGroq
+
+    return ChatGroq(
+        model=model,
+        temperature=temperature,
+        api_key=os.getenv("GROQ_API_KEY"),
+        http_client=get_http_client(),
+        max_retries=0,  # retries and backoff live in rate_limit
+    )
+
+
+def _google_llm(model: str, temperature: float) -> "BaseChatModel":
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    return ChatGoogleGenerativeAI(
+        model=model,
+        temperature=temperature,
+        google_api_key=os.getenv("GOOGLE_API_KEY"),
+        max_retries=1,  # counts attempts here, so a single try
     )
 
+
+LLM_PROVIDERS: Dict[str, LLMFactory] = {
+    "groq": _groq_llm,
+    "google": _google_llm,
+}
+
+
+def register_provider(name: str, factory: LLMFactory) -> None:
+    """Make a chat-model factory available as `provider=name`.
+
+    Models and chains already built for that provider are dropped so the
+    new factory takes effect on the next call.
+    """
+    LLM_PROVIDERS[name] = factory
+    with _chains_lock:
+        for key in [k for k in _models if k[0] == name]:
+            del _models[key]
+        for key in [k for k in _chains if k[0] == name]:
+            del _chains[key]
+
+
+# -------------------- Prompts --------------------
+PROMPTS: Dict[str, ChatPromptTemplate] = {
+    "translate": TRANSLATION_PROMPT,
+}
+# Prompts whose "text" is plain prose (see protected_spans). Prompts that
+# carry structured text, like micro_batch's JSON lines, mask it themselves.
+MASKED_PROMPTS = {"translate"}
+QUALITY_GATE = os.getenv("TRANSLATOR_QUALITY", "1") != "0"
+
+
+def register_prompt(name: str, prompt: ChatPromptTemplate, masked: bool = False) -> None:
+    """Make `prompt` available to `get_translation_chain(prompt_name=name)`.
+
+    `masked=True` puts protected-span masking in front of it.
+    """
+    PROMPTS[name] = prompt
+    if masked:
+        MASKED_PROMPTS.add(name)
+    with _chains_lock:
+        for key in [k for k in _chains if k[3] == name]:
+            del _chains[key]
+
+
+def prompt_name_for(mode: Optional[str], domain: Optional[str]) -> str:
+    """Name of the compact prompt for (mode, domain), registered on first use."""
+    compiled = compile_prompt(mode, domain)
+    if compiled.name not in PROMPTS:
+        register_prompt(compiled.name, compiled.template, masked=True)
+    return compiled.name
+
+
+def _memory_domain(domain: str, mode: Optional[str]) -> str:
+    # Sentences translated in one mode must not be reused in another.
+    return domain if not mode or mode == DEFAULT_MODE else f"{domain} [{mode}]"
+
+
+# -------------------- Chains --------------------
+def build_translation_chain(
+    model: str = DEFAULT_MODEL,
+    temperature: float = DEFAULT_TEMPERATURE,
+    provider: str = DEFAULT_PROVIDER,
+    prompt: ChatPromptTemplate = TRANSLATION_PROMPT,
+) -> Runnable:
+    """Create a stateless, context-aware translation chain."""
+    try:
+        factory = LLM_PROVIDERS[provider]
+    except KeyError:
+        raise ValueError(f"Unknown LLM provider: {provider!r}") from None
+
+    llm = RateLimitedModel(factory(model, temperature), get_limiter(provider, model))
     chain = prompt | llm | StrOutputParser()
+    if prompt is TRANSLATION_PROMPT:
+        chain = ProtectedChain(chain)
     return chain
 
 
+ModelKey = Tuple[str, str, float]
+ChainKey = Tuple[str, str, float, str]
+
+_models: Dict[ModelKey, "BaseChatModel"] = {}
+_chains: Dict[ChainKey, Runnable] = {}
+_chains_lock = threading.RLock()
+
+
+def get_chat_model(
+    model: str = DEFAULT_MODEL,
+    temperature: float = DEFAULT_TEMPERATURE,
+    provider: str = DEFAULT_PROVIDER,
+) -> "BaseChatModel":
+    """Return the process-wide chat model for (provider, model, temperature)."""
+    key = (provider, model, float(temperature))
+    llm = _models.get(key)
+    if llm is None:
+        with _chains_lock:
+            llm = _models.get(key)
+            if llm is None:
+                try:
+                    factory = LLM_PROVIDERS[provider]
+                except KeyError:
+                    raise ValueError(f"Unknown LLM provider: {provider!r}") from None
+                llm = factory(model, temperature)
+                _models[key] = llm
+    return llm
+
+
+def get_translation_chain(
+    model: str = DEFAULT_MODEL,
+    temperature: float = DEFAULT_TEMPERATURE,
+    provider: str = DEFAULT_PROVIDER,
+    prompt_name: str = "translate",
+) -> Runnable:
+    """Return the process-wide chain for (provider, model, temperature, prompt).
+
+    The chain is built on first use and reused afterwards, so repeated
+    translations share one client and one HTTP connection pool. Chains
+    for different prompts share the same chat model and the same
+    rate limiter (see rate_limit.get_limiter).
+
+    `provider="auto"` returns a chain that routes every call through
+    router.get_router(); `model` is then ignored. Routes with a hedging
+    policy (see hedging.configure_hedging) get a `HedgedChain`. Prompts
+    in MASKED_PROMPTS run behind a `ProtectedChain`, so code, URLs and
+    placeholders never reach the model. Prompts with a `terms` variable
+    (the compact ones) run behind a `GlossaryChain`, which fills it with
+    the terms of the request's glossary (see `make_payload`) or of the
+    registered one (see glossary.register_glossary).
+    Answers to MASKED_PROMPTS are checked by a `QualityGate`, which asks
+    again for ones that fail its cheap checks; TRANSLATOR_QUALITY=0
+    turns it off.
+    """
+    if provider == AUTO_PROVIDER:
+        from router import get_router  # router imports this module
+
+        return get_router().chain(temperature, prompt_name)
+    key = (provider, model, float(temperature), prompt_name)
+    chain = _chains.get(key)
+    if chain is None:
+        with _chains_lock:
+            chain = _chains.get(key)
+            if chain is None:
+                chain = _plain_chain(model, temperature, provider, prompt_name)
+                policy = get_hedge_policy(provider, model)
+                if policy is not None:
+                    backup = chain
+                    if policy.alternate is not None:
+                        alt_provider, alt_model = policy.alternate
+                        backup = _plain_chain(alt_model, temperature, alt_provider, prompt_name)
+                    chain = HedgedChain(chain, backup, policy)
+                if prompt_name in MASKED_PROMPTS:
+                    chain = ProtectedChain(chain)
+                if "terms" in PROMPTS[prompt_name].partial_variables:
+                    chain = GlossaryChain(chain)
+                if prompt_name in MASKED_PROMPTS and QUALITY_GATE:
+                    chain = QualityGate(chain)
+                _chains[key] = chain
+    return chain
+
+
+def _plain_chain(model: str, temperature: float, provider: str, prompt_name: str) -> Runnable:
+    llm = get_chat_model(model, temperature, provider)
+    limited = RateLimitedModel(llm, get_limiter(provider, model))
+    chain = PROMPTS[prompt_name] | limited | StrOutputParser()
+    return chain.with_config(chain_config(provider, model))
+
+
+def warm_up(
+    provider: str = DEFAULT_PROVIDER,
+    model: str = DEFAULT_MODEL,
+    temperature: float = DEFAULT_TEMPERATURE,
+    background: bool = True,
+) -> Optional[threading.Thread]:
+    """Import the provider SDK and build its client and default chain now.
+
+    Call it at startup so the first request doesn't pay for them. With
+    `background=True` the work runs in a daemon thread, which is
+    returned. For `provider="auto"` every route of the router is warmed.
+    """
+
+    def run() -> None:
+        if provider == AUTO_PROVIDER:
+            from router import get_router
+
+            routes = [route for tier in get_router().tiers.values() for route in tier]
+        else:
+            routes = [(provider, model)]
+        for route_provider, route_model in routes:
+            try:
+                get_translation_chain(route_model, temperature, route_provider, prompt_name_for(None, None))
+            except Exception:
+                pass  # e.g. a missing API key; the first real call reports it
+
+    if not background:
+        run()
+        return None
+    thread = threading.Thread(target=run, name="translator-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def clear_translation_chains() -> None:
+    """Forget every cached model and chain (e.g. after rotating API keys)."""
+    with _chains_lock:
+        _models.clear()
+        _chains.clear()
+
+
+def make_payload(
+    text: str, source_lang: str, target_lang: str, domain: Optional[str], glossary: Optional["Glossary"] = None
+) -> Dict[str, Any]:
+    """Prompt variables for one translation ("general" when no domain is given).
+
+    A `glossary` rides along for `GlossaryChain`, in place of the
+    registered one; prompts ignore it.
+    """
+    if not domain or not domain.strip():
+        domain = "general"
+    payload: Dict[str, Any] = {
+        "source_lang": source_lang,
+        "target_lang": target_lang,
+        "domain": domain,
+        "text": text,
+    }
+    if glossary is not None:
+        payload["glossary"] = glossary
+    return payload
+
+
 def translate(
     text: str,
     source_lang: str,
     target_lang: str,
     domain: Optional[str],
+    provider: str = DEFAULT_PROVIDER,
+    model: str = DEFAULT_MODEL,
+    temperature: float = DEFAULT_TEMPERATURE,
+    memory: Optional["SegmentMemory"] = None,
+    mode: Optional[str] = None,
+    glossary: Optional["Glossary"] = None,
 ) -> str:
-    """Stateless translation (no history / memory used)."""
+    """Translate `text`; no conversation history is used.
+
+    With a `memory`, the text is translated sentence by sentence and only
+    sentences the memory doesn't hold verbatim are sent to the model,
+    each with the closest stored sentence as a reference. Text already
+    in the target language comes back unchanged (see lang_detect).
+    `mode` ("Formal", "Casual", ...) picks the compact prompt (see prompts).
+    `glossary` is used instead of the registered one (see glossary).
+    """
     if not domain or not domain.strip():
         domain = "general"
 
-    chain = build_translation_chain()
-    output = chain.invoke(
-        {
-            "source_lang": source_lang,
-            "target_lang": target_lang,
-            "domain": domain,
-            "text": text,
-        }
-    )
+    runs = plan_runs(text, source_lang, target_lang)
+    if len(runs) > 1:
+        return _translate_runs(runs, target_lang, domain, provider, model, temperature, memory, mode, glossary)
+    if runs[0].keep:
+        return text
+    source_lang = runs[0].source_lang
+
+    chain = get_translation_chain(model, temperature, provider, prompt_name_for(mode, domain))
+    if memory is not None:
+        return _translate_segments(chain, memory, text, source_lang, target_lang, domain, mode, glossary)
+
+    output = chain.invoke(make_payload(text, source_lang, target_lang, domain, glossary))
     return output
+
+
+def _translate_runs(
+    runs: List[Run],
+    target_lang: str,
+    domain: str,
+    provider: str,
+    model: str,
+    temperature: float,
+    memory: Optional["SegmentMemory"],
+    mode: Optional[str],
+    glossary: Optional["Glossary"],
+) -> str:
+    """Translate mixed-language input run by run; target-language runs stay."""
+    outputs = [run.text for run in runs]
+    todo = [i for i, run in enumerate(runs) if not run.keep]
+    if memory is not None:
+        for i in todo:
+            outputs[i] = translate(
+                runs[i].text,
+                runs[i].source_lang,
+                target_lang,
+                domain,
+                provider,
+                model,
+                temperature,
+                memory,
+                mode,
+                glossary,
+            )
+    else:
+        chain = get_translation_chain(model, temperature, provider, prompt_name_for(mode, domain))
+        translated = chain.batch(
+            [make_payload(runs[i].text, runs[i].source_lang, target_lang, domain, glossary) for i in todo],
+            config={"max_concurrency": 4},
+        )
+        for i, output in zip(todo, translated):
+            outputs[i] = output.strip()
+    return "".join(output + run.separator for output, run in zip(outputs, runs))
+
+
+def _memory_payload(
+    memory: "SegmentMemory",
+    sentence: str,
+    source_lang: str,
+    target_lang: str,
+    domain: Optional[str],
+    context: Tuple[str, str, str],
+    glossary: Optional["Glossary"] = None,
+) -> Dict[str, Any]:
+    # Compact prompts take a `reference`: the closest sentence translated before.
+    from segment_memory import render_reference  # segment_memory imports translation_cache, which imports us
+
+    payload = make_payload(sentence, source_lang, target_lang, domain, glossary)
+    payload["reference"] = render_reference(memory.similar(sentence, context))
+    return payload
+
+
+def _translate_segments(
+    chain: Runnable,
+    memory: "SegmentMemory",
+    text: str,
+    source_lang: str,
+    target_lang: str,
+    domain: str,
+    mode: Optional[str] = None,
+    glossary: Optional["Glossary"] = None,
+) -> str:
+    context = (source_lang, target_lang, _memory_domain(domain, mode))
+    segments = split_segments(text)
+    translated: List[str] = []
+    pending: Dict[str, List[int]] = {}  # sentence -> positions waiting for it
+
+    for i, (sentence, _sep) in enumerate(segments):
+        if not needs_translation(sentence):
+            translated.append(sentence)
+            continue
+        match = memory.lookup(sentence, context)
+        if match is not None:
+            translated.append(match)
+            continue
+        translated.append("")
+        pending.setdefault(sentence, []).append(i)
+
+    if pending:
+        sentences = list(pending)
+        outputs = chain.batch(
+            [
+                _memory_payload(memory, sentence, source_lang, target_lang, domain, context, glossary)
+                for sentence in sentences
+            ],
+            config={"max_concurrency": 4},
+        )
+        for sentence, output in zip(sentences, outputs):
+            output = output.strip()
+            memory.add(sentence, output, context)
+            for i in pending[sentence]:
+                translated[i] = output
+
+    return join_segments([(out, sep) for out, (_s, sep) in zip(translated, segments)])
+
+
+def translate_long_document(
+    text: str,
+    source_lang: str,
+    target_lang: str,
+    domain: Optional[str],
+    max_chunk_tokens: int = 800,
+    overlap_sentences: int = 1,
+    max_workers: int = 4,
+    provider: str = DEFAULT_PROVIDER,
+    model: str = DEFAULT_MODEL,
+    temperature: float = DEFAULT_TEMPERATURE,
+    mode: Optional[str] = None,
+    glossary: Optional["Glossary"] = None,
+) -> str:
+    """Translate a long text as token-budgeted chunks, several at a time.
+
+    Chunks break on paragraph/sentence boundaries and are reassembled in
+    order. With `overlap_sentences`, the tail of the previous chunk is
+    given to the model as context (it is not translated again).
+    """
+    if not domain or not domain.strip():
+        domain = "general"
+    if in_target_language(text, source_lang, target_lang):
+        return text
+    source_lang = resolve_source(text, source_lang)
+
+    chunks = chunk_text(text, max_chunk_tokens, overlap_sentences)
+    if len(chunks) <= 1:
+        return translate(
+            text, source_lang, target_lang, domain, provider, model, temperature, mode=mode, glossary=glossary
+        )
+
+    payloads = []
+    for chunk in chunks:
+        chunk_domain = domain
+        if chunk.context:
+            chunk_domain = (
+                f"{domain}\nPreceding text (context only, do not translate it): "
+                f"{chunk.context}"
+            )
+        payloads.append(make_payload(chunk.text, source_lang, target_lang, chunk_domain, glossary))
+
+    # One template for all chunks: if any carries context, the generic
+    # (domain-as-variable) one, which keeps that context.
+    chunk_domain = next((p["domain"] for p in payloads if p["domain"] != domain), domain)
+    chain = get_translation_chain(model, temperature, provider, prompt_name_for(mode, chunk_domain))
+    outputs = chain.batch(payloads, config={"max_concurrency": max_workers})
+    return "".join(
+        output.strip() + chunk.separator for output, chunk in zip(outputs, chunks)
+    )
+
+
+# -------------------- Async / batch --------------------
+async def atranslate(
+    text: str,
+    source_lang: str,
+    target_lang: str,
+    domain: Optional[str],
+    provider: str = DEFAULT_PROVIDER,
+    model: str = DEFAULT_MODEL,
+    temperature: float = DEFAULT_TEMPERATURE,
+    mode: Optional[str] = None,
+    glossary: Optional["Glossary"] = None,
+) -> str:
+    """Async `translate()`; many calls can share one event loop."""
+    chain = get_translation_chain(model, temperature, provider, prompt_name_for(mode, domain))
+    runs = plan_runs(text, source_lang, target_lang)
+    if len(runs) == 1:
+        if runs[0].keep:
+            return text
+        return await chain.ainvoke(make_payload(text, runs[0].source_lang, target_lang, domain, glossary))
+
+    todo = [run for run in runs if not run.keep]
+    translated = iter(
+        await chain.abatch(
+            [make_payload(run.text, run.source_lang, target_lang, domain, glossary) for run in todo],
+            config={"max_concurrency": 4},
+        )
+    )
+    return "".join((run.text if run.keep else next(translated).strip()) + run.separator for run in runs)
+
+
+async def atranslate_batch(
+    items: Sequence[Mapping[str, Any]],
+    max_concurrency: int = 8,
+    provider: str = DEFAULT_PROVIDER,
+    model: str = DEFAULT_MODEL,
+    temperature: float = DEFAULT_TEMPERATURE,
+    return_exceptions: bool = False,
+) -> List[Any]:
+    """Translate many items with at most `max_concurrency` calls in flight.
+
+    Each item is a mapping with `text`, `source_lang`, `target_lang` and
+    optionally `domain`, `mode` and `glossary`. Results come back in the order of
+    `items`; with `return_exceptions=True` a failed item yields its
+    exception instead of aborting the whole batch. Items already in their
+    target language are returned as they are, without a model call.
+    """
+    if not items:
+        return []
+    results: List[Any] = [item["text"] for item in items]
+    groups: Dict[str, List[Tuple[int, Dict[str, Any]]]] = {}  # prompt name -> (index, payload)
+    for i, item in enumerate(items):
+        if in_target_language(item["text"], item["source_lang"], item["target_lang"]):
+            continue
+        source_lang = resolve_source(item["text"], item["source_lang"])
+        payload = make_payload(item["text"], source_lang, item["target_lang"], item.get("domain"), item.get("glossary"))
+        name = prompt_name_for(item.get("mode"), payload["domain"])
+        groups.setdefault(name, []).append((i, payload))
+    # One abatch per prompt, one after the other, so `max_concurrency` holds.
+    for name, group in groups.items():
+        chain = get_translation_chain(model, temperature, provider, name)
+        outputs = await chain.abatch(
+            [payload for _i, payload in group],
+            config={"max_concurrency": max_concurrency},
+            return_exceptions=return_exceptions,
+        )
+        for (i, _payload), output in zip(group, outputs):
+            results[i] = output
+    return results
+
+
+def translate_batch(
+    items: Sequence[Mapping[str, Any]],
+    max_concurrency: int = 8,
+    provider: str = DEFAULT_PROVIDER,
+    model: str = DEFAULT_MODEL,
+    temperature: float = DEFAULT_TEMPERATURE,
+    return_exceptions: bool = False,
+) -> List[Any]:
+    """Blocking wrapper around `atranslate_batch` (runs its own event loop).
+
+    Call `atranslate_batch` directly from code that is already async.
+    """
+    return asyncio.run(
+        atranslate_batch(items, max_concurrency, provider, model, temperature, return_exceptions)
+    )
+
+
+# -------------------- Incremental re-translation --------------------
+JobContext = Tuple[str, str, str, str]  # (source_lang, target_lang, domain, mode)
+
+
+class Alignment(NamedTuple):
+    """Source and translated paragraphs of a finished job, in order."""
+
+    context: JobContext
+    pairs: Tuple[Tuple[str, str], ...]  # (source paragraph, translation), stripped
+
+
+def _job_context(source_lang: str, target_lang: str, domain: Optional[str], mode: Optional[str]) -> JobContext:
+    return (source_lang, target_lang, (domain or "").strip() or "general", mode or DEFAULT_MODE)
+
+
+def align_paragraphs(
+    text: str,
+    translation: str,
+    source_lang: str,
+    target_lang: str,
+    domain: Optional[str],
+    mode: Optional[str] = None,
+) -> Optional[Alignment]:
+    """Pair the paragraphs of `text` with those of its `translation`.
+
+    None when the paragraph counts differ (the model merged or split
+    some), since the pairs can't be trusted then.
+    """
+    sources = [p.strip() for p, _sep in split_paragraphs(text) if p.strip()]
+    targets = [p.strip() for p, _sep in split_paragraphs(translation) if p.strip()]
+    if not sources or len(sources) != len(targets):
+        return None
+    return Alignment(_job_context(source_lang, target_lang, domain, mode), tuple(zip(sources, targets)))
+
+
+def reusable_paragraphs(
+    text: str,
+    previous: Optional[Alignment],
+    source_lang: str,
+    target_lang: str,
+    domain: Optional[str],
+    mode: Optional[str] = None,
+) -> Tuple[int, int]:
+    """(paragraphs `previous` already has translations for, paragraphs in `text`)."""
+    paragraphs = [p.strip() for p, _sep in split_paragraphs(text) if p.strip()]
+    if previous is None or previous.context != _job_context(source_lang, target_lang, domain, mode):
+        return 0, len(paragraphs)
+    known = {source for source, _translation in previous.pairs}
+    return sum(p in known for p in paragraphs), len(paragraphs)
+
+
+async def atranslate_incremental(
+    text: str,
+    source_lang: str,
+    target_lang: str,
+    domain: Optional[str],
+    previous: Optional[Alignment],
+    provider: str = DEFAULT_PROVIDER,
+    model: str = DEFAULT_MODEL,
+    temperature: float = DEFAULT_TEMPERATURE,
+    mode: Optional[str] = None,
+    max_concurrency: int = 4,
+    glossary: Optional["Glossary"] = None,
+) -> Tuple[str, Alignment, int]:
+    """Re-translate only the paragraphs of `text` that `previous` lacks.
+
+    Paragraphs are matched by content, so unchanged paragraphs are
+    reused even if they moved; inserted or edited ones are translated
+    in one concurrent batch. Returns (translation, alignment for the
+    next edit, number of paragraphs sent to the model).
+    """
+    context = _job_context(source_lang, target_lang, domain, mode)
+    known: Dict[str, str] = {}
+    if previous is not None and previous.context == context:
+        known = dict(previous.pairs)
+
+    paragraphs = split_paragraphs(text)
+    todo: List[str] = []
+    for paragraph, _sep in paragraphs:
+        key = paragraph.strip()
+        if key and key not in known and key not in todo and needs_translation(key):
+            todo.append(key)
+    if todo:
+        items = [
+            {
+                "text": key,
+                "source_lang": source_lang,
+                "target_lang": target_lang,
+                "domain": domain,
+                "mode": mode,
+                "glossary": glossary,
+            }
+            for key in todo
+        ]
+        outputs = await atranslate_batch(items, max_concurrency, provider, model, temperature)
+        known.update((key, output.strip()) for key, output in zip(todo, outputs))
+
+    parts: List[str] = []
+    pairs: List[Tuple[str, str]] = []
+    for paragraph, sep in paragraphs:
+        key = paragraph.strip()
+        translated = known.get(key, key)
+        if key:
+            pairs.append((key, translated))
+        parts.append(translated + sep)
+    return "".join(parts), Alignment(context, tuple(pairs)), len(todo)
+
+
+def translate_incremental(
+    text: str,
+    source_lang: str,
+    target_lang: str,
+    domain: Optional[str],
+    previous: Optional[Alignment],
+    provider: str = DEFAULT_PROVIDER,
+    model: str = DEFAULT_MODEL,
+    temperature: float = DEFAULT_TEMPERATURE,
+    mode: Optional[str] = None,
+    max_concurrency: int = 4,
+    glossary: Optional["Glossary"] = None,
+) -> Tuple[str, Alignment, int]:
+    """Blocking wrapper around `atranslate_incremental`."""
+    return asyncio.run(
+        atranslate_incremental(
+            text,
+            source_lang,
+            target_lang,
+            domain,
+            previous,
+            provider,
+            model,
+            temperature,
+            mode,
+            max_concurrency,
+            glossary,
+        )
+    )
+
+
+# -------------------- Streaming --------------------
+def translate_stream(
+    text: str,
+    source_lang: str,
+    target_lang: str,
+    domain: Optional[str],
+    provider: str = DEFAULT_PROVIDER,
+    model: str = DEFAULT_MODEL,
+    temperature: float = DEFAULT_TEMPERATURE,
+    memory: Optional["SegmentMemory"] = None,
+    mode: Optional[str] = None,
+    glossary: Optional["Glossary"] = None,
+) -> Iterator[str]:
+    """Yield the translation piece by piece as the model produces it.
+
+    With a `memory`, sentences the memory already knows are yielded at
+    once. Of the others, the first is streamed from the model while the
+    rest are translated concurrently, and each is yielded in order.
+    """
+    runs = plan_runs(text, source_lang, target_lang)
+    if len(runs) > 1:
+        for run in runs:
+            if run.keep:
+                yield run.text
+            else:
+                yield from translate_stream(
+                    run.text, run.source_lang, target_lang, domain, provider, model, temperature, memory, mode, glossary
+                )
+            if run.separator:
+                yield run.separator
+        return
+    if runs[0].keep:
+        yield text
+        return
+    source_lang = runs[0].source_lang
+
+    chain = get_translation_chain(model, temperature, provider, prompt_name_for(mode, domain))
+    if memory is None:
+        yield from chain.stream(make_payload(text, source_lang, target_lang, domain, glossary))
+        return
+
+    domain = make_payload("", source_lang, target_lang, domain)["domain"]
+    context = (source_lang, target_lang, _memory_domain(domain, mode))
+    segments = split_segments(text)
+    known: List[Optional[str]] = [
+        memory.lookup(sentence, context) if needs_translation(sentence) else sentence for sentence, _sep in segments
+    ]
+    misses = list(dict.fromkeys(sentence for (sentence, _sep), out in zip(segments, known) if out is None))
+    if not misses:
+        yield "".join(out + sep for out, (_s, sep) in zip(known, segments))
+        return
+
+    # The first miss is streamed; the others are all sent at once in the
+    # background and yielded in order as soon as the stream gets to them.
+    payloads = {
+        sentence: _memory_payload(memory, sentence, source_lang, target_lang, domain, context, glossary)
+        for sentence in misses
+    }
+    pool = concurrent.futures.ThreadPoolExecutor(max_workers=8, thread_name_prefix="memory-stream")
+    # Each call runs in a copy of this context, so usage callbacks and traces see it.
+    futures = {
+        sentence: pool.submit(contextvars.copy_context().run, chain.invoke, payloads[sentence])
+        for sentence in misses[1:]
+    }
+    done: Dict[str, str] = {}
+    try:
+        for (sentence, sep), out in zip(segments, known):
+            if out is not None:
+                yield out + sep
+                continue
+            if sentence not in done:
+                if sentence in futures:
+                    output = futures[sentence].result().strip()
+                    yield output
+                else:
+                    parts = []
+                    for part in chain.stream(payloads[sentence]):
+                        # Drop leading whitespace so segments join cleanly.
+                        if not parts:
+                            part = part.lstrip()
+                            if not part:
+                                continue
+                        parts.append(part)
+                        yield part
+                    output = "".join(parts).rstrip()
+                memory.add(sentence, output, context)
+                done[sentence] = output
+            else:
+                yield done[sentence]
+            yield sep
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def atranslate_stream(
+    text: str,
+    source_lang: str,
+    target_lang: str,
+    domain: Optional[str],
+    provider: str = DEFAULT_PROVIDER,
+    model: str = DEFAULT_MODEL,
+    temperature: float = DEFAULT_TEMPERATURE,
+    mode: Optional[str] = None,
+    glossary: Optional["Glossary"] = None,
+) -> AsyncIterator[str]:
+    """Async `translate_stream()` built on chain.astream."""
+    chain = get_translation_chain(model, temperature, provider, prompt_name_for(mode, domain))
+    for run in plan_runs(text, source_lang, target_lang):
+        if run.keep:
+            yield run.text + run.separator
+            continue
+        async for part in chain.astream(make_payload(run.text, run.source_lang, target_lang, domain, glossary)):
+            yield part
+        if run.separator:
+            yield run.separator